@@ -62,12 +62,14 @@ python3 -m compileall fts3rest/fts3rest
 %install
 mkdir -p %{buildroot}%{python3_sitelib}
 mkdir -p %{buildroot}%{_libexecdir}/fts3rest
+mkdir -p %{buildroot}%{_bindir}
 mkdir -p %{buildroot}%{_sysconfdir}/httpd/conf.d
 mkdir -p %{buildroot}%{_sysconfdir}/fts3
 mkdir -p %{buildroot}%{_var}/log/fts3rest
 mkdir -p %{buildroot}%{_sysconfdir}/logrotate.d/
 cp -r fts3rest/fts3rest %{buildroot}%{python3_sitelib}
 cp fts3rest/fts3rest.wsgi %{buildroot}%{_libexecdir}/fts3rest
+cp fts3rest/fts3rest-startup-profile %{buildroot}%{_bindir}
 cp fts3rest/fts3rest.conf %{buildroot}%{_sysconfdir}/httpd/conf.d/fts3rest.conf
 cp fts3rest/fts3restconfig %{buildroot}%{_sysconfdir}/fts3
 cp fts3rest/fts-rest.logrotate %{buildroot}%{_sysconfdir}/logrotate.d/fts-rest
@@ -112,6 +114,7 @@ fi
 %{python3_sitelib}/fts3rest/
 %attr(0755,fts3,fts3) /var/log/fts3rest
 %{_libexecdir}/fts3rest
+%{_bindir}/fts3rest-startup-profile
 
 %files selinux
 
@@ -117,6 +117,10 @@ class JobSubmitter(Base):
             $ %(prog)s -s https://fts3-devel.cern.ch:8446 -f bulk.json
             Job successfully submitted.
             Job id: 9fee8c1e-c46d-11e3-8299-02163e00a17a
+
+            $ %(prog)s -s https://fts3-devel.cern.ch:8446 -f huge-bulk.json --chunk-size 10000
+            Job successfully submitted.
+            Job id: 9fee8c1e-c46d-11e3-8299-02163e00a17a
             """,
         )
 
@@ -278,6 +282,21 @@ class JobSubmitter(Base):
             type="string",
             help="Name of configuration file",
         )
+        self.opt_parser.add_option(
+            "--chunk-size",
+            dest="chunk_size",
+            type="int",
+            default=0,
+            help="with a bulk file, submit the transfers in chunks of this size. "
+            "The job is kept on hold until all the chunks have been accepted.",
+        )
+        self.opt_parser.add_option(
+            "--parallel-chunks",
+            dest="parallel_chunks",
+            type="int",
+            default=4,
+            help="number of chunks uploaded in parallel (default: 4)",
+        )
         self.opt_parser.add_option(
             "--retry",
             dest="retry",
@@ -415,6 +434,18 @@ class JobSubmitter(Base):
                 "Source or destination token set, but FTS access token is missing. Please set FTS access token!"
             )
 
+        if self.options.chunk_size:
+            if not self.options.bulk_file:
+                self.opt_parser.error("--chunk-size requires a bulk file")
+            if self.options.multihop:
+                self.opt_parser.error("Multihop jobs can not be submitted in chunks")
+            if self.options.fts_access_token:
+                self.opt_parser.error(
+                    "Token submissions can not be submitted in chunks"
+                )
+            if self.options.parallel_chunks < 1:
+                self.opt_parser.error("--parallel-chunks must be at least 1")
+
         self._prepare_options()
 
         # Validation for token submission
@@ -608,7 +639,15 @@ class JobSubmitter(Base):
                 "overwrite-hop is only available for FTS Server >= 3.12.0"
             )
 
-        job_id = submitter.submit(transfers=self.transfers, params=self.params)
+        if self.options.chunk_size and len(self.transfers) > self.options.chunk_size:
+            job_id = submitter.submit_chunked(
+                transfers=self.transfers,
+                params=self.params,
+                chunk_size=self.options.chunk_size,
+                parallel=self.options.parallel_chunks,
+            )
+        else:
+            job_id = submitter.submit(transfers=self.transfers, params=self.params)
 
         if self.options.json:
             self.logger.info(json.dumps(job_id))
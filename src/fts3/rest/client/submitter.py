@@ -14,6 +14,10 @@
 #   limitations under the License.
 
 import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
 
 
 class Submitter:
@@ -21,9 +25,7 @@ class Submitter:
         self.context = context
 
     @staticmethod
-    def build_submission(
-        transfers=None, delete=None, params=None, staging=None, **kwargs
-    ):
+    def _build_job(transfers=None, delete=None, params=None, staging=None, **kwargs):
         def _apply_job_param_to_files(key, params, files, file_key=None):
             if file_key is None:
                 file_key = key
@@ -55,6 +57,15 @@ class Submitter:
             _apply_job_param_to_files("staging_metadata", job["params"], job["files"])
             _apply_job_param_to_files("archive_metadata", job["params"], job["files"])
 
+        return job
+
+    @staticmethod
+    def build_submission(
+        transfers=None, delete=None, params=None, staging=None, **kwargs
+    ):
+        job = Submitter._build_job(
+            transfers=transfers, delete=delete, params=params, staging=staging, **kwargs
+        )
         return json.dumps(job, indent=2)
 
     def submit(self, transfers=None, delete=None, params=None, **kwargs):
@@ -64,6 +75,56 @@ class Submitter:
         r = json.loads(self.context.post_json("/jobs", job))
         return r["job_id"]
 
+    def add_files(self, job_id, transfers, params=None, **kwargs):
+        """
+        Append transfers to a draft job. The file-level values given in the
+        parameters (checksum, filesize, activity, ...) are applied to the transfers.
+        """
+        job = Submitter._build_job(transfers=transfers, params=params, **kwargs)
+        r = json.loads(
+            self.context.post_json("/jobs/%s/files" % job_id, {"files": job["files"]})
+        )
+        return r["files"]
+
+    def seal(self, job_id):
+        """
+        Seal a draft job, releasing its transfers to the scheduler
+        """
+        r = json.loads(self.context.post_json("/jobs/%s/seal" % job_id, {}))
+        return r["files"]
+
+    def submit_chunked(
+        self, transfers, params=None, chunk_size=10000, parallel=4, **kwargs
+    ):
+        """
+        Submit a job too large for a single request. The first chunk of
+        transfers creates a draft job, the rest are appended in parallel, and
+        the job is sealed once all of them have been accepted.
+
+        If a chunk fails, the draft is left on hold and the error is raised,
+        so the remaining chunks can be sent again with add_files before calling seal.
+        """
+        params = dict(params or {})
+        params.update(kwargs)
+        params["draft"] = True
+
+        job_id = self.submit(transfers=transfers[:chunk_size], params=params)
+        chunks = [
+            transfers[i : i + chunk_size]
+            for i in range(chunk_size, len(transfers), chunk_size)
+        ]
+        try:
+            with ThreadPoolExecutor(max_workers=parallel) as executor:
+                for _ in executor.map(
+                    lambda chunk: self.add_files(job_id, chunk, params=params), chunks
+                ):
+                    pass
+        except Exception:
+            log.error("Failed to append all the chunks to the draft job %s" % job_id)
+            raise
+        self.seal(job_id)
+        return job_id
+
     def cancel(self, job_id, file_ids=None):
         if file_ids is not None:
             file_ids_str = ",".join(map(str, file_ids))
@@ -119,6 +119,38 @@ def _parse_providers(parser):
     return parsed_providers
 
 
+def _database_url(fts3cfg, connect_string):
+    """
+    SQLAlchemy url for the configured database type and credentials
+    """
+    if fts3cfg["fts3.DbType"] == "mysql":
+        return "mysql://%s:%s@%s" % (
+            fts3cfg["fts3.DbUserName"],
+            quote_plus(fts3cfg["fts3.DbPassword"]),
+            connect_string,
+        )
+    elif fts3cfg["fts3.DbType"] == "sqlite":
+        if connect_string and not connect_string.startswith("/"):
+            connect_string = os.path.abspath(connect_string)
+        return "sqlite:///%s" % connect_string
+    elif fts3cfg["fts3.DbType"] == "oracle":
+        return "oracle://%s:%s@%s" % (
+            fts3cfg["fts3.DbUserName"],
+            quote_plus(fts3cfg["fts3.DbPassword"]),
+            connect_string,
+        )
+    elif fts3cfg["fts3.DbType"] == "postgresql":
+        return "postgresql+psycopg2://%s:%s@%s" % (
+            fts3cfg["fts3.DbUserName"],
+            quote_plus(fts3cfg["fts3.DbPassword"]),
+            connect_string,
+        )
+    else:
+        raise ValueError(
+            "Database type '%s' is not recognized" % fts3cfg["fts3.DbType"]
+        )
+
+
 def fts3_config_load(path="/etc/fts3/fts3restconfig", test=False):
     """
     Read the configuration from the FTS3 configuration file
@@ -163,6 +195,10 @@ def fts3_config_load(path="/etc/fts3/fts3restconfig", test=False):
     fts3cfg["fts3.ArchiveMetadataSizeLimit"] = parser.getint(
         "fts3", "ArchiveMetadataSizeLimit", fallback=1024
     )
+    # MaxSubmissionSize is an integer
+    fts3cfg["fts3.MaxSubmissionSize"] = parser.getint(
+        "fts3", "MaxSubmissionSize", fallback=0
+    )
 
     # Convert options to boolean
     options = {
@@ -172,6 +208,7 @@ def fts3_config_load(path="/etc/fts3/fts3restconfig", test=False):
         "OverwriteHopValidation": True,
         "NonManagedTokens": False,
         "ExperimentalPostgresSupport": False,
+        "SqlInstrumentation": False,
     }
 
     for key in options:
@@ -192,36 +229,14 @@ def fts3_config_load(path="/etc/fts3/fts3restconfig", test=False):
         ):
             fts3cfg["fts3.DbConnectString"] = fts3cfg["fts3.DbConnectString"][1:-1]
 
-    if fts3cfg["fts3.DbType"] == "mysql":
-        fts3cfg["sqlalchemy.url"] = "mysql://%s:%s@%s" % (
-            fts3cfg["fts3.DbUserName"],
-            quote_plus(fts3cfg["fts3.DbPassword"]),
-            fts3cfg["fts3.DbConnectString"],
-        )
-    elif fts3cfg["fts3.DbType"] == "sqlite":
-        if fts3cfg["fts3.DbConnectString"] and not fts3cfg[
-            "fts3.DbConnectString"
-        ].startswith("/"):
-            fts3cfg["fts3.DbConnectString"] = os.path.abspath(
-                fts3cfg["fts3.DbConnectString"]
-            )
-        fts3cfg["sqlalchemy.url"] = "sqlite:///%s" % fts3cfg["fts3.DbConnectString"]
-    elif fts3cfg["fts3.DbType"] == "oracle":
-        fts3cfg["sqlalchemy.url"] = "oracle://%s:%s@%s" % (
-            fts3cfg["fts3.DbUserName"],
-            quote_plus(fts3cfg["fts3.DbPassword"]),
-            fts3cfg["fts3.DbConnectString"],
-        )
-    elif fts3cfg["fts3.DbType"] == "postgresql":
-        fts3cfg["sqlalchemy.url"] = "postgresql+psycopg2://%s:%s@%s" % (
-            fts3cfg["fts3.DbUserName"],
-            quote_plus(fts3cfg["fts3.DbPassword"]),
-            fts3cfg["fts3.DbConnectString"],
-        )
-    else:
-        raise ValueError(
-            "Database type '%s' is not recognized" % fts3cfg["fts3.DbType"]
-        )
+    fts3cfg["sqlalchemy.url"] = _database_url(fts3cfg, fts3cfg["fts3.DbConnectString"])
+
+    # Read replicas share the type and the credentials of the primary database
+    fts3cfg["fts3.DbReplicaUrls"] = [
+        _database_url(fts3cfg, connect_string.strip())
+        for connect_string in fts3cfg.get("fts3.DbReplicaConnectStrings", "").split(";")
+        if connect_string.strip()
+    ]
     # SQLAlchemy configuration
     try:
         for name, value in parser.items("sqlalchemy"):
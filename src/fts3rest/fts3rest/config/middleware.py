@@ -7,23 +7,34 @@ import MySQLdb
 from flask import Flask
 from flask import request
 from sqlalchemy import engine_from_config, event
+from sqlalchemy.exc import DBAPIError
 from werkzeug.exceptions import HTTPException
 
 from fts3rest.config.config import fts3_config_load
 from fts3rest.config.routing import base, cstorage
+from fts3rest.config.watcher import ConfigWatcher, LiveConfig
 from fts3rest.lib.IAMTokenRefresher import IAMTokenRefresher
 from fts3rest.lib.helpers.connection_validator import (
     connection_validator,
     connection_set_sqlmode,
 )
 from fts3rest.lib.heartbeat import Heartbeat
+from fts3rest.lib.helpers import metrics
+from fts3rest.lib.helpers.replica import ReplicaRouter
+from fts3rest.lib.helpers.sqlstats import SqlInstrumentation
 from fts3rest.lib.middleware.fts3auth.fts3authmiddleware import FTS3AuthMiddleware
-from fts3rest.lib.middleware.timeout import TimeoutHandler
+from fts3rest.lib.middleware.metrics import MetricsHandler
+from fts3rest.lib.middleware.timeout import (
+    TimeoutHandler,
+    StatementTimeouts,
+    is_statement_timeout,
+    statement_timeout_error,
+)
 from fts3rest.lib.openidconnect import oidc_manager
 from fts3rest.model.meta import init_model, Session
 
 
-def _load_configuration(config_file, test):
+def _load_configuration(config_file, test, configure_logging=True):
     # ConfigParser doesn't handle files without headers.
     # If the configuration file doesn't start with [fts3],
     # add it for backwards compatibility, as before migrating to Flask
@@ -42,23 +53,39 @@ def _load_configuration(config_file, test):
             raise IOError("Empty configuration file")
 
     # Load configuration
-    logging.config.fileConfig(content)
-    content.seek(0)
+    if configure_logging:
+        logging.config.fileConfig(content)
+        content.seek(0)
     fts3cfg = fts3_config_load(content, test)
     content.close()
+    _validate_configuration(fts3cfg, config_file)
     return fts3cfg
 
 
-def _load_db(app):
+def _validate_configuration(fts3cfg, config_file):
+    if (
+        fts3cfg["fts3.DbType"] == "postgresql"
+        and not fts3cfg["fts3.ExperimentalPostgresSupport"]
+    ):
+        raise ValueError(
+            "Failed to create fts3rest web application: "
+            "Invalid configuration file: "
+            "fts3.DbType cannot be set to postgresql if fts3.ExperimentalPostgresSupport is not set to true: "
+            f"config_file={config_file}"
+        )
+
+
+def _create_engine(app, url):
     # Setup the SQLAlchemy database engine
     kwargs = dict()
-    if app.config["sqlalchemy.url"].startswith("mysql://"):
+    if url.startswith("mysql://"):
         kwargs["connect_args"] = {"cursorclass": MySQLdb.cursors.SSCursor}
-    engine = engine_from_config(app.config, "sqlalchemy.", pool_recycle=7200, **kwargs)
-    init_model(engine)
+    engine = engine_from_config(
+        app.config, "sqlalchemy.", url=url, pool_recycle=7200, **kwargs
+    )
 
     # Disable for sqlite the isolation level to work around issues with savepoints
-    if app.config["sqlalchemy.url"].startswith("sqlite"):
+    if url.startswith("sqlite"):
 
         @event.listens_for(engine, "connect")
         def do_connect(dbapi_connection, connection_record):
@@ -68,12 +95,44 @@ def _load_db(app):
     event.listens_for(engine, "checkout")(connection_validator)
     event.listens_for(engine, "connect")(connection_set_sqlmode)
 
+    # Time spent on the database per request
+    event.listens_for(engine, "before_cursor_execute")(metrics.before_cursor_execute)
+    event.listens_for(engine, "after_cursor_execute")(metrics.after_cursor_execute)
+
+    # Statements per request, slow statements and N+1 patterns
+    if app.config.get("fts3.SqlInstrumentation"):
+        SqlInstrumentation(app.config).install(engine)
+
+    # Statements that run for too long are cancelled
+    StatementTimeouts(app.config).install(engine)
+
+    return engine
+
+
+def _load_db(app):
+    engine = _create_engine(app, app.config["sqlalchemy.url"])
+
+    # Read only endpoints can be served by replicas
+    router = None
+    if app.config.get("fts3.DbReplicaUrls"):
+        router = ReplicaRouter(
+            [_create_engine(app, url) for url in app.config["fts3.DbReplicaUrls"]],
+            max_lag=float(app.config.get("fts3.DbReplicaMaxLag", 30)),
+            check_interval=float(app.config.get("fts3.DbReplicaLagCheckInterval", 10)),
+        )
+    init_model(engine, router)
+
     # Flask will automatically remove database sessions at the end of the request or when the application shuts down:
     @app.teardown_appcontext
     def shutdown_session(exception=None):
         Session.remove()
 
 
+def _reload_providers(old_config, new_config):
+    if new_config["fts3.Providers"] != old_config.get("fts3.Providers"):
+        oidc_manager.setup(new_config, block=False)
+
+
 def create_app(default_config_file=None, test=False):
     """
     Create a new fts-rest Flask app
@@ -96,19 +155,10 @@ def create_app(default_config_file=None, test=False):
     fts3cfg = _load_configuration(config_file, test)
     log = logging.getLogger(__name__)
 
-    if (
-        fts3cfg["fts3.DbType"] == "postgresql"
-        and not fts3cfg["fts3.ExperimentalPostgresSupport"]
-    ):
-        raise ValueError(
-            "Failed to create fts3rest web application: "
-            "Invalid configuration file: "
-            "fts3.DbType cannot be set to postgresql if fts3.ExperimentalPostgresSupport is not set to true: "
-            f"config_file={config_file}"
-        )
-
     # Add configuration
     app.config.update(fts3cfg)
+    # The middlewares follow the reloads of the configuration
+    live_config = LiveConfig(app)
 
     # Add routes
     base.do_connect(app)
@@ -118,10 +168,13 @@ def create_app(default_config_file=None, test=False):
     _load_db(app)
 
     # FTS3 authentication/authorization middleware
-    app.wsgi_app = FTS3AuthMiddleware(app.wsgi_app, fts3cfg)
+    app.wsgi_app = FTS3AuthMiddleware(app.wsgi_app, live_config)
 
     # Catch DB Timeout
-    app.wsgi_app = TimeoutHandler(app.wsgi_app, fts3cfg)
+    app.wsgi_app = TimeoutHandler(app.wsgi_app, live_config)
+
+    # Request metrics
+    app.wsgi_app = MetricsHandler(app.wsgi_app, live_config)
 
     # Convert errors to JSON
     @app.errorhandler(HTTPException)
@@ -139,12 +192,47 @@ def create_app(default_config_file=None, test=False):
         response.content_type = "application/json"
         return response
 
+    # Statements cancelled by the statement timeout are a 503, with Retry-After
+    statement_timeouts = StatementTimeouts(fts3cfg)
+
+    @app.errorhandler(DBAPIError)
+    def handle_statement_timeout(e):
+        if not is_statement_timeout(e):
+            raise e
+        return handle_exception(
+            statement_timeout_error(statement_timeouts, request.endpoint)
+        )
+
+    # Label the request metrics with the matched endpoint
+    @app.before_request
+    def set_metrics_endpoint():
+        stats = metrics.current_request()
+        if stats is not None:
+            stats.endpoint = request.endpoint
+
     # Log http request information after each request
+    # With SqlInstrumentation, add the statements run so far, which do not include
+    # those run while streaming the response
     @app.after_request
     def log_request_info(response):
+        db_info = ""
+        stats = metrics.current_request()
+        if app.config.get("fts3.SqlInstrumentation") and stats is not None:
+            response.headers["X-DB-Statements"] = str(stats.statements)
+            response.headers["X-DB-Time"] = "%.6f" % stats.db_seconds
+            db_info = " [db_statements=%d db_secs=%.6f]" % (
+                stats.statements,
+                stats.db_seconds,
+            )
         log.info(
-            '[From %s] [%s] "%s %s"'
-            % (request.remote_addr, response.status, request.method, request.full_path)
+            '[From %s] [%s] "%s %s"%s'
+            % (
+                request.remote_addr,
+                response.status,
+                request.method,
+                request.full_path,
+                db_info,
+            )
         )
         return response
 
@@ -152,12 +240,24 @@ def create_app(default_config_file=None, test=False):
     if not test:
         Heartbeat("fts_rest", int(app.config.get("fts3.HeartBeatInterval", 60))).start()
 
-    # Start OIDC clients
+    # Start OIDC clients, without waiting for the providers outside of the tests
     if "fts3.Providers" in app.config and app.config["fts3.Providers"]:
-        oidc_manager.setup(app.config)
+        oidc_manager.setup(app.config, block=test)
         if not test:
             IAMTokenRefresher("fts_token_refresh_daemon", app.config).start()
     else:
         log.info("OpenID Connect support disabled. Providers not found in config")
 
+    # Configuration reload
+    reload_interval = float(app.config.get("fts3.ConfigReloadInterval", 30))
+    if not test and reload_interval > 0:
+        watcher = ConfigWatcher(
+            app,
+            config_file,
+            lambda path: _load_configuration(path, test, configure_logging=False),
+            reload_interval,
+        )
+        watcher.listeners.append(_reload_providers)
+        watcher.start()
+
     return app
@@ -0,0 +1,56 @@
+#   Copyright 2020 CERN
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+from functools import lru_cache
+
+from werkzeug.utils import import_string
+
+
+class LazyView:
+    """
+    View function whose module is imported on the first call, so the
+    controllers that depend on heavy modules (M2Crypto, gfal2, mako...)
+    do not slow down the start of the workers
+    """
+
+    def __init__(self, import_name, endpoint=None):
+        self.import_name = import_name
+        # Set for class based views, which are instantiated with as_view
+        self.endpoint = endpoint
+        self.__module__, self.__name__ = import_name.rsplit(".", 1)
+        if endpoint:
+            self.__name__ = endpoint
+        self._view = None
+
+    @property
+    def view(self):
+        if self._view is None:
+            view = import_string(self.import_name)
+            if self.endpoint:
+                view = view.as_view(self.endpoint)
+            self._view = view
+        return self._view
+
+    def __call__(self, *args, **kwargs):
+        return self.view(*args, **kwargs)
+
+
+@lru_cache(maxsize=None)
+def controller(name, as_view=False):
+    """
+    Lazy view for fts3rest.controllers.<name>.
+    The same view is returned for the same name, as Flask requires for the
+    rules that share an endpoint.
+    """
+    return LazyView("fts3rest.controllers." + name, name if as_view else None)
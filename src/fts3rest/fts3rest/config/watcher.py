@@ -0,0 +1,142 @@
+#   Copyright 2020 CERN
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Reload of the configuration file without restarting the processes.
+
+The published configuration is never modified: a reload builds a new one and
+replaces app.config as a whole, so a reader sees either the old or the new
+values, never a mix. The middlewares read it through LiveConfig.
+The database settings, and the statement timeouts installed on the database
+engine, are only read at startup, and still need a restart.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections.abc import Mapping
+
+from flask import Config
+
+log = logging.getLogger(__name__)
+
+# Settings that can not change without a restart
+RESTART_PREFIXES = ("sqlalchemy.", "fts3.Db", "fts3.StatementTimeout")
+
+
+class LiveConfig(Mapping):
+    """
+    Read only view of the current configuration of the application
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def __getitem__(self, key):
+        return self.app.config[key]
+
+    def __iter__(self):
+        return iter(self.app.config)
+
+    def __len__(self):
+        return len(self.app.config)
+
+
+class ConfigWatcher(threading.Thread):
+    """
+    Checks every interval seconds if the configuration file changed,
+    and reloads it when it did
+    """
+
+    def __init__(self, app, config_file, load, interval=30):
+        """
+        :param load: function that parses and validates the configuration file,
+                     raising an exception if it is not valid
+        """
+        super().__init__(name="config_watcher", daemon=True)
+        self.app = app
+        self.config_file = config_file
+        self.load = load
+        self.interval = interval
+        self.listeners = []
+        self.stamp = self._stamp()
+
+    def _stamp(self):
+        stat = os.stat(self.config_file)
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception as e:
+                log.exception(e)
+
+    def check(self):
+        """
+        Reload the configuration if the file changed
+        :return: True if the configuration has been reloaded
+        """
+        try:
+            stamp = self._stamp()
+        except OSError as e:
+            log.warning("Could not check the configuration file: %s" % str(e))
+            return False
+        if stamp == self.stamp:
+            return False
+        # Leave a file being written for the next check
+        if time.time() - stamp[0] / 1e9 < 1:
+            return False
+        self.stamp = stamp
+        return self.reload()
+
+    def reload(self):
+        """
+        Parse the configuration file, and publish it if it is valid
+        :return: True if the configuration has been replaced
+        """
+        try:
+            fts3cfg = self.load(self.config_file)
+        except Exception as e:
+            log.error(
+                "Configuration %s not reloaded: %s: %s"
+                % (self.config_file, type(e).__name__, str(e))
+            )
+            return False
+
+        current = self.app.config
+        config = Config(
+            current.root_path,
+            {
+                key: value
+                for key, value in current.items()
+                if not key.startswith(("fts3.", "sqlalchemy."))
+            },
+        )
+        config.update(fts3cfg)
+        for key in sorted(set(config) | set(current)):
+            if key.startswith(RESTART_PREFIXES) and config.get(key) != current.get(key):
+                log.warning("%s can not be changed without a restart" % key)
+                if key in current:
+                    config[key] = current[key]
+                else:
+                    del config[key]
+
+        self.app.config = config
+        log.info("Configuration reloaded from %s" % self.config_file)
+        for listener in self.listeners:
+            listener(current, config)
+        return True
@@ -13,14 +13,18 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
-from werkzeug.exceptions import NotFound, Forbidden
+from flask import request, Response
+from werkzeug.exceptions import BadRequest, NotFound, Forbidden, HTTPException
 from fts3rest.lib.helpers.jsonify import jsonify
 
-from fts3rest.model import ArchivedJob
-from fts3rest.model.meta import Session
+from fts3rest.model import ArchivedJob, ArchivedFile
+from fts3rest.model.meta import Session, read_only
 from fts3rest.lib.middleware.fts3auth.authorization import authorized
 from fts3rest.lib.middleware.fts3auth.constants import *
 
+# Attributes of ArchivedFile, in the order of the table
+FILE_FIELDS = ArchivedFile.__mapper__.column_attrs.keys()
+
 
 @jsonify
 def index():
@@ -35,29 +39,153 @@ def index():
                 "title": "Archived job information",
                 "templated": True,
             },
+            "fts:archivedJobFiles": {
+                "href": "/archive/{id}/files{?fields,marker,limit}",
+                "title": "Files of an archived job",
+                "templated": True,
+            },
         }
     }
     return ret
 
 
+def _authorize(job_id, user_dn, vo_name):
+    if not authorized(TRANSFER, resource_owner=user_dn, resource_vo=vo_name):
+        raise Forbidden('Not enough permissions to check the job "%s"' % job_id)
+
+
+def _not_found(job_id):
+    return NotFound('No job with the id "%s" has been found in the archive' % job_id)
+
+
 def _get_job(job_id):
     job = Session.query(ArchivedJob).get(job_id)
     if job is None:
-        raise NotFound('No job with the id "%s" has been found in the archive' % job_id)
-    if not authorized(TRANSFER, resource_owner=job.user_dn, resource_vo=job.vo_name):
-        raise Forbidden('Not enough permissions to check the job "%s"' % job_id)
+        raise _not_found(job_id)
+    _authorize(job_id, job.user_dn, job.vo_name)
     return job
 
 
+def _file_fields(value):
+    """
+    Columns of t_file_backup to send, from a comma separated list.
+    Unknown fields are ignored, as for /jobs
+    """
+    if not value:
+        return FILE_FIELDS
+    fields = [field for field in value.split(",") if field in FILE_FIELDS]
+    if not fields:
+        raise BadRequest("No valid field in %s" % value)
+    return fields
+
+
+def _archived_files(job_id, fields, marker=None, limit=None):
+    """
+    Iterate the files of an archived job, ordered by file_id, only loading
+    the requested columns, and not holding more than a window of them
+    """
+    columns = [getattr(ArchivedFile, field) for field in fields]
+    files = (
+        Session.query(*columns)
+        .filter(ArchivedFile.job_id == job_id)
+        .order_by(ArchivedFile.file_id)
+    )
+    if marker is not None:
+        files = files.filter(ArchivedFile.file_id > marker)
+    if limit is not None:
+        files = files.limit(limit)
+    for row in files.yield_per(1000):
+        yield dict(zip(fields, row))
+
+
+def _get_int(name, minimum):
+    value = request.args.get(name, None)
+    if value is None:
+        return None
+    try:
+        value = int(value)
+    except ValueError:
+        raise BadRequest("Invalid %s" % name)
+    if value < minimum:
+        raise BadRequest("Invalid %s" % name)
+    return value
+
+
+@read_only
 @jsonify
-def get(job_id):
+def get(job_list):
     """
-    Get the job with the given ID
+    Get the jobs with the given IDs, comma separated, without their files.
+    The fields of the files to include can be given in 'files', as for /jobs
     """
-    job = _get_job(job_id)
-    # Trigger the query, so it is serialized
-    files = job.files
-    return job
+    job_ids = [job_id for job_id in job_list.split(",") if job_id]
+    if "files" in request.args:
+        file_fields = _file_fields(request.args["files"])
+    else:
+        file_fields = None
+
+    jobs = {
+        job.job_id: job
+        for job in Session.query(ArchivedJob).filter(ArchivedJob.job_id.in_(job_ids))
+    }
+    statuses = []
+    status_error_count = 0
+    for job_id in job_ids:
+        try:
+            job = jobs.get(job_id)
+            if job is None:
+                raise _not_found(job_id)
+            _authorize(job_id, job.user_dn, job.vo_name)
+            if file_fields:
+                job.__dict__["files"] = _archived_files(job_id, file_fields)
+            setattr(job, "http_status", "200 Ok")
+            statuses.append(job)
+        except HTTPException as ex:
+            if len(job_ids) == 1:
+                raise
+            statuses.append(
+                dict(
+                    job_id=job_id,
+                    http_status="%s %s" % (ex.code, ex.name),
+                    http_message=ex.description,
+                )
+            )
+            status_error_count += 1
+
+    if len(job_ids) == 1:
+        return statuses[0]
+    elif status_error_count > 0:
+        return Response(statuses, status=207, mimetype="application/json")
+    return statuses
+
+
+@read_only
+@jsonify
+def get_files(job_id):
+    """
+    Get the files of the job identified by id, ordered by file_id
+
+    Only the fields given in 'fields' (comma separated) are sent. The files can
+    be paginated with limit, and marker, the file_id of the last file of the
+    previous page. If application/x-ndjson is accepted, they are sent one per line.
+    """
+    owner = (
+        Session.query(ArchivedJob.user_dn, ArchivedJob.vo_name)
+        .filter(ArchivedJob.job_id == job_id)
+        .first()
+    )
+    if owner is None:
+        raise _not_found(job_id)
+    _authorize(job_id, owner[0], owner[1])
+
+    fields = _file_fields(request.args.get("fields"))
+    marker = _get_int("marker", 0)
+    limit = _get_int("limit", 1)
+
+    mimetype = request.accept_mimetypes.best_match(
+        ["application/json", "application/x-ndjson"], default="application/json"
+    )
+    return Response(_archived_files(job_id, fields, marker, limit), mimetype=mimetype)
 
 
 @jsonify
@@ -13,14 +13,38 @@
 #   limitations under the License.
 
 
-from fts3rest.model import Credential, LinkConfig, Job
+from flask import current_app, request
 
-from fts3rest.model.meta import Session
-from flask import request
+from fts3rest.lib.helpers.prefixindex import AutocompleteIndex
 from fts3rest.lib.middleware.fts3auth.authorization import authorize
 from fts3rest.lib.middleware.fts3auth.constants import *
 from fts3rest.lib.helpers.jsonify import jsonify
 
+DEFAULT_LIMIT = 100
+
+
+def _search(name, default_term):
+    """
+    Search the in memory index of this application, created on the first use
+    """
+    index = current_app.extensions.get("fts3.autocomplete")
+    if index is None:
+        index = current_app.extensions.setdefault(
+            "fts3.autocomplete",
+            AutocompleteIndex(
+                float(current_app.config.get("fts3.AutocompleteRefreshInterval", 300)),
+                float(
+                    current_app.config.get("fts3.AutocompleteFullRefreshInterval", 3600)
+                ),
+            ),
+        )
+    term = request.values.get("term", default_term)
+    try:
+        limit = max(1, int(request.values["limit"]))
+    except Exception:
+        limit = DEFAULT_LIMIT
+    return index.search(name, term, limit)
+
 
 @authorize(CONFIG)
 @jsonify
@@ -28,14 +52,7 @@ def autocomplete_dn():
     """
     Autocomplete for users' dn
     """
-    term = request.values.get("term", "/DC=cern.ch")
-    matches = (
-        Session.query(Credential.dn)
-        .filter(Credential.dn.startswith(term))
-        .distinct()
-        .all()
-    )
-    return [r[0] for r in matches]
+    return _search("dn", "/DC=cern.ch")
 
 
 @authorize(CONFIG)
@@ -44,14 +61,7 @@ def autocomplete_source():
     """
     Autocomplete source SE
     """
-    term = request.values.get("term", "srm://")
-    matches = (
-        Session.query(LinkConfig.source)
-        .filter(LinkConfig.source.startswith(term))
-        .distinct()
-        .all()
-    )
-    return [r[0] for r in matches]
+    return _search("source", "srm://")
 
 
 @authorize(CONFIG)
@@ -60,14 +70,7 @@ def autocomplete_destination():
     """
     Autocomplete destination SE
     """
-    term = request.values.get("term", "srm://")
-    matches = (
-        Session.query(LinkConfig.destination)
-        .filter(LinkConfig.destination.startswith(term))
-        .distinct()
-        .all()
-    )
-    return [r[0] for r in matches]
+    return _search("destination", "srm://")
 
 
 @authorize(CONFIG)
@@ -76,24 +79,7 @@ def autocomplete_storage():
     """
     Autocomplete a storage, regardless of it being source or destination
     """
-    term = request.values.get("term", "srm://")
-    src_matches = (
-        Session.query(LinkConfig.source)
-        .filter(LinkConfig.source.startswith(term))
-        .distinct()
-        .all()
-    )
-    dest_matches = (
-        Session.query(LinkConfig.destination)
-        .filter(LinkConfig.destination.startswith(term))
-        .distinct()
-        .all()
-    )
-
-    srcs = map(lambda r: r[0], src_matches)
-    dsts = map(lambda r: r[0], dest_matches)
-
-    return set(srcs).union(set(dsts))
+    return _search("storage", "srm://")
 
 
 @authorize(CONFIG)
@@ -102,8 +88,4 @@ def autocomplete_vo():
     """
     Autocomplete VO
     """
-    term = request.values.get("term", "srm://")
-    matches = (
-        Session.query(Job.vo_name).filter(Job.vo_name.startswith(term)).distinct().all()
-    )
-    return [r[0] for r in matches]
+    return _search("vo", "srm://")
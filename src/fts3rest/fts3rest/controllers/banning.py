@@ -17,7 +17,7 @@ from flask import request, Response
 import json
 import logging
 from datetime import datetime
-from sqlalchemy import distinct, func, and_
+from sqlalchemy import distinct, func, and_, or_
 
 from fts3rest.model import (
     BannedDN,
@@ -26,6 +26,7 @@ from fts3rest.model import (
     File,
     JobActiveStates,
     FileActiveStates,
+    FileDraftStates,
 )
 from fts3rest.model.meta import Session
 from fts3rest.lib.middleware.fts3auth.authorization import authorize
@@ -246,6 +247,16 @@ def _set_to_wait(storage, vo_name):
     return job_ids
 
 
+def _not_draft():
+    """
+    Filter out the files of draft jobs, which stay on hold until they are sealed
+    """
+    return or_(
+        File.file_state_initial.is_(None),
+        ~File.file_state_initial.in_(list(FileDraftStates.keys())),
+    )
+
+
 def _reenter_queue(storage, vo_name):
     """
     Resets to SUBMITTED or STAGING those transfers that were set ON_HOLD with a previous banning
@@ -255,6 +266,7 @@ def _reenter_queue(storage, vo_name):
         Session.query(distinct(File.job_id))
         .filter((File.source_se == storage) | (File.dest_se == storage))
         .filter(File.file_state.in_(["ON_HOLD", "ON_HOLD_STAGING"]))
+        .filter(_not_draft())
     )
     if vo_name and vo_name != "*":
         job_ids = job_ids.filter(File.vo_name == vo_name)
@@ -263,10 +275,12 @@ def _reenter_queue(storage, vo_name):
     try:
         for job_id in job_ids:
             Session.query(File).filter(
-                File.job_id == job_id, File.file_state == "ON_HOLD_STAGING"
+                File.job_id == job_id,
+                File.file_state == "ON_HOLD_STAGING",
+                _not_draft(),
             ).update({"file_state": "STAGING"}, synchronize_session=False)
             Session.query(File).filter(
-                File.job_id == job_id, File.file_state == "ON_HOLD"
+                File.job_id == job_id, File.file_state == "ON_HOLD", _not_draft()
             ).update({"file_state": "SUBMITTED"}, synchronize_session=False)
     except Exception:
         Session.rollback()
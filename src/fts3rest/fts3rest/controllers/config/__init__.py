@@ -13,10 +13,16 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import base64
+import binascii
+import json
 import logging
 from numbers import Number
+from urllib.parse import urlencode
 
-from flask import request
+from flask import request, after_this_request
+from sqlalchemy import inspect, tuple_
+from sqlalchemy.orm import load_only
 from werkzeug.exceptions import BadRequest
 
 from fts3rest.model import *
@@ -28,9 +34,11 @@ from fts3rest.model.meta import Session
 log = logging.getLogger(__name__)
 
 
-def audit_configuration(action, config):
+def audit_configuration(action, config, commit=True):
     """
-    Logs and stores in the DB a configuration action
+    Logs and stores in the DB a configuration action.
+    With commit=False, the audit is only added to the current transaction,
+    and is committed, or rolled back, with the change it describes
     """
     audit = ConfigAudit(
         datetime=datetime.utcnow(),
@@ -38,6 +46,10 @@ def audit_configuration(action, config):
         config=config,
         action=action,
     )
+    if not commit:
+        Session.add(audit)
+        log.info(action)
+        return
     try:
         Session.add(audit)
         Session.commit()
@@ -47,6 +59,87 @@ def audit_configuration(action, config):
         log.warning("Database error during audit log: %s" % str(e))
 
 
+def _encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def _decode_cursor(cursor, size):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise BadRequest("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise BadRequest("Invalid cursor")
+    return values
+
+
+def list_configuration(query, projection=True):
+    """
+    List the entities of a configuration query, ordered by primary key.
+    The request can ask for:
+        fields: comma separated attributes to load (if projection is True)
+        limit: maximum number of entities
+        cursor: continue after the last entity of the previous page, as given
+                by the Link rel="next" header of the response
+    The response carries an ETag, and is a 304 if it matches If-None-Match
+    """
+    mapper = inspect(query.column_descriptions[0]["entity"])
+    keys = [
+        mapper.get_property_by_column(column).class_attribute
+        for column in mapper.primary_key
+    ]
+    query = query.order_by(*keys)
+
+    fields = request.args.get("fields")
+    if projection and fields:
+        attributes = [
+            getattr(mapper.class_, field)
+            for field in fields.split(",")
+            if field in mapper.column_attrs
+        ]
+        if not attributes:
+            raise BadRequest("No valid field in %s" % fields)
+        query = query.options(load_only(*attributes))
+
+    cursor = request.args.get("cursor")
+    if cursor:
+        values = _decode_cursor(cursor, len(keys))
+        if len(keys) == 1:
+            query = query.filter(keys[0] > values[0])
+        else:
+            query = query.filter(tuple_(*keys) > tuple_(*values))
+
+    limit = request.args.get("limit")
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise BadRequest("Invalid limit")
+        if limit < 1:
+            raise BadRequest("Invalid limit")
+        query = query.limit(limit)
+
+    entities = query.all()
+    next_cursor = None
+    if limit and len(entities) == limit:
+        last = mapper.primary_key_from_instance(entities[-1])
+        next_cursor = _encode_cursor(last)
+
+    @after_this_request
+    def add_etag(response):
+        if next_cursor:
+            args = request.args.copy()
+            args["cursor"] = next_cursor
+            response.headers["Link"] = '<%s?%s>; rel="next"' % (
+                request.base_url,
+                urlencode(list(args.items(multi=True))),
+            )
+        response.add_etag()
+        return response.make_conditional(request)
+
+    return entities
+
+
 def validate_type(Type, key, value):
     """
     Validate that value is of a suitable type of the attribute key of the type Type
@@ -19,7 +19,7 @@ from flask import request, Response
 from werkzeug.exceptions import BadRequest, NotFound
 
 from fts3rest.model import *
-from fts3rest.controllers.config import audit_configuration
+from fts3rest.controllers.config import audit_configuration, list_configuration
 from fts3rest.lib.helpers.accept import accept
 from fts3rest.lib.helpers.jsonify import jsonify
 from fts3rest.lib.helpers.misc import get_input_as_dict
@@ -71,7 +71,9 @@ def get_activity_shares():
     Get all activity shares
     """
     response = dict()
-    for activity_share in Session.query(ActivityShare):
+    for activity_share in list_configuration(
+        Session.query(ActivityShare), projection=False
+    ):
         response[activity_share.vo] = dict(
             share=_new_activity_share_format(activity_share.activity_share),
             active=activity_share.active,
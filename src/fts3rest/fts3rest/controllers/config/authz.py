@@ -18,7 +18,7 @@ from flask import request, Response
 from werkzeug.exceptions import BadRequest
 
 from fts3rest.model import *
-from fts3rest.controllers.config import audit_configuration
+from fts3rest.controllers.config import audit_configuration, list_configuration
 from fts3rest.lib.helpers.accept import accept
 from fts3rest.lib.helpers.jsonify import jsonify
 from fts3rest.lib.helpers.misc import get_input_as_dict
@@ -81,7 +81,7 @@ def list_authz():
         authz = authz.filter(AuthorizationByDn.dn == dn)
     if op:
         authz = authz.filter(AuthorizationByDn.operation == op)
-    return authz.all()
+    return list_configuration(authz)
 
 
 @require_certificate
@@ -15,9 +15,11 @@
 import logging
 
 from flask import request, Response
+from sqlalchemy.orm import selectinload
 from werkzeug.exceptions import BadRequest, NotFound
 
 from fts3rest.model import *
+from fts3rest.controllers.config import list_configuration
 from fts3rest.lib.helpers.accept import accept
 from fts3rest.lib.helpers.jsonify import jsonify
 from fts3rest.lib.helpers.misc import get_input_as_dict
@@ -43,13 +45,9 @@ def get_cloud_storages():
     """
     Get a list of cloud storages registered
     """
-    storages = Session.query(CloudStorage).all()
-    for storage in storages:
-        users = Session.query(CloudStorageUser).filter(
-            CloudStorageUser.storage_name == storage.storage_name
-        )
-        setattr(storage, "users", list(users))
-    return storages
+    return list_configuration(
+        Session.query(CloudStorage).options(selectinload(CloudStorage.users))
+    )
 
 
 @require_certificate
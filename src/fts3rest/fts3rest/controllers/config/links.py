@@ -20,7 +20,11 @@ from flask import request, Response
 from werkzeug.exceptions import BadRequest, NotFound
 
 from fts3rest.model import *
-from fts3rest.controllers.config import audit_configuration, validate_type
+from fts3rest.controllers.config import (
+    audit_configuration,
+    list_configuration,
+    validate_type,
+)
 from fts3rest.lib.helpers.accept import accept
 from fts3rest.lib.helpers.jsonify import jsonify
 from fts3rest.lib.helpers.misc import get_input_as_dict
@@ -104,7 +108,7 @@ def get_all_link_configs():
     """
     Get a list of all the links configured
     """
-    return Session.query(LinkConfig).all()
+    return list_configuration(Session.query(LinkConfig))
 
 
 @authorize(CONFIG)
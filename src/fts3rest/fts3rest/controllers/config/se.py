@@ -17,6 +17,7 @@ import logging
 
 from flask import Response
 from flask import request
+from sqlalchemy import and_, bindparam
 from werkzeug.exceptions import BadRequest
 
 from fts3rest.model import *
@@ -45,64 +46,147 @@ def _validate_tpc_support(key, value):
         )
 
 
+def _parse_se_config(input_dict):
+    """
+    Validate the whole configuration before touching the database
+    :return: a tuple (se_info per storage, limit per (vo, storage, operation),
+             audits)
+    """
+    se_infos = {}
+    limits = {}
+    audits = []
+    for storage, cfg in input_dict.items():
+        if not storage or storage.isspace():
+            raise ValueError
+        se_info_new = cfg.get("se_info", None)
+        if se_info_new:
+            se_info = se_infos.setdefault(storage, {})
+            for key, value in se_info_new.items():
+                if value is not None:  # Only proceed if value is not None
+                    value = validate_type(Se, key, value)  # Validate data type for DB
+                    if key == "tpc_support":
+                        _validate_tpc_support(
+                            key, value
+                        )  # Check tpc_support has a valid value
+                    se_info[key] = value
+            audits.append(
+                ("set-se-config", "Set config %s: %s" % (storage, json.dumps(cfg)))
+            )
+
+        # Operation limits
+        operations = cfg.get("operations", None)
+        if operations:
+            for vo, ops in operations.items():
+                vo = validate_type(OperationConfig, "vo_name", vo)
+                for op, limit in ops.items():
+                    op = validate_type(OperationConfig, "operation", op)
+                    limit = validate_type(OperationConfig, "concurrent_ops", limit)
+                    limits[(vo, storage, op)] = int(limit)
+            audits.append(
+                (
+                    "set-se-limits",
+                    "Set limits for %s: %s" % (storage, json.dumps(operations)),
+                )
+            )
+    return se_infos, limits, audits
+
+
+def _diff_se_config(se_infos, limits):
+    """
+    Compare the new configuration with the rows already in the database,
+    loaded with one query per table
+    :return: the rows to insert, update and delete, as dictionaries
+    """
+    existing_se = {}
+    if se_infos:
+        existing_se = {
+            se.storage: se
+            for se in Session.query(Se).filter(Se.storage.in_(list(se_infos)))
+        }
+    existing_ops = {}
+    hosts = set(host for _, host, _ in limits)
+    if hosts:
+        existing_ops = {
+            (op.vo_name, op.host, op.operation): op.concurrent_ops
+            for op in Session.query(OperationConfig).filter(
+                OperationConfig.host.in_(list(hosts))
+            )
+        }
+
+    diff = {
+        "se": {"insert": [], "update": []},
+        "operations": {"insert": [], "update": [], "delete": []},
+    }
+    for storage, se_info in se_infos.items():
+        se = existing_se.get(storage)
+        if se is None:
+            diff["se"]["insert"].append(dict(se_info, storage=storage))
+            continue
+        changes = {
+            key: value for key, value in se_info.items() if getattr(se, key) != value
+        }
+        if changes:
+            diff["se"]["update"].append(dict(changes, storage=storage))
+
+    for (vo, storage, op), limit in limits.items():
+        row = dict(vo_name=vo, host=storage, operation=op)
+        current = existing_ops.get((vo, storage, op))
+        if limit > 0 and current is None:
+            diff["operations"]["insert"].append(dict(row, concurrent_ops=limit))
+        elif limit > 0 and current != limit:
+            diff["operations"]["update"].append(dict(row, concurrent_ops=limit))
+        elif limit <= 0 and current is not None:
+            diff["operations"]["delete"].append(row)
+    return diff
+
+
+def _apply_se_config(diff):
+    if diff["se"]["insert"]:
+        Session.bulk_insert_mappings(Se, diff["se"]["insert"])
+    if diff["se"]["update"]:
+        Session.bulk_update_mappings(Se, diff["se"]["update"])
+    operations = diff["operations"]
+    if operations["insert"]:
+        Session.bulk_insert_mappings(OperationConfig, operations["insert"])
+    if operations["update"]:
+        Session.bulk_update_mappings(OperationConfig, operations["update"])
+    if operations["delete"]:
+        table = OperationConfig.__table__
+        Session.execute(
+            table.delete().where(
+                and_(
+                    table.c.vo_name == bindparam("b_vo_name"),
+                    table.c.host == bindparam("b_host"),
+                    table.c.operation == bindparam("b_operation"),
+                )
+            ),
+            [
+                {"b_" + key: value for key, value in row.items()}
+                for row in operations["delete"]
+            ],
+        )
+
+
 @authorize(CONFIG)
 @jsonify
 def set_se_config():
     """
-    Set the configuration parameters for a given SE
+    Set the configuration parameters for one or several SE
+
+    The existing configuration is loaded at once, and only the differences are
+    written, together with the audit, in a single transaction. With dry_run,
+    the differences are returned without applying them.
     """
     input_dict = get_input_as_dict(request)
+    dry_run = request.args.get("dry_run", "false").lower() in ["true", "yes", "on"]
     try:
-        for storage, cfg in input_dict.items():
-            if not storage or storage.isspace():
-                raise ValueError
-            se_info = None
-            se_info_new = cfg.get("se_info", None)
-            if se_info_new:
-                se_info = Session.query(Se).get(storage)
-                if not se_info:
-                    se_info = Se(storage=storage)
-                for key, value in se_info_new.items():
-                    if value is not None:  # Only proceed if value is not None
-                        value = validate_type(
-                            Se, key, value
-                        )  # Validate data type for DB
-                        if key == "tpc_support":
-                            _validate_tpc_support(
-                                key, value
-                            )  # Check tpc_support has a valid value
-                        setattr(se_info, key, value)
-
-                audit_configuration(
-                    "set-se-config", "Set config %s: %s" % (storage, json.dumps(cfg))
-                )
-                Session.merge(se_info)
-
-            # Operation limits
-            operations = cfg.get("operations", None)
-            if operations:
-                for vo, limits in operations.items():
-                    vo = validate_type(OperationConfig, "vo_name", vo)
-                    for op, limit in limits.items():
-                        op = validate_type(OperationConfig, "operation", op)
-                        limit = validate_type(OperationConfig, "concurrent_ops", limit)
-                        limit = int(limit)
-                        new_limit = Session.query(OperationConfig).get(
-                            (vo, storage, op)
-                        )
-                        if limit > 0:
-                            if not new_limit:
-                                new_limit = OperationConfig(
-                                    vo_name=vo, host=storage, operation=op
-                                )
-                            new_limit.concurrent_ops = limit
-                            Session.merge(new_limit)
-                        elif new_limit:
-                            Session.delete(new_limit)
-                audit_configuration(
-                    "set-se-limits",
-                    "Set limits for %s: %s" % (storage, json.dumps(operations)),
-                )
+        se_infos, limits, audits = _parse_se_config(input_dict)
+        diff = _diff_se_config(se_infos, limits)
+        if dry_run:
+            return diff
+        _apply_se_config(diff)
+        for action, config in audits:
+            audit_configuration(action, config, commit=False)
         Session.commit()
     except (AttributeError, ValueError):
         Session.rollback()
@@ -110,7 +194,7 @@ def set_se_config():
     except Exception:
         Session.rollback()
         raise
-    return se_info, operations
+    return diff
 
 
 @authorize(CONFIG)
@@ -19,7 +19,7 @@ from flask import request, Response
 from werkzeug.exceptions import BadRequest
 
 from fts3rest.model import *
-from fts3rest.controllers.config import audit_configuration
+from fts3rest.controllers.config import audit_configuration, list_configuration
 from fts3rest.lib.helpers.jsonify import jsonify
 from fts3rest.lib.helpers.misc import get_input_as_dict
 from fts3rest.lib.middleware.fts3auth.authorization import authorize
@@ -87,7 +87,7 @@ def get_shares():
     """
     List the existing shares
     """
-    return Session.query(ShareConfig).all()
+    return list_configuration(Session.query(ShareConfig))
 
 
 @authorize(CONFIG)
@@ -20,14 +20,16 @@ from werkzeug.exceptions import (
     InternalServerError,
     ServiceUnavailable,
 )
-from flask import request
+from flask import request, current_app, Response
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 
+# list() is a view of this module
+import builtins
+import collections
 import errno
 import logging
-import os
 from stat import S_ISDIR
-import tempfile
 from urllib.parse import urlparse, unquote_plus
 
 
@@ -36,7 +38,9 @@ import json
 from fts3rest.model import Credential
 from fts3rest.model.meta import Session
 from fts3rest.lib.http_exceptions import HTTPAuthenticationTimeout
-from fts3rest.lib.gfal2_wrapper import Gfal2Wrapper, Gfal2Error
+from fts3rest.lib.api.schema_validator import compile_schema, SchemaValidationError
+from fts3rest.lib.gfal2_wrapper import get_worker_pool, Gfal2Error
+from fts3rest.lib.helpers.misc import get_input_as_dict
 from fts3rest.lib.middleware.fts3auth.authorization import authorize
 from fts3rest.lib.middleware.fts3auth.constants import DATAMANAGEMENT
 from fts3rest.lib.helpers.jsonify import jsonify
@@ -73,14 +77,8 @@ def _get_credentials():
             raise HTTPAuthenticationTimeout(
                 "Delegated proxy expired (%s)" % user.delegation_id
             )
-
-        tmp_file = tempfile.NamedTemporaryFile(
-            mode="w", suffix=".pem", prefix="rest-proxy-", delete=False
-        )
-        tmp_file.write(cred.proxy)
-        tmp_file.flush()
-        os.fsync(tmp_file.fileno())
-        return tmp_file
+        # The gfal2 workers keep the proxy in their own files
+        return cred
     else:
         if cred.termination_time <= datetime.utcnow():
             raise HTTPAuthenticationTimeout(
@@ -107,23 +105,57 @@ def _http_error_from_gfal2_error(error):
     raise _http_status_from_errno(error.errno)("[%d] %s" % (error.errno, error.message))
 
 
+def _gfal2_pool():
+    return get_worker_pool(
+        int(current_app.config.get("fts3.Gfal2Workers", 4)),
+        int(current_app.config.get("fts3.Gfal2WorkerMaxCalls", 1000)),
+    )
+
+
+def _gfal2_call(cred, method, *args, options=None):
+    """
+    Run method in one of the gfal2 workers of this process
+    """
+    timeout = int(current_app.config.get("fts3.Gfal2Timeout", 30))
+    try:
+        return _gfal2_pool().call(cred, method, *args, timeout=timeout, options=options)
+    except Gfal2Error as ex:
+        _http_error_from_gfal2_error(ex)
+
+
+def _gfal2_stream(cred, method, *args):
+    """
+    Run the generator method in one of the gfal2 workers of this process,
+    and iterate over the items as they come
+    """
+    timeout = int(current_app.config.get("fts3.Gfal2Timeout", 30))
+    try:
+        return _gfal2_pool().stream(cred, method, *args, timeout=timeout)
+    except Gfal2Error as ex:
+        _http_error_from_gfal2_error(ex)
+
+
 def _is_dropbox(uri):
     return uri.startswith("dropbox") and dropbox_available
 
 
-def _set_dropbox_headers(context):
-    # getting the tokens and add them to the context
+def _dropbox_options(uri):
+    """
+    gfal2 options needed to access uri, if it is on dropbox
+    """
+    if not _is_dropbox(str(uri)):
+        return None
+    # getting the tokens and pass them to the context
     user = request.environ["fts3.User.Credentials"]
     dropbox_con = DropboxConnector(user.user_dn, "dropbox")
     dropbox_info = dropbox_con._get_dropbox_info()
     dropbox_user_info = dropbox_con._get_dropbox_user_info()
-    context.set_opt_string("DROPBOX", "APP_KEY", dropbox_info.app_key)
-    context.set_opt_string("DROPBOX", "APP_SECRET", dropbox_info.app_secret)
-    context.set_opt_string("DROPBOX", "ACCESS_TOKEN", dropbox_user_info.access_token)
-    context.set_opt_string(
-        "DROPBOX", "ACCESS_TOKEN_SECRET", dropbox_user_info.access_token_secret
-    )
-    return context
+    return [
+        ("DROPBOX", "APP_KEY", dropbox_info.app_key),
+        ("DROPBOX", "APP_SECRET", dropbox_info.app_secret),
+        ("DROPBOX", "ACCESS_TOKEN", dropbox_user_info.access_token),
+        ("DROPBOX", "ACCESS_TOKEN_SECRET", dropbox_user_info.access_token_secret),
+    ]
 
 
 def _stat_impl(context, surl):
@@ -138,21 +170,29 @@ def _stat_impl(context, surl):
     }
 
 
-def _list_impl(context, surl):
+def _list_impl(context, surl, marker=None, limit=None):
     dir_handle = context.opendir(surl)
-    listing = {}
     (entry, st_stat) = dir_handle.readpp()
-    while entry:
+    if marker:
+        # Resume after the last entry of the previous page
+        marker = marker.rstrip("/")
+        while entry and entry.d_name != marker:
+            (entry, st_stat) = dir_handle.readpp()
+        if entry:
+            (entry, st_stat) = dir_handle.readpp()
+    count = 0
+    while entry and (not limit or count < limit):
         d_name = entry.d_name
         if S_ISDIR(st_stat.st_mode):
             d_name += "/"
-        listing[d_name] = {
+        yield {
+            "name": d_name,
             "size": st_stat.st_size,
             "mode": st_stat.st_mode,
             "mtime": st_stat.st_mtime,
         }
+        count += 1
         (entry, st_stat) = dir_handle.readpp()
-    return listing
 
 
 def _rename_impl(context, rename_dict):
@@ -162,9 +202,6 @@ def _rename_impl(context, rename_dict):
     old_path = rename_dict["old"]
     new_path = rename_dict["new"]
 
-    if _is_dropbox(str(old_path)):
-        context = _set_dropbox_headers(context)
-
     return context.rename(str(old_path), str(new_path))
 
 
@@ -174,9 +211,6 @@ def _unlink_impl(context, unlink_dict):
 
     path = unlink_dict["surl"]
 
-    if _is_dropbox(str(path)):
-        context = _set_dropbox_headers(context)
-
     return context.unlink(str(path))
 
 
@@ -186,9 +220,6 @@ def _rmdir_impl(context, rmdir_dict):
 
     path = rmdir_dict["surl"]
 
-    if _is_dropbox(str(path)):
-        context = _set_dropbox_headers(context)
-
     return context.rmdir(str(path))
 
 
@@ -198,30 +229,63 @@ def _mkdir_impl(context, mkdir_dict):
 
     path = mkdir_dict["surl"]
 
-    if _is_dropbox(str(path)):
-        context = _set_dropbox_headers(context)
-
     return context.mkdir(str(path), 0o775)
 
 
+def _stream_entries(entries):
+    """
+    Send the entries as they come. The status is sent by then, so a failure
+    is reported on the last line.
+    """
+    try:
+        for entry in entries:
+            yield entry
+    except Gfal2Error as ex:
+        log.info("gfal2 error: errno = %d %s" % (ex.errno, ex.message))
+        yield {"error": {"errno": ex.errno, "message": ex.message}}
+    finally:
+        entries.close()
+
+
 @authorize(DATAMANAGEMENT)
 @jsonify
 def list():
     """
     List the content of a remote directory
+
+    The listing can be paginated with limit, and marker, the name of the last
+    entry of the previous page. If application/x-ndjson is accepted, the entries
+    are sent one per line as they are read.
     """
     surl = _get_valid_surl()
+    marker = request.values.get("marker", None)
+    limit = request.values.get("limit", None)
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise BadRequest("Invalid limit")
+        if limit < 1:
+            raise BadRequest("Invalid limit")
+    ndjson = (
+        request.accept_mimetypes.best_match(
+            ["application/json", "application/x-ndjson"], default="application/json"
+        )
+        == "application/x-ndjson"
+    )
     cred = _get_credentials()
 
-    m = Gfal2Wrapper(cred, _list_impl)
+    entries = _gfal2_stream(cred, _list_impl, surl, marker, limit)
+    if ndjson:
+        return Response(_stream_entries(entries), mimetype="application/x-ndjson")
+
+    listing = {}
     try:
-        return m(surl)
+        for entry in entries:
+            listing[entry.pop("name")] = entry
     except Gfal2Error as ex:
         _http_error_from_gfal2_error(ex)
-    finally:
-        # Delete the temp file if we are using a certificate based auth method
-        if not isinstance(cred, str):
-            os.unlink(cred.name)
+    return listing
 
 
 @authorize(DATAMANAGEMENT)
@@ -233,15 +297,7 @@ def stat():
     surl = _get_valid_surl()
     cred = _get_credentials()
 
-    m = Gfal2Wrapper(cred, _stat_impl)
-    try:
-        return m(surl)
-    except Gfal2Error as ex:
-        _http_error_from_gfal2_error(ex)
-    finally:
-        # Delete the temp file if we are using a certificate based auth method
-        if not isinstance(cred, str):
-            os.unlink(cred.name)
+    return _gfal2_call(cred, _stat_impl, surl)
 
 
 @authorize(DATAMANAGEMENT)
@@ -262,21 +318,18 @@ def mkdir():
             raise BadRequest("Unsupported method %s" % request.method)
 
         mkdir_dict = json.loads(unencoded_body)
-        m = Gfal2Wrapper(cred, _mkdir_impl)
-        try:
-            return m(mkdir_dict)
-        except Gfal2Error as ex:
-            _http_error_from_gfal2_error(ex)
+        return _gfal2_call(
+            cred,
+            _mkdir_impl,
+            mkdir_dict,
+            options=_dropbox_options(mkdir_dict["surl"]),
+        )
     except ValueError as ex:
         raise BadRequest("Invalid value within the request: %s" % str(ex))
     except TypeError as ex:
         raise BadRequest("Malformed request: %s" % str(ex))
     except KeyError as ex:
         raise BadRequest("Missing parameter: %s" % str(ex))
-    finally:
-        # Delete the temp file if we are using a certificate based auth method
-        if not isinstance(cred, str):
-            os.unlink(cred.name)
 
 
 @authorize(DATAMANAGEMENT)
@@ -297,12 +350,12 @@ def unlink():
             raise BadRequest("Unsupported method %s" % request.method)
 
         unlink_dict = json.loads(unencoded_body)
-
-        m = Gfal2Wrapper(cred, _unlink_impl)
-        try:
-            return m(unlink_dict)
-        except Gfal2Error as ex:
-            _http_error_from_gfal2_error(ex)
+        return _gfal2_call(
+            cred,
+            _unlink_impl,
+            unlink_dict,
+            options=_dropbox_options(unlink_dict["surl"]),
+        )
 
     except ValueError as ex:
         raise BadRequest("Invalid value within the request: %s" % str(ex))
@@ -310,10 +363,6 @@ def unlink():
         raise BadRequest("Malformed request: %s" % str(ex))
     except KeyError as ex:
         raise BadRequest("Missing parameter: %s" % str(ex))
-    finally:
-        # Delete the temp file if we are using a certificate based auth method
-        if not isinstance(cred, str):
-            os.unlink(cred.name)
 
 
 @authorize(DATAMANAGEMENT)
@@ -334,12 +383,12 @@ def rmdir():
             raise BadRequest("Unsupported method %s" % request.method)
 
         rmdir_dict = json.loads(unencoded_body)
-
-        m = Gfal2Wrapper(cred, _rmdir_impl)
-        try:
-            return m(rmdir_dict)
-        except Gfal2Error as ex:
-            _http_error_from_gfal2_error(ex)
+        return _gfal2_call(
+            cred,
+            _rmdir_impl,
+            rmdir_dict,
+            options=_dropbox_options(rmdir_dict["surl"]),
+        )
 
     except ValueError as ex:
         raise BadRequest("Invalid value within the request: %s" % str(ex))
@@ -347,10 +396,6 @@ def rmdir():
         raise BadRequest("Malformed request: %s" % str(ex))
     except KeyError as ex:
         raise BadRequest("Missing parameter: %s" % str(ex))
-    finally:
-        # Delete the temp file if we are using a certificate based auth method
-        if not isinstance(cred, str):
-            os.unlink(cred.name)
 
 
 @authorize(DATAMANAGEMENT)
@@ -372,12 +417,12 @@ def rename():
             raise BadRequest("Unsupported method %s" % request.method)
 
         rename_dict = json.loads(unencoded_body)
-
-        m = Gfal2Wrapper(cred, _rename_impl)
-        try:
-            return m(rename_dict)
-        except Gfal2Error as ex:
-            _http_error_from_gfal2_error(ex)
+        return _gfal2_call(
+            cred,
+            _rename_impl,
+            rename_dict,
+            options=_dropbox_options(rename_dict["old"]),
+        )
 
     except ValueError as ex:
         raise BadRequest("Invalid value within the request: %s" % str(ex))
@@ -385,7 +430,158 @@ def rename():
         raise BadRequest("Malformed request: %s" % str(ex))
     except KeyError as ex:
         raise BadRequest("Missing parameter: %s" % str(ex))
+
+
+_BATCH_OPERATIONS = {
+    "stat": _stat_impl,
+    "mkdir": _mkdir_impl,
+    "unlink": _unlink_impl,
+    "rmdir": _rmdir_impl,
+}
+
+_validate_batch_operation = compile_schema(
+    {
+        "type": "object",
+        "required": ["op", "surl"],
+        "properties": {"op": {"type": "string"}, "surl": {"type": "string"}},
+    }
+)
+
+
+def _batch_hook(max_operations):
+    def validate(index, operation):
+        try:
+            if max_operations and index >= max_operations:
+                raise SchemaValidationError(
+                    "more than %d operations in the batch" % max_operations
+                )
+            _validate_batch_operation(operation)
+            if operation["op"] not in _BATCH_OPERATIONS:
+                raise SchemaValidationError(
+                    "unsupported operation '%s'" % operation["op"]
+                )
+            if urlparse(operation["surl"]).scheme in ["file"]:
+                raise SchemaValidationError("forbidden SURL scheme")
+        except SchemaValidationError as ex:
+            ex.segments.extend([index, "operations"])
+            raise
+
+    return validate
+
+
+def _run_operation(pool, cred, index, operation, timeout, options):
+    op, surl = operation["op"], operation["surl"]
+    arg = surl if op == "stat" else {"surl": surl}
+    result = {"index": index, "op": op, "surl": surl}
+    try:
+        result["result"] = pool.call(
+            cred, _BATCH_OPERATIONS[op], arg, timeout=timeout, options=options
+        )
+        result["status"] = 200
+    except Gfal2Error as ex:
+        result["status"] = _http_status_from_errno(ex.errno).code
+        result["message"] = "[%d] %s" % (ex.errno, ex.message)
+    return result
+
+
+def _run_batch(pool, cred, operations, concurrency, host_concurrency, timeout, options):
+    """
+    Run the operations in the gfal2 workers, at most concurrency at a time
+    and host_concurrency per storage, and yield the results as they complete
+    """
+    queues = collections.OrderedDict()
+    for index, operation in enumerate(operations):
+        host = urlparse(operation["surl"]).netloc
+        queues.setdefault(host, collections.deque()).append(index)
+
+    running = {}
+    running_per_host = collections.Counter()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        while queues or running:
+            for host in builtins.list(queues.keys()):
+                pending = queues[host]
+                while (
+                    pending
+                    and len(running) < concurrency
+                    and running_per_host[host] < host_concurrency
+                ):
+                    index = pending.popleft()
+                    operation = operations[index]
+                    future = executor.submit(
+                        _run_operation,
+                        pool,
+                        cred,
+                        index,
+                        operation,
+                        timeout,
+                        options if _is_dropbox(operation["surl"]) else None,
+                    )
+                    running[future] = host
+                    running_per_host[host] += 1
+                if not pending:
+                    del queues[host]
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                running_per_host[running.pop(future)] -= 1
+                yield future.result()
     finally:
-        # Delete the temp file if we are using a certificate based auth method
-        if not isinstance(cred, str):
-            os.unlink(cred.name)
+        # If the client went away, the operations already running are left
+        # to finish, but no new one is started
+        executor.shutdown(wait=False)
+
+
+@authorize(DATAMANAGEMENT)
+@jsonify
+def batch():
+    """
+    Run several stat, mkdir, unlink or rmdir at once
+
+    The body is {"operations": [{"op": "stat", "surl": "..."}, ...]}. The results
+    are sent, as they complete, one per line, with the index of the operation,
+    and the status the equivalent single request would have had.
+    """
+    try:
+        operations = get_input_as_dict(
+            request,
+            stream=True,
+            max_size=current_app.config.get("fts3.MaxSubmissionSize", 0),
+            item_hooks={
+                "operations": _batch_hook(
+                    int(current_app.config.get("fts3.DmBatchMaxOperations", 10000))
+                )
+            },
+        ).get("operations")
+    except SchemaValidationError as ex:
+        if ex.malformed:
+            raise BadRequest("Malformed request: %s" % str(ex))
+        raise BadRequest("Invalid value within the request: %s" % str(ex))
+    if not isinstance(operations, builtins.list) or not operations:
+        raise BadRequest("Malformed request: operations: expected a non empty array")
+
+    # Resolved once for all the operations
+    cred = _get_credentials()
+    options = None
+    for operation in operations:
+        if _is_dropbox(operation["surl"]):
+            options = _dropbox_options(operation["surl"])
+            break
+
+    pool = _gfal2_pool()
+    # At least one of each, or the batch would never make progress
+    concurrency = max(
+        1, min(int(current_app.config.get("fts3.DmBatchConcurrency", 4)), pool.size)
+    )
+    host_concurrency = max(
+        1, int(current_app.config.get("fts3.DmBatchHostConcurrency", 2))
+    )
+    results = _run_batch(
+        pool,
+        cred,
+        operations,
+        concurrency,
+        host_concurrency,
+        int(current_app.config.get("fts3.Gfal2Timeout", 30)),
+        options,
+    )
+    return Response(results, status=207, mimetype="application/x-ndjson")
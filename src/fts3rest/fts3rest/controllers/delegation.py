@@ -29,6 +29,8 @@ from flask.views import View
 from fts3rest.model import CredentialCache, Credential
 from fts3rest.model.meta import Session
 from fts3rest.lib.helpers.voms import VomsClient, VomsException
+from fts3rest.lib.helpers import metrics
+from fts3rest.lib.helpers.keypool import get_key_pool
 from fts3rest.lib.middleware.fts3auth.authorization import require_certificate
 from fts3rest.lib.JobBuilder_utils import get_base_id, get_vo_id
 from fts3rest.templates.mako import render_template
@@ -59,17 +61,21 @@ def _populated_x509_name(components):
     return x509_name
 
 
-def _generate_proxy_request(key_len=2048):
+def _generate_proxy_request(key_len=2048, key_pool=None):
     """
     Generates a X509 proxy request.
 
     Args:
-        key_len: Length of the RSA key in bits
+        key_len:  Length of the RSA key in bits
+        key_pool: If given, the RSA key is taken from this pool
 
     Returns:
         A tuple (X509 request, generated private key)
     """
-    key_pair = RSA.gen_key(key_len, 65537, callback=_mute_callback)
+    if key_pool is not None:
+        key_pair = key_pool.get()
+    else:
+        key_pair = RSA.gen_key(key_len, 65537, callback=_mute_callback)
     pkey = EVP.PKey()
     pkey.assign_rsa(key_pair)
     x509_request = X509.Request()
@@ -343,9 +349,15 @@ class request(Delegation):
                 log.debug(
                     "Invalidating cache due to key length missmatch between client and cached certificates"
                 )
+        metrics.CACHE_REQUESTS.inc("delegation_request", "hit" if cached else "miss")
 
         if not cached:
-            (x509_request, private_key) = _generate_proxy_request(request_key_len)
+            key_pool = get_key_pool(
+                request_key_len, int(app.config.get("fts3.DelegationKeyPoolSize", 4))
+            )
+            (x509_request, private_key) = _generate_proxy_request(
+                request_key_len, key_pool
+            )
             credential_cache = CredentialCache(
                 dlg_id=user.delegation_id,
                 dn=user.user_dn,
@@ -359,7 +371,10 @@ class request(Delegation):
             except Exception:
                 Session.rollback()
                 raise
-            log.debug("Generated new credential request for %s" % dlg_id)
+            log.debug(
+                "Generated new credential request for %s (key pool depth %d)"
+                % (dlg_id, key_pool.metrics()["depth"])
+            )
         else:
             log.debug("Using cached request for %s" % dlg_id)
         resp = Response([credential_cache.cert_request], mimetype="text/plain")
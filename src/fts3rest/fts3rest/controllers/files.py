@@ -19,7 +19,7 @@ from urllib.parse import urlparse
 import logging
 
 from fts3rest.model import File
-from fts3rest.model.meta import Session
+from fts3rest.model.meta import Session, read_only
 from fts3rest.lib.JobBuilder_utils import get_storage_element
 from fts3rest.lib.middleware.fts3auth.authorization import authorize
 from fts3rest.lib.middleware.fts3auth.constants import *
@@ -33,6 +33,7 @@ Operations on Files
 
 
 @authorize(TRANSFER)
+@read_only
 @jsonify
 def index():
     """
@@ -18,6 +18,7 @@ from werkzeug.exceptions import Forbidden, BadRequest, NotFound, Conflict
 
 from datetime import datetime, timedelta
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy import func
 from sqlalchemy.orm import noload
 
 import base64
@@ -31,12 +32,14 @@ from fts3rest.model import (
     File,
     JobActiveStates,
     FileActiveStates,
+    FileDraftStates,
     Token,
     PostgresFile,
+    BannedSE,
 )
 from fts3rest.model import DataManagement, DataManagementActiveStates
 from fts3rest.model import Credential, FileRetryLog
-from fts3rest.model.meta import Session
+from fts3rest.model.meta import Session, read_only
 
 from fts3rest.lib.http_exceptions import *
 from fts3rest.lib.middleware.fts3auth.authorization import (
@@ -51,11 +54,18 @@ from fts3rest.lib.middleware.fts3auth.constants import (
     VO,
     CONFIG,
 )
+from fts3rest.lib.api.schema_validator import SchemaValidationError
+from fts3rest.lib.api.submit_schema import (
+    validate_add_files_header,
+    validate_submission_header,
+    validate_transfer,
+)
 from fts3rest.lib.helpers.misc import get_input_as_dict
+from fts3rest.lib.helpers import metrics
 from fts3rest.lib.helpers.jsonify import jsonify
 from fts3rest.lib.helpers.msgbus import submit_state_change
 from fts3rest.lib.JobBuilder import JobBuilder
-from fts3rest.lib.JobBuilder_utils import safe_issuer
+from fts3rest.lib.JobBuilder_utils import safe_issuer, safe_flag
 
 from fts3rest.lib.middleware.fts3auth.methods import oauth2
 
@@ -68,26 +78,21 @@ Operations on jobs and transfers
 
 def profile_request(func):
     """
-    Wraps request to get relevant parameters, log them for fluent bit to pick them up.
+    Wraps request to count them per VO, method and response status
     """
 
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         user = request.environ["fts3.User.Credentials"]
-        vo = user.vos[0]
-        request_type = request.method
-        request_path = request.path
         response = func(*args, **kwargs)
-        response_status_code = response.status_code
-        log.info(
-            f"[profiling::jobs] vo={vo} method={request_type} response_status={response_status_code} path={request_path}"
-        )
+        metrics.JOB_REQUESTS.inc(user.vos[0], request.method, str(response.status_code))
         return response
 
     return wrapper
 
 
 @authorize(TRANSFER)
+@read_only
 @profile_request
 @jsonify
 def index():
@@ -800,10 +805,12 @@ def set_file_states_to_token_prep_as_necessary(job_id, file_rows, token_rows):
     token_ids = get_token_ids_from_file_rows(file_rows)
     start_get_refreshless_token_ids = time.perf_counter()
     refreshless_token_ids = get_refreshless_token_ids(token_ids)
+    db_secs = time.perf_counter() - start_get_refreshless_token_ids
+    metrics.DB_OPERATION_SECONDS.observe(db_secs, "get_refreshless_token_ids")
     log.info(
         "Got tokens with no associated refresh tokens:"
         f" job_id={job_id}"
-        f" db_secs={time.perf_counter() - start_get_refreshless_token_ids}"
+        f" db_secs={db_secs}"
         f" nb_tokens_checked={len(token_ids)}"
         f" nb_refreshless_tokens={len(refreshless_token_ids)}"
     )
@@ -952,6 +959,7 @@ def insert_tokens(job_id, tokens):
                 raise
 
     db_secs = time.perf_counter() - started
+    metrics.DB_OPERATION_SECONDS.observe(db_secs, "insert_tokens")
     log.info(
         f"Inserted tokens into database: job_id={job_id} db_secs={db_secs} nb_inserted={nb_inserted} nb_duplicate={nb_duplicate}"
     )
@@ -996,43 +1004,36 @@ def _get_queue_counts(files):
     return result
 
 
-def _inc_t_queue_counter(
-    dbconn, vo_name, source_se, dest_se, activity, file_state, delta
-):
-    # Assume for now the t_queue row exists
-    update_sql = """
-        UPDATE
-            t_queue
-        SET
-            nb_files = nb_files + %(delta)s
-        WHERE
-            vo_name = %(vo_name)s
-        AND
-            source_se = %(source_se)s
-        AND
-            dest_se = %(dest_se)s
-        AND
-            activity = %(activity)s
-        AND
-            file_state = %(file_state)s
-        RETURNING
-            queue_id
+def _inc_t_queue_counters(dbconn, auth_method, queue_counts):
     """
-    update_params = {
-        "delta": delta,
-        "vo_name": vo_name,
-        "source_se": source_se,
-        "dest_se": dest_se,
-        "activity": activity,
-        "file_state": file_state,
-    }
-    rows = dbconn.execute(update_sql, update_params).fetchall()
-    if len(rows) > 0:
-        queue_id = rows[0][0]
-        return queue_id
+    Increment the t_queue counters of all the given queues in one single
+    statement, creating the rows that do not exist yet.
+
+    The rows are sent sorted by key, so concurrent submissions to the same links
+    lock them in the same order and can not deadlock each other.
 
-    # The t_queue row did not exist so create one
-    insert_sql = """
+    Returns:
+        A dictionary (vo_name, source_se, dest_se, activity) => queue_id
+    """
+    if not queue_counts:
+        return {}
+
+    values = []
+    params = {}
+    for index, (key, count) in enumerate(sorted(queue_counts.items())):
+        vo_name, source_se, dest_se, activity, file_state = key
+        values.append(
+            f"(%(vo_name_{index})s, %(source_se_{index})s, %(dest_se_{index})s,"
+            f" %(activity_{index})s, %(file_state_{index})s, %(delta_{index})s)"
+        )
+        params[f"vo_name_{index}"] = vo_name
+        params[f"source_se_{index}"] = source_se
+        params[f"dest_se_{index}"] = dest_se
+        params[f"activity_{index}"] = activity
+        params[f"file_state_{index}"] = file_state
+        params[f"delta_{index}"] = count
+
+    upsert_sql = f"""
         INSERT INTO t_queue (
             vo_name,
             source_se,
@@ -1040,59 +1041,27 @@ def _inc_t_queue_counter(
             activity,
             file_state,
             nb_files
-        ) VALUES (
-            %(vo_name)s,
-            %(source_se)s,
-            %(dest_se)s,
-            %(activity)s,
-            %(file_state)s,
-            %(delta)s
-        )
+        ) VALUES
+            {", ".join(values)}
         ON CONFLICT (vo_name, source_se, dest_se, activity, file_state) DO
             UPDATE SET nb_files =
                 t_queue.nb_files + EXCLUDED.nb_files
         RETURNING
-            queue_id
-    """
-    insert_params = {
-        "vo_name": vo_name,
-        "source_se": source_se,
-        "dest_se": dest_se,
-        "activity": activity,
-        "file_state": file_state,
-        "delta": delta,
-    }
-    rows = dbconn.execute(insert_sql, insert_params).fetchall()
-    if len(rows) != 1:
+            queue_id,
+            vo_name,
+            source_se,
+            dest_se,
+            activity
+    """  # nosec
+    rows = dbconn.execute(upsert_sql, params).fetchall()
+    if len(rows) != len(queue_counts):
         raise Exception(
-            f"Failed to increment t_queue counter: vo_name={vo_name} source_se={source_se} dest_se={dest_se} file_state={file_state} delta={delta}"
+            f"Failed to increment t_queue counters: expected={len(queue_counts)} returned={len(rows)}"
         )
-    queue_id = rows[0][0]
-    return queue_id
-
 
-def _inc_t_queue_counters(dbconn, auth_method, queue_counts):
     result = {}
-    counter_col = "nb_token_prep" if auth_method == "oauth2" else "nb_submitted"
-
-    for (
-        vo_name,
-        source_se,
-        dest_se,
-        activity,
-        file_state,
-    ), count in queue_counts.items():
-        queue_id = _inc_t_queue_counter(
-            dbconn=dbconn,
-            vo_name=vo_name,
-            source_se=source_se,
-            dest_se=dest_se,
-            activity=activity,
-            file_state=file_state,
-            delta=count,
-        )
-        composite_queue_id = (vo_name, source_se, dest_se, activity)
-        result[composite_queue_id] = queue_id
+    for queue_id, vo_name, source_se, dest_se, activity in rows:
+        result[(vo_name, source_se, dest_se, activity)] = queue_id
     return result
 
 
@@ -1111,6 +1080,59 @@ def _create_postgres_files(mysql_files, composite_queue_id_to_id):
     return postgres_files
 
 
+def _validate_delegation(user):
+    """
+    The auto-generated delegation id of users authenticated with a
+    certificate must be valid
+    """
+    if user.method != "certificate":
+        return
+    credential = Session.query(Credential).get((user.delegation_id, user.user_dn))
+    if credential is None:
+        raise HTTPAuthenticationTimeout('No delegation found for "%s"' % user.user_dn)
+    if credential.expired():
+        remaining = credential.remaining()
+        seconds = abs(remaining.seconds + remaining.days * 24 * 3600)
+        raise HTTPAuthenticationTimeout(
+            "The delegated credentials expired %d seconds ago (%s)"
+            % (seconds, user.delegation_id)
+        )
+    if credential.remaining() < timedelta(hours=1):
+        raise HTTPAuthenticationTimeout(
+            "The delegated credentials has less than one hour left (%s)"
+            % user.delegation_id
+        )
+
+
+def _insert_files(files, auth_method):
+    """
+    Bulk insert the files, keeping the t_queue counters up to date on PostgreSQL
+    """
+    if current_app.config["fts3.DbType"] == "mysql":
+        Session.execute(File.__table__.insert(), files)
+    else:
+        queue_counts = _get_queue_counts(files)
+        composite_queue_id_to_id = _inc_t_queue_counters(
+            Session.connection(), auth_method, queue_counts
+        )
+        postgres_files = _create_postgres_files(files, composite_queue_id_to_id)
+        Session.execute(PostgresFile.__table__.insert(), postgres_files)
+
+
+def _raise_schema_error(ex):
+    if ex.malformed:
+        raise BadRequest("Malformed request: %s" % str(ex))
+    raise BadRequest("Invalid value within the request: %s" % str(ex))
+
+
+def _validate_streamed_transfer(index, transfer):
+    try:
+        validate_transfer(transfer)
+    except SchemaValidationError as ex:
+        ex.segments.extend([index, "files"])
+        raise
+
+
 @authorize(TRANSFER)
 @profile_request
 @jsonify
@@ -1123,32 +1145,30 @@ def submit():
     It can be used to validate (i.e in Python, jsonschema.validate)
     """
     log.debug("submitting job")
-    log.debug("submit::request.data={}".format(str(request.data)))
-    log.debug("submit::request.values={}".format(str(request.values)))
-    # First, the request has to be valid JSON
-    submitted_dict = get_input_as_dict(request)
+    log.debug("submit::request.content_length={}".format(request.content_length))
+    # First, the request has to be valid JSON. The body is decoded from the
+    # stream, and each transfer is validated as soon as it has been read,
+    # so a large submission is never held twice in memory
+    try:
+        submitted_dict = get_input_as_dict(
+            request,
+            stream=True,
+            max_size=current_app.config.get("fts3.MaxSubmissionSize", 0),
+            item_hooks={"files": _validate_streamed_transfer},
+        )
+    except SchemaValidationError as ex:
+        _raise_schema_error(ex)
 
     user = request.environ["fts3.User.Credentials"]
+    _validate_delegation(user)
 
-    if user.method == "certificate":
-        # The auto-generated delegation id must be valid
-        credential = Session.query(Credential).get((user.delegation_id, user.user_dn))
-        if credential is None:
-            raise HTTPAuthenticationTimeout(
-                'No delegation found for "%s"' % user.user_dn
-            )
-        if credential.expired():
-            remaining = credential.remaining()
-            seconds = abs(remaining.seconds + remaining.days * 24 * 3600)
-            raise HTTPAuthenticationTimeout(
-                "The delegated credentials expired %d seconds ago (%s)"
-                % (seconds, user.delegation_id)
-            )
-        if credential.remaining() < timedelta(hours=1):
-            raise HTTPAuthenticationTimeout(
-                "The delegated credentials has less than one hour left (%s)"
-                % user.delegation_id
-            )
+    # Reject submissions that do not follow the schema in one single pass,
+    # before the builder starts doing any work. Streamed transfers have
+    # already been validated.
+    try:
+        validate_submission_header(submitted_dict)
+    except SchemaValidationError as ex:
+        _raise_schema_error(ex)
 
     # Populate the job and files
     populated = JobBuilder(request, **submitted_dict)
@@ -1193,6 +1213,12 @@ def submit():
                     f"Transfer access-token has unknown issuer: issuer={transfer_token_row['issuer']}"
                 )
 
+    # Draft jobs are kept on hold until sealed, so more files can be appended
+    draft = safe_flag(populated.params.get("draft", False))
+    if draft:
+        _validate_draft(user, populated)
+        _park_draft_files(populated.files)
+
     log.info("%s (%s) is submitting a transfer job" % (user.user_dn, user.vos[0]))
 
     if populated.tokens:
@@ -1212,29 +1238,23 @@ def submit():
         try:
             start_insert_job = time.perf_counter()
             Session.execute(Job.__table__.insert(), [populated.job])
+            db_secs = time.perf_counter() - start_insert_job
+            metrics.DB_OPERATION_SECONDS.observe(db_secs, "insert_job")
             log.info(
                 "Inserted job into database: job_id={} db_secs={}".format(
-                    populated.job_id, str(time.perf_counter() - start_insert_job)
+                    populated.job_id, str(db_secs)
                 )
             )
         except IntegrityError:
             raise Conflict("The sid provided by the user is duplicated")
 
         start_insert_files = time.perf_counter()
-        if current_app.config["fts3.DbType"] == "mysql":
-            Session.execute(File.__table__.insert(), populated.files)
-        else:
-            queue_counts = _get_queue_counts(populated.files)
-            composite_queue_id_to_id = _inc_t_queue_counters(
-                Session.connection(), user.method, queue_counts
-            )
-            postgres_files = _create_postgres_files(
-                populated.files, composite_queue_id_to_id
-            )
-            Session.execute(PostgresFile.__table__.insert(), postgres_files)
+        _insert_files(populated.files, user.method)
+        db_secs = time.perf_counter() - start_insert_files
+        metrics.DB_OPERATION_SECONDS.observe(db_secs, "insert_files")
         log.info(
             "Inserted files into database: job_id={} db_secs={}".format(
-                populated.job_id, str(time.perf_counter() - start_insert_files)
+                populated.job_id, str(db_secs)
             )
         )
         Session.flush()
@@ -1248,23 +1268,309 @@ def submit():
 
     # Send messages
     # Need to re-query so we get the file ids
-    job = Session.query(Job).get(populated.job_id)
-    for i in range(len(job.files)):
-        try:
-            submit_state_change(job, job.files[i], populated.files[0]["file_state"])
-        except Exception as ex:
-            log.warning("Failed to write state message to disk: %s" % str(ex))
+    # The messages of draft jobs are sent once they are sealed
+    if not draft:
+        job = Session.query(Job).get(populated.job_id)
+        for i in range(len(job.files)):
+            try:
+                submit_state_change(job, job.files[i], populated.files[0]["file_state"])
+            except Exception as ex:
+                log.warning("Failed to write state message to disk: %s" % str(ex))
 
     log.info(
-        "Job %s submitted: transfers=%d vo=%s method=%s fts_submit_token_issuer=%s fts_submit_token_aud=%s"
+        "Job %s submitted: transfers=%d vo=%s method=%s draft=%s fts_submit_token_issuer=%s fts_submit_token_aud=%s"
         % (
             populated.job_id,
             len(populated.files),
             user.vos[0],
             user.method,
+            draft,
             fts_submit_token_issuer,
             fts_submit_token_aud,
         )
     )
 
     return {"job_id": populated.job_id}
+
+
+def _validate_draft(user, populated):
+    """
+    Only jobs whose files are independent from each other can be submitted
+    in chunks
+    """
+    if user.method == "oauth2":
+        raise BadRequest("Draft jobs are not supported with token authentication")
+    if populated.job["job_type"] in ("H", "R"):
+        raise BadRequest("Multihop and multiple replica jobs can not be drafts")
+    if populated.is_qos_cdmi_transfer:
+        raise BadRequest("QoS transition jobs can not be drafts")
+
+
+def _park_draft_files(files):
+    """
+    Put the files of a draft job on hold, like a banning would do.
+    The state to enter once sealed is kept in file_state_initial, as for
+    TOKEN_PREP, so they are not confused with files held by a banning.
+    Files already held by a banning are parked too, so unbanning the storage
+    does not release them before the job is sealed.
+    """
+    held_states = {held: state for state, held in FileDraftStates.items()}
+    for file in files:
+        parked_state = FileDraftStates.get(file["file_state"])
+        if parked_state:
+            file["file_state_initial"] = file["file_state"]
+            file["file_state"] = parked_state
+        elif file["file_state"] in held_states:
+            file["file_state_initial"] = held_states[file["file_state"]]
+
+
+def _banned_links(parked):
+    """
+    Links of the parked files whose source or destination is banned with
+    WAIT_AS, and whose files must stay on hold when the draft is sealed
+    """
+    banned_ses = {}
+    for banned in Session.query(BannedSE).filter(BannedSE.status == "WAIT_AS"):
+        banned_ses.setdefault(banned.se, set()).add(banned.vo)
+    links = set()
+    for row in parked:
+        vo_name, source_se, dest_se = row[0], row[1], row[2]
+        for storage in (source_se, dest_se):
+            vos = banned_ses.get(storage, ())
+            if vo_name in vos or "*" in vos:
+                links.add((vo_name, source_se, dest_se))
+    return links
+
+
+def _draft_params(job):
+    """
+    Submission parameters that change how the files are expanded, recovered
+    from the draft job so every chunk is built the same way
+    """
+    return {
+        "draft": True,
+        "reuse": job.job_type == "Y",
+        "bring_online": job.bring_online,
+        "copy_pin_lifetime": job.copy_pin_lifetime,
+        "archive_timeout": job.archive_timeout,
+        "priority": job.priority,
+        "verify_checksum": job.verify_checksum or False,
+        "overwrite": job.overwrite_flag == "Y",
+        "overwrite_on_retry": job.overwrite_flag == "R",
+        "overwrite_when_only_on_disk": job.overwrite_flag == "D",
+    }
+
+
+def _lock_draft(job_id):
+    """
+    Lock the job row, serializing the chunks appended to the same job and its
+    sealing. Raises Conflict if the job is not a draft anymore.
+    """
+    job = Session.query(Job).filter(Job.job_id == job_id).with_for_update().one()
+    parked = (
+        Session.query(File.file_id)
+        .filter(File.job_id == job_id)
+        .filter(File.file_state.in_(FileDraftStates.values()))
+        .filter(File.file_state_initial.in_(FileDraftStates.keys()))
+        .first()
+    )
+    if job.job_state not in ("SUBMITTED", "STAGING") or parked is None:
+        raise Conflict("The job %s is not a draft, or it has been sealed" % job_id)
+    return job
+
+
+@authorize(TRANSFER)
+@profile_request
+@jsonify
+def add_files(job_id):
+    """
+    Append a chunk of transfers to a draft job
+
+    The files follow the same format as on submission, and the job parameters
+    are those given when the draft was created (see "draft" on /api-docs/schema/submit).
+    The files are kept on hold until the job is sealed.
+    """
+    job = _get_job(job_id)
+    user = request.environ["fts3.User.Credentials"]
+    _validate_delegation(user)
+
+    try:
+        submitted_dict = get_input_as_dict(
+            request,
+            stream=True,
+            max_size=current_app.config.get("fts3.MaxSubmissionSize", 0),
+            item_hooks={"files": _validate_streamed_transfer},
+        )
+        validate_add_files_header(submitted_dict)
+    except SchemaValidationError as ex:
+        _raise_schema_error(ex)
+
+    chunk = JobBuilder(
+        request, files=submitted_dict["files"], params=_draft_params(job)
+    )
+    _validate_draft(user, chunk)
+    if job.job_type == "Y" and (
+        chunk.job["source_se"] != job.source_se or chunk.job["dest_se"] != job.dest_se
+    ):
+        raise BadRequest(
+            "Reuse jobs must only contain transfers for the same source ad destination storage"
+        )
+    _park_draft_files(chunk.files)
+
+    try:
+        job = _lock_draft(job_id)
+        offset = (
+            Session.query(func.max(File.file_index))
+            .filter(File.job_id == job_id)
+            .scalar()
+        )
+        offset = 0 if offset is None else offset + 1
+        # Session reuse and staging files must keep sharing the same hash
+        shared_hashed_id = None
+        if job.job_type == "Y" or chunk.is_bringonline:
+            shared_hashed_id = (
+                Session.query(File.hashed_id)
+                .filter(File.job_id == job_id)
+                .limit(1)
+                .scalar()
+            )
+        for file in chunk.files:
+            file["job_id"] = job_id
+            file["file_index"] += offset
+            if shared_hashed_id is not None:
+                file["hashed_id"] = shared_hashed_id
+
+        if job.source_se and chunk.job["source_se"] != job.source_se:
+            job.source_se = None
+        if job.dest_se and chunk.job["dest_se"] != job.dest_se:
+            job.dest_se = None
+
+        start_insert_files = time.perf_counter()
+        _insert_files(chunk.files, user.method)
+        db_secs = time.perf_counter() - start_insert_files
+        metrics.DB_OPERATION_SECONDS.observe(db_secs, "append_files")
+        log.info(
+            "Appended files to draft job: job_id={} transfers={} db_secs={}".format(
+                job_id, len(chunk.files), str(db_secs)
+            )
+        )
+        Session.commit()
+    except IntegrityError as err:
+        Session.rollback()
+        raise Conflict("The submission is duplicated " + str(err))
+    except Exception:
+        Session.rollback()
+        raise
+
+    return {"job_id": job_id, "files": len(chunk.files)}
+
+
+@authorize(TRANSFER)
+@profile_request
+@jsonify
+def seal(job_id):
+    """
+    Seal a draft job: no more files can be appended, and its transfers
+    are released to the scheduler
+    """
+    _get_job(job_id)
+    user = request.environ["fts3.User.Credentials"]
+
+    try:
+        job = _lock_draft(job_id)
+        parked = (
+            Session.query(
+                File.vo_name,
+                File.source_se,
+                File.dest_se,
+                File.activity,
+                File.file_state,
+                File.file_state_initial,
+                func.count(),
+            )
+            .filter(File.job_id == job_id)
+            .filter(File.file_state.in_(FileDraftStates.values()))
+            .filter(File.file_state_initial.in_(FileDraftStates.keys()))
+            .group_by(
+                File.vo_name,
+                File.source_se,
+                File.dest_se,
+                File.activity,
+                File.file_state,
+                File.file_state_initial,
+            )
+            .all()
+        )
+
+        # Files going to a storage banned meanwhile stay held by the banning
+        banned = _banned_links(parked)
+        for vo_name, source_se, dest_se in banned:
+            Session.query(File).filter(
+                File.job_id == job_id,
+                File.vo_name == vo_name,
+                File.source_se == source_se,
+                File.dest_se == dest_se,
+                File.file_state.in_(FileDraftStates.values()),
+            ).update({"file_state_initial": ""}, synchronize_session=False)
+        parked = [row for row in parked if tuple(row[:3]) not in banned]
+
+        released = 0
+        if current_app.config["fts3.DbType"] == "mysql":
+            released = (
+                Session.query(File)
+                .filter(File.job_id == job_id)
+                .filter(File.file_state.in_(FileDraftStates.values()))
+                .filter(File.file_state_initial.in_(FileDraftStates.keys()))
+                .update(
+                    {"file_state": File.file_state_initial, "file_state_initial": ""},
+                    synchronize_session=False,
+                )
+            )
+        else:
+            # Move the counters, and the files, to the t_queue rows of their new state
+            on_hold = {}
+            queued = {}
+            for vo_name, source_se, dest_se, activity, state, initial, count in parked:
+                on_hold[(vo_name, source_se, dest_se, activity, state)] = -count
+                queued[(vo_name, source_se, dest_se, activity, initial)] = count
+            dbconn = Session.connection()
+            _inc_t_queue_counters(dbconn, user.method, on_hold)
+            queue_ids = _inc_t_queue_counters(dbconn, user.method, queued)
+            for vo_name, source_se, dest_se, activity, state, initial, count in parked:
+                released += (
+                    Session.query(PostgresFile)
+                    .filter(PostgresFile.job_id == job_id)
+                    .filter(PostgresFile.source_se == source_se)
+                    .filter(PostgresFile.dest_se == dest_se)
+                    .filter(PostgresFile.activity == activity)
+                    .filter(PostgresFile.file_state == state)
+                    .filter(PostgresFile.file_state_initial == initial)
+                    .update(
+                        {
+                            "file_state": initial,
+                            "file_state_initial": "",
+                            "queue_id": queue_ids[
+                                (vo_name, source_se, dest_se, activity)
+                            ],
+                        },
+                        synchronize_session=False,
+                    )
+                )
+        Session.commit()
+    except Exception:
+        Session.rollback()
+        raise
+
+    # Send the messages held back when the files were added
+    Session.expire_all()
+    job = Session.query(Job).get(job_id)
+    for file in job.files:
+        if file.file_state not in FileDraftStates:
+            continue
+        try:
+            submit_state_change(job, file, file.file_state)
+        except Exception as ex:
+            log.warning("Failed to write state message to disk: %s" % str(ex))
+
+    log.info("Draft job sealed: job_id=%s transfers=%d" % (job_id, released))
+    return {"job_id": job_id, "files": released}
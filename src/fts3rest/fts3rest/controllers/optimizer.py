@@ -16,14 +16,25 @@
 Optimizer logging tables
 """
 
+import csv
+import io
+
 from werkzeug.exceptions import BadRequest
 
-from flask import request, current_app as app
-from fts3rest.model.meta import Session
+from flask import request, current_app as app, Response, stream_with_context
+from sqlalchemy import func, cast, extract, literal_column, BigInteger, Integer
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from fts3rest.model.meta import Session, read_only
+from fts3rest.lib.api.schema_validator import compile_schema, SchemaValidationError
 from fts3rest.lib.helpers.misc import get_input_as_dict
 from fts3rest.model import OptimizerEvolution, Optimizer
-from datetime import datetime
+from datetime import datetime, timedelta
 from fts3rest.lib.helpers.jsonify import jsonify
+from fts3rest.lib.middleware.fts3auth.authorization import authorize
+from fts3rest.lib.middleware.fts3auth.constants import CONFIG
+
+_BUCKET_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+_EVOLUTION_AVERAGES = ("throughput", "success", "active", "ema")
 
 
 @jsonify
@@ -34,11 +45,122 @@ def is_enabled():
     return app.config["fts3.Optimizer"]
 
 
+def _parse_time(name):
+    value = request.values.get(name)
+    if not value:
+        return None
+    for time_format in ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, time_format)
+        except ValueError:
+            pass
+    raise BadRequest("Invalid %s, expected YYYY-MM-DDTHH:MM:SS" % name)
+
+
+def _parse_bucket():
+    """
+    Bucket size in seconds, given as a number of seconds, minutes (m),
+    hours (h) or days (d)
+    """
+    value = request.values.get("bucket")
+    if not value:
+        return None
+    unit = _BUCKET_UNITS.get(value[-1], None)
+    try:
+        bucket = int(value[:-1]) * unit if unit else int(value)
+    except ValueError:
+        raise BadRequest("Invalid bucket")
+    if bucket < 1:
+        raise BadRequest("Invalid bucket")
+    return bucket
+
+
+def _epoch(column):
+    """
+    Seconds since the epoch of a datetime column, as an integer, computed by
+    the database
+    """
+    dialect = Session.bind.dialect.name
+    if dialect == "mysql":
+        return func.timestampdiff(
+            literal_column("SECOND"), literal_column("'1970-01-01'"), column
+        )
+    elif dialect == "sqlite":
+        return cast(func.strftime("%s", column), Integer)
+    return cast(extract("epoch", column), BigInteger)
+
+
+def _evolution_buckets(evolution, bucket):
+    """
+    Averages of the evolution of each link, per time bucket
+    """
+    epoch = _epoch(OptimizerEvolution.datetime)
+    # A literal, so the database sees the same expression in the GROUP BY
+    start = epoch - epoch % literal_column(str(bucket))
+    rows = (
+        evolution.with_entities(
+            OptimizerEvolution.source_se,
+            OptimizerEvolution.dest_se,
+            start.label("bucket"),
+            func.count().label("samples"),
+            *[
+                func.avg(getattr(OptimizerEvolution, field))
+                for field in _EVOLUTION_AVERAGES
+            ],
+        )
+        .group_by(OptimizerEvolution.source_se, OptimizerEvolution.dest_se, start)
+        .order_by(OptimizerEvolution.source_se, OptimizerEvolution.dest_se, start)
+        .yield_per(1000)
+    )
+    for row in rows:
+        aggregate = dict(
+            source_se=row[0],
+            dest_se=row[1],
+            datetime=datetime.utcfromtimestamp(int(row[2])),
+            samples=row[3],
+        )
+        for field, average in zip(_EVOLUTION_AVERAGES, row[4:]):
+            aggregate[field] = float(average) if average is not None else None
+        yield aggregate
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%dT%H:%M:%S")
+    return value
+
+
+def _stream_csv(rows, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(values)
+        return buffer.getvalue()
+
+    yield line(columns)
+    for row in rows:
+        yield line([_csv_value(row[column]) for column in columns])
+
+
+@read_only
 @jsonify
 def evolution():
     """
     Returns the optimizer evolution
+
+    Without bucket, the last 50 decisions. With bucket (i.e. 300, 5m, 1h or 1d),
+    the average throughput, success, active and ema of each link per time bucket,
+    between since (by default one day before until) and until (by default now).
+    The result is sent as CSV or NDJSON if text/csv or application/x-ndjson
+    is accepted.
     """
+    since = _parse_time("since")
+    until = _parse_time("until")
+    bucket = _parse_bucket()
+
     evolution = Session.query(OptimizerEvolution)
     if "source_se" in request.values and request.values["source_se"]:
         evolution = evolution.filter(
@@ -48,10 +170,37 @@ def evolution():
         evolution = evolution.filter(
             OptimizerEvolution.dest_se == request.values["dest_se"]
         )
+    if bucket and not since:
+        since = (until or datetime.utcnow()) - timedelta(days=1)
+    if since:
+        evolution = evolution.filter(OptimizerEvolution.datetime >= since)
+    if until:
+        evolution = evolution.filter(OptimizerEvolution.datetime < until)
 
-    evolution = evolution.order_by(OptimizerEvolution.datetime.desc())
+    mimetype = request.accept_mimetypes.best_match(
+        ["application/json", "application/x-ndjson", "text/csv"],
+        default="application/json",
+    )
 
-    return evolution[:50]
+    if bucket:
+        columns = ["source_se", "dest_se", "datetime", "samples"] + list(
+            _EVOLUTION_AVERAGES
+        )
+        rows = _evolution_buckets(evolution, bucket)
+    else:
+        columns = [column.name for column in OptimizerEvolution.__table__.columns]
+        evolution = evolution.order_by(OptimizerEvolution.datetime.desc())[:50]
+        if mimetype == "application/json":
+            return evolution
+        rows = (
+            {column: getattr(row, column) for column in columns} for row in evolution
+        )
+
+    if mimetype == "text/csv":
+        return Response(
+            stream_with_context(_stream_csv(rows, columns)), mimetype="text/csv"
+        )
+    return Response(rows, mimetype=mimetype)
 
 
 @jsonify
@@ -185,3 +334,158 @@ def set_optimizer_values():
         raise
 
     return evolution, optimizer
+
+
+# Default value of each field of a decision
+_DECISION_INTEGERS = {
+    "active": 2,
+    "nostreams": 1,
+    "diff": 1,
+    "actual_active": 1,
+    "queue_size": 1,
+}
+_DECISION_NUMBERS = {
+    "ema": 0,
+    "throughput": 0,
+    "success": 0,
+    "filesize_avg": 0,
+    "filesize_stddev": 0,
+}
+
+_validate_decision = compile_schema(
+    {
+        "type": "object",
+        "required": ["source_se", "dest_se"],
+        "properties": dict(
+            source_se={"type": "string"},
+            dest_se={"type": "string"},
+            rationale={"type": ["string", "null"]},
+            **{
+                field: {"type": "integer", "minimum": 0} for field in _DECISION_INTEGERS
+            },
+            **{field: {"type": "number", "minimum": 0} for field in _DECISION_NUMBERS},
+        ),
+    }
+)
+
+
+def _decision_hook(max_decisions):
+    links = set()
+
+    def validate(index, decision):
+        try:
+            if max_decisions and index >= max_decisions:
+                raise SchemaValidationError(
+                    "more than %d decisions in the batch" % max_decisions
+                )
+            _validate_decision(decision)
+            link = (decision["source_se"], decision["dest_se"])
+            if not all(link):
+                raise SchemaValidationError("missing source and/or destination")
+            if link in links:
+                raise SchemaValidationError("duplicated link %s => %s" % link)
+            links.add(link)
+        except SchemaValidationError as ex:
+            ex.segments.extend([index, "decisions"])
+            raise
+
+    return validate
+
+
+def _upsert_optimizer(rows):
+    """
+    Insert or replace the rows of t_optimizer with a single statement when
+    the database supports it
+    """
+    dialect = Session.bind.dialect.name
+    table = Optimizer.__table__
+    updated = ["ema", "active", "datetime", "nostreams"]
+    if dialect == "mysql":
+        insert = mysql.insert(table)
+        Session.execute(
+            insert.on_duplicate_key_update(
+                {column: insert.inserted[column] for column in updated}
+            ),
+            rows,
+        )
+    elif dialect in ("postgresql", "sqlite"):
+        insert = (postgresql if dialect == "postgresql" else sqlite).insert(table)
+        Session.execute(
+            insert.on_conflict_do_update(
+                index_elements=[table.c.source_se, table.c.dest_se],
+                set_={column: insert.excluded[column] for column in updated},
+            ),
+            rows,
+        )
+    else:
+        for row in rows:
+            Session.query(Optimizer).filter(
+                Optimizer.source_se == row["source_se"],
+                Optimizer.dest_se == row["dest_se"],
+            ).delete(synchronize_session=False)
+        Session.execute(table.insert(), rows)
+
+
+@authorize(CONFIG)
+@jsonify
+def set_optimizer_values_batch():
+    """
+    Set the number of actives and streams of several links at once
+
+    The body is {"decisions": [{"source_se": "...", "dest_se": "...", ...}, ...]},
+    each decision with the same fields as /optimizer/current. All of them are
+    written in the same transaction, with the same timestamp.
+    """
+    try:
+        decisions = get_input_as_dict(
+            request,
+            stream=True,
+            max_size=app.config.get("fts3.MaxSubmissionSize", 0),
+            item_hooks={
+                "decisions": _decision_hook(
+                    int(app.config.get("fts3.OptimizerBatchMaxDecisions", 10000))
+                )
+            },
+        ).get("decisions")
+    except SchemaValidationError as ex:
+        if ex.malformed:
+            raise BadRequest("Malformed request: %s" % str(ex))
+        raise BadRequest("Invalid value within the request: %s" % str(ex))
+    if not isinstance(decisions, list) or not decisions:
+        raise BadRequest("Malformed request: decisions: expected a non empty array")
+
+    current_time = datetime.utcnow()
+    evolutions = []
+    optimizers = []
+    for decision in decisions:
+        evolution = dict(
+            source_se=decision["source_se"],
+            dest_se=decision["dest_se"],
+            datetime=current_time,
+            rationale=decision.get("rationale"),
+        )
+        for field, default in _DECISION_INTEGERS.items():
+            evolution[field] = decision.get(field, default)
+        for field, default in _DECISION_NUMBERS.items():
+            evolution[field] = float(decision.get(field, default))
+        optimizers.append(
+            dict(
+                source_se=evolution["source_se"],
+                dest_se=evolution["dest_se"],
+                datetime=current_time,
+                ema=evolution["ema"],
+                active=evolution["active"],
+                nostreams=evolution.pop("nostreams"),
+            )
+        )
+        evolutions.append(evolution)
+
+    try:
+        Session.execute(OptimizerEvolution.__table__.insert(), evolutions)
+        _upsert_optimizer(optimizers)
+        Session.commit()
+    except Exception:
+        Session.rollback()
+        raise
+
+    return {"datetime": current_time, "count": len(decisions)}
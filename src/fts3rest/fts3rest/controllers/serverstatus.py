@@ -11,46 +11,104 @@
 #   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
-from fts3rest.model.meta import Session
+from datetime import datetime
+
+from flask import current_app as app
+from flask import Response, after_this_request
+from sqlalchemy import case, func
+
+from fts3rest.model import File, Host
+from fts3rest.model.meta import Session, read_only
 from fts3rest.lib.middleware.fts3auth.authorization import (
     authorize,
     require_certificate,
 )
 from fts3rest.lib.middleware.fts3auth.constants import *
+from fts3rest.lib.helpers import metrics as metrics_registry
 from fts3rest.lib.helpers.jsonify import jsonify
+from fts3rest.lib.helpers.snapshot import SharedSnapshot
 
 """
 Server general status
 """
 
+# Key of the file count in the host activity, per file state
+_HOST_STATES = {"STARTED": "staging", "ACTIVE": "active", "READY": "queued"}
+
+
+def _hosts_activity():
+    """
+    Activity of each host, with a single scan of the files being processed:
+    the files staging (STARTED) per staging host, and the files transferring
+    (ACTIVE) or about to (READY, the queue) per transfer host.
+    Plus the age of the heartbeats of the services running on each host.
+    """
+    response = dict()
+
+    host = case(
+        (File.file_state == "STARTED", File.staging_host), else_=File.transfer_host
+    )
+    counts = (
+        Session.query(File.file_state, host, func.count())
+        .filter(File.file_state.in_(list(_HOST_STATES)))
+        .group_by(File.file_state, host)
+    )
+    for state, hostname, count in counts:
+        response.setdefault(hostname, dict())[_HOST_STATES[state]] = count
+
+    now = datetime.utcnow()
+    for hostname, service_name, beat, drain in Session.query(
+        Host.hostname, Host.service_name, Host.beat, Host.drain
+    ):
+        activity = response.setdefault(hostname, dict())
+        if beat:
+            activity.setdefault("heartbeat_age", dict())[service_name] = (
+                now - beat
+            ).total_seconds()
+        if drain:
+            activity["drain"] = True
+
+    return response
+
 
 @require_certificate
 @authorize(CONFIG)
+@read_only
 @jsonify
 def hosts_activity():
     """
     What are the hosts doing
+
+    Served from a snapshot refreshed every fts3.HostsActivityInterval seconds,
+    whose age is sent in the Age header
     """
-    staging = Session.execute(
-        "SELECT COUNT(*), staging_host "
-        " FROM t_file "
-        " WHERE file_state = 'STARTED' "
-        " GROUP BY staging_host"
-    )
-    response = dict()
+    snapshot = app.extensions.get("fts3.hosts_activity")
+    if snapshot is None:
+        snapshot = app.extensions.setdefault(
+            "fts3.hosts_activity",
+            SharedSnapshot(
+                "hosts_activity",
+                _hosts_activity,
+                float(app.config.get("fts3.HostsActivityInterval", 60)),
+                app.config.get("fts3.SnapshotDir") or None,
+            ),
+        )
+    activity, age = snapshot.get()
 
-    for count, host in staging:
-        response[host] = dict(staging=count)
+    @after_this_request
+    def add_age(response):
+        response.headers["Age"] = str(int(age))
+        return response
 
-    active = Session.execute(
-        "SELECT COUNT(*), transfer_host "
-        " FROM t_file "
-        " WHERE file_state = 'ACTIVE' "
-        " GROUP BY transfer_host"
-    )
-    for count, host in active:
-        if host not in response:
-            response[host] = dict()
-        response[host]["active"] = count
+    return activity
 
-    return response
+
+@authorize(CONFIG)
+def metrics():
+    """
+    Metrics of the service, in the Prometheus text format
+    """
+    return Response(
+        metrics_registry.render(app.config.get("fts3.MetricsDir") or None),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -118,6 +118,41 @@ class JobBuilder:
             fragment=url.fragment,
         )
 
+    def _prepare_file_expansion(self):
+        """
+        Resolve once the job-level values that are common to all the files,
+        so _populate_files does not need to look them up for every transfer
+        """
+        if self.is_bringonline:
+            self._initial_file_state = "STAGING"
+        elif self.is_qos_cdmi_transfer:
+            self._initial_file_state = "QOS_TRANSITION"
+        else:
+            self._initial_file_state = "SUBMITTED"
+        self._dest_uuid_enabled = is_dest_surl_uuid_enabled(self.user.vos[0])
+        self._file_metadata_limit = app.config["fts3.FileMetadataSizeLimit"]
+        self._staging_metadata_limit = app.config["fts3.StagingMetadataSizeLimit"]
+        self._archive_metadata_limit = app.config["fts3.ArchiveMetadataSizeLimit"]
+        # (scheme, netloc) => storage element
+        self._storage_elements = {}
+
+    def _parse_url(self, raw_url):
+        """
+        Parse and validate the url, and return it together with its storage
+        element. Host validation and storage element extraction are done only
+        once per (scheme, netloc).
+        """
+        url = urlparse(raw_url.strip())
+        key = (url.scheme, url.netloc)
+        storage = self._storage_elements.get(key)
+        if storage is None:
+            validate_url(url)
+            storage = get_storage_element(url)
+            self._storage_elements[key] = storage
+        else:
+            validate_url_path(url)
+        return url, storage
+
     def _populate_files(self, file_dict, f_index, shared_hashed_id):
         """
         From the dictionary file_dict, generate a list of transfers for a job
@@ -133,38 +168,41 @@ class JobBuilder:
         src_tokens = file_dict.get("source_tokens", [])
         dst_tokens = file_dict.get("destination_tokens", [])
 
+        # Sources and destinations are parsed only once, not once per pair
+        sources = []
         for source, src_token in itertools.zip_longest(
             file_dict["sources"], src_tokens
         ):
-            source_url = urlparse(source.strip())
-            validate_url(source_url)
+            source_url, source_se = self._parse_url(source)
             if src_token is not None and not isinstance(src_token, str):
                 raise BadRequest(
                     f"Source token is not a string: type(src_token)={type(src_token)}"
                 )
-            src_token_id = credentials.generate_token_id(src_token)
-            for destination, dst_token in itertools.zip_longest(
-                file_dict["destinations"], dst_tokens
-            ):
-                dest_url = urlparse(destination.strip())
-                validate_url(dest_url)
-                if dst_token is not None and not isinstance(dst_token, str):
-                    raise BadRequest(
-                        f"Destination token is not a string: type(dst_token)={type(dst_token)}"
-                    )
-                dst_token_id = credentials.generate_token_id(dst_token)
-                tuples.append((source_url, dest_url, src_token_id, dst_token_id))
+            sources.append(
+                (source_url, source_se, credentials.generate_token_id(src_token))
+            )
+        destinations = []
+        for destination, dst_token in itertools.zip_longest(
+            file_dict["destinations"], dst_tokens
+        ):
+            dest_url, dest_se = self._parse_url(destination)
+            if dst_token is not None and not isinstance(dst_token, str):
+                raise BadRequest(
+                    f"Destination token is not a string: type(dst_token)={type(dst_token)}"
+                )
+            destinations.append(
+                (dest_url, dest_se, credentials.generate_token_id(dst_token))
+            )
+        for source in sources:
+            for destination in destinations:
+                tuples.append((source, destination))
 
         # Create one File entry per matching pair
-        if self.is_bringonline:
-            initial_file_state = "STAGING"
-        elif self.is_qos_cdmi_transfer:
-            initial_file_state = "QOS_TRANSITION"
-        else:
-            initial_file_state = "SUBMITTED"
+        initial_file_state = self._initial_file_state
 
         # Multiple replica job or multihop? Then, the initial state is NOT_USED
-        if len(file_dict["sources"]) > 1 or self.params["multihop"]:
+        multiple_sources = len(file_dict["sources"]) > 1
+        if multiple_sources or self.params["multihop"]:
             # if self.is_bringonline:
             # set the first as STAGING and the rest as 'NOT_USED'
             # staging_and_multihop = True
@@ -174,15 +212,50 @@ class JobBuilder:
             # Multiple replicas, all must share the hashed-id
             if shared_hashed_id is None:
                 shared_hashed_id = generate_hashed_id()
-        vo_name = self.user.vos[0]
 
-        for source, destination, src_token_id, dst_token_id in tuples:
-            if len(file_dict["sources"]) > 1 or not is_dest_surl_uuid_enabled(vo_name):
-                dest_uuid = None
-            else:
+        # File-level values, common to all the pairs
+        activity = file_dict.get("activity", "default")
+        # Account for the fact file_dict may contain an activity set to None
+        if activity is None:
+            activity = "default"
+        user_filesize = safe_filesize(file_dict.get("filesize", 0))
+        selection_strategy = file_dict.get("selection_strategy", "auto")
+        checksum = file_dict.get("checksum", None)
+        scitag = validate_scitag(file_dict.get("scitag", None))
+        file_metadata = file_dict.get("metadata", None)
+        if file_metadata is not None:
+            file_metadata = metadata(
+                file_metadata, size_limit=self._file_metadata_limit
+            )
+        staging_metadata = file_dict.get("staging_metadata", None)
+        if staging_metadata is not None:
+            staging_metadata = metadata(
+                staging_metadata,
+                require_dict=True,
+                name_hint="Staging metadata",
+                size_limit=self._staging_metadata_limit,
+            )
+        archive_metadata = file_dict.get("archive_metadata", None)
+        if archive_metadata is not None:
+            archive_metadata = metadata(
+                archive_metadata,
+                require_dict=True,
+                name_hint="Archive metadata",
+                size_limit=self._archive_metadata_limit,
+            )
+        with_dest_uuid = not multiple_sources and self._dest_uuid_enabled
+
+        for (source, source_se, src_token_id), (
+            destination,
+            dest_se,
+            dst_token_id,
+        ) in tuples:
+            if with_dest_uuid:
                 dest_uuid = str(
                     uuid.uuid5(BASE_ID, destination.geturl().encode("utf-8"))
                 )
+            else:
+                dest_uuid = None
             if self.is_bringonline:
                 # add the new query parameter only for root -> EOS-CTA for now
                 if source.scheme == "root":
@@ -192,55 +265,34 @@ class JobBuilder:
                         )
                     source = self._set_activity_query_string(source, file_dict)
 
-            f = dict(
-                job_id=self.job_id,
-                file_index=f_index,
-                dest_surl_uuid=dest_uuid,
-                file_state=initial_file_state,
-                file_state_initial="",
-                source_surl=source.geturl(),
-                dest_surl=destination.geturl(),
-                source_se=get_storage_element(source),
-                dest_se=get_storage_element(destination),
-                vo_name=None,
-                priority=self.job["priority"],
-                user_filesize=safe_filesize(file_dict.get("filesize", 0)),
-                selection_strategy=file_dict.get("selection_strategy", "auto"),
-                checksum=file_dict.get("checksum", None),
-                file_metadata=file_dict.get("metadata", None),
-                staging_metadata=file_dict.get("staging_metadata", None),
-                archive_metadata=file_dict.get("archive_metadata", None),
-                activity=file_dict.get("activity", "default"),
-                scitag=validate_scitag(file_dict.get("scitag", None)),
-                src_token_id=src_token_id,
-                dst_token_id=dst_token_id,
-                hashed_id=(
-                    shared_hashed_id if shared_hashed_id else generate_hashed_id()
-                ),
-            )
-            if f["file_metadata"] is not None:
-                f["file_metadata"] = metadata(
-                    f["file_metadata"],
-                    size_limit=app.config["fts3.FileMetadataSizeLimit"],
-                )
-            if f["staging_metadata"] is not None:
-                f["staging_metadata"] = metadata(
-                    f["staging_metadata"],
-                    require_dict=True,
-                    name_hint="Staging metadata",
-                    size_limit=app.config["fts3.StagingMetadataSizeLimit"],
+            self.files.append(
+                dict(
+                    job_id=self.job_id,
+                    file_index=f_index,
+                    dest_surl_uuid=dest_uuid,
+                    file_state=initial_file_state,
+                    file_state_initial="",
+                    source_surl=source.geturl(),
+                    dest_surl=destination.geturl(),
+                    source_se=source_se,
+                    dest_se=dest_se,
+                    vo_name=None,
+                    priority=self.job["priority"],
+                    user_filesize=user_filesize,
+                    selection_strategy=selection_strategy,
+                    checksum=checksum,
+                    file_metadata=file_metadata,
+                    staging_metadata=staging_metadata,
+                    archive_metadata=archive_metadata,
+                    activity=activity,
+                    scitag=scitag,
+                    src_token_id=src_token_id,
+                    dst_token_id=dst_token_id,
+                    hashed_id=(
+                        shared_hashed_id if shared_hashed_id else generate_hashed_id()
+                    ),
                 )
-            if f["archive_metadata"] is not None:
-                f["archive_metadata"] = metadata(
-                    f["archive_metadata"],
-                    require_dict=True,
-                    name_hint="Archive metadata",
-                    size_limit=app.config["fts3.ArchiveMetadataSizeLimit"],
-                )
-            # Account for the fact file_dict may contain an activity set to None
-            if f["activity"] is None:
-                f["activity"] = "default"
-            self.files.append(f)
+            )
 
     def _apply_selection_strategy(self):
         """
@@ -279,6 +331,9 @@ class JobBuilder:
         # Return early if job type is already "Session Reuse"
         if self.job["job_type"] == "Y":
             return False
+        # Draft jobs are submitted in chunks, so the whole set of files is unknown
+        if safe_flag(self.params.get("draft", False)):
+            return False
 
         auto_session_reuse = app.config.get("fts3.AutoSessionReuse", False)
         log.debug(
@@ -729,6 +784,7 @@ class JobBuilder:
             shared_hashed_id = None
 
         # Files
+        self._prepare_file_expansion()
         f_index = 0
         for file_dict in files_list:
             self._populate_files(file_dict, f_index, shared_hashed_id)
@@ -22,6 +22,7 @@ from fts3rest.model.meta import Session
 from fts3rest.lib.scheduler.schd import Scheduler
 from fts3rest.lib.scheduler.db import Database
 from fts3rest.lib.scheduler.Cache import ThreadLocalCache
+from fts3rest.lib.scheduler.strategies import shared_budget
 
 log = logging.getLogger(__name__)
 
@@ -94,19 +95,40 @@ def validate_url(url):
         raise ValueError("Missing scheme (%s)" % url.geturl())
     if url.scheme == "file":
         raise ValueError("Can not transfer local files (%s)" % url.geturl())
-    if not url.path or (url.path == "/" and not url.query):
-        raise ValueError("Missing path (%s)" % url.geturl())
+    validate_url_path(url)
     if not url.hostname:
         raise ValueError("Missing host (%s)" % url.geturl())
 
 
+def validate_url_path(url):
+    """
+    Validates the path of the url. Used on its own when the scheme and
+    host have already been validated for another url of the same storage
+    """
+    if not url.path or (url.path == "/" and not url.query):
+        raise ValueError("Missing path (%s)" % url.geturl())
+
+
 def metadata(data, require_dict=False, name_hint=None, size_limit=None):
+    if isinstance(data, str):
+        # Plain labels do not need the JSON round trip
+        if require_dict:
+            metadata_name = name_hint if name_hint is not None else "Metadata"
+            raise ValueError("{} not in JSON format".format(metadata_name))
+        if size_limit and size_limit > 0 and len(json.dumps(data)) > size_limit:
+            raise ValueError(
+                "Job Submission Refused, metadata exceeds size limit of {}".format(
+                    size_limit
+                )
+            )
+        return {"label": data}
     try:
-        metadata_obj = json.loads(json.dumps(data))
+        serialized = json.dumps(data)
+        metadata_obj = json.loads(serialized)
     except Exception:
         raise ValueError("Parsing error: Metadata in unexpected format {}".format(data))
-    if size_limit > 0 and size_limit is not None:
-        if len(json.dumps(metadata_obj)) > size_limit:
+    if size_limit and size_limit > 0:
+        if len(serialized) > size_limit:
             raise ValueError(
                 "Job Submission Refused, metadata exceeds size limit of {}".format(
                     size_limit
@@ -219,50 +241,19 @@ def select_best_replica(files, vo_name, entry_state, strategy):
 
     queue_provider = Database(Session)
     cache_provider = ThreadLocalCache(queue_provider)
+    exploration = shared_budget(
+        float(app.config.get("fts3.SchedulerExplorationRate", 0.1)),
+        int(app.config.get("fts3.SchedulerExplorationInitial", 1)),
+    )
     # s = Scheduler(queue_provider)
-    s = Scheduler(cache_provider)
-    source_se_list = map(lambda f: f["source_se"], files)
+    s = Scheduler(cache_provider, exploration=exploration)
+    source_se_list = [f["source_se"] for f in files]
 
-    if strategy == "orderly":
-        sorted_ses = source_se_list
-
-    elif strategy == "queue" or strategy == "auto":
-        sorted_ses = map(lambda x: x[0], s.rank_submitted(source_se_list, dst, vo_name))
-
-    elif strategy == "success":
-        sorted_ses = map(lambda x: x[0], s.rank_success_rate(source_se_list, dst))
-
-    elif strategy == "throughput":
-        sorted_ses = map(lambda x: x[0], s.rank_throughput(source_se_list, dst))
-
-    elif strategy == "file-throughput":
-        sorted_ses = map(
-            lambda x: x[0], s.rank_per_file_throughput(source_se_list, dst)
-        )
-
-    elif strategy == "pending-data":
-        sorted_ses = map(
-            lambda x: x[0], s.rank_pending_data(source_se_list, dst, vo_name, activity)
-        )
-
-    elif strategy == "waiting-time":
-        sorted_ses = map(
-            lambda x: x[0], s.rank_waiting_time(source_se_list, dst, vo_name, activity)
-        )
-
-    elif strategy == "waiting-time-with-error":
-        sorted_ses = map(
-            lambda x: x[0],
-            s.rank_waiting_time_with_error(source_se_list, dst, vo_name, activity),
-        )
-
-    elif strategy == "duration":
-        sorted_ses = map(
-            lambda x: x[0],
-            s.rank_finish_time(source_se_list, dst, vo_name, activity, user_filesize),
-        )
-    else:
+    try:
+        ranks = s.rank(strategy, source_se_list, dst, vo_name, activity, user_filesize)
+    except KeyError:
         raise BadRequest(strategy + " algorithm is not supported by Scheduler")
+    sorted_ses = map(lambda x: x[0], ranks)
 
     # We got the storages sorted from better to worst following
     # the chosen strategy.
@@ -20,8 +20,8 @@
 # Some of this code may have not been converted to Flask yet
 
 
+import importlib
 import logging
-import imp
 import itertools
 import os
 import fts3rest.model
@@ -154,13 +154,13 @@ def get_controllers(controller_path=CONTROLLERS_PATH, nested=None):
     parent_mod = "fts3rest.controllers"
     if nested:
         parent_mod += "." + nested
-    imp.load_source(parent_mod, os.path.join(controller_path, "__init__.py"))
+    importlib.import_module(parent_mod)
 
     for f in os.listdir(controller_path):
         path = os.path.join(controller_path, f)
         if not f.endswith("__init__.py") and f.endswith(".py"):
             cname = f.split(".")[0]
-            module = imp.load_source(parent_mod + "." + cname, path)
+            module = importlib.import_module(parent_mod + "." + cname)
             controller = get_controller_from_module(module, cname)
             if controller:
                 if nested:
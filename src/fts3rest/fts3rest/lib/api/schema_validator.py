@@ -0,0 +1,174 @@
+#   Copyright 2020 CERN
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Compiles a JSON-schema into a tree of closures, so the schema is interpreted only
+once and validating a document is a single pass over it.
+
+Only the subset of JSON-schema used by the published schemas is supported:
+type, properties, required, items, minItems and minimum.
+"""
+
+_ANNOTATIONS = frozenset(["title", "description"])
+_KEYWORDS = frozenset(
+    ["type", "properties", "required", "items", "minItems", "minimum"]
+)
+
+_TYPES = {
+    "null": lambda v: v is None,
+    "boolean": lambda v: isinstance(v, bool),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "string": lambda v: isinstance(v, str),
+    "array": lambda v: isinstance(v, list),
+    "object": lambda v: isinstance(v, dict),
+}
+
+
+class SchemaValidationError(ValueError):
+    """
+    Raised when a document does not validate.
+
+    Attributes:
+        path:      Location of the offending value (i.e. files[42].sources)
+        reason:    What is wrong with it
+        malformed: True if the document has the wrong structure (an object or
+                   an array was expected), False if a value is invalid
+    """
+
+    def __init__(self, reason, malformed=False):
+        super().__init__(reason)
+        self.reason = reason
+        self.malformed = malformed
+        self.segments = []
+
+    @property
+    def path(self):
+        path = ""
+        for segment in reversed(self.segments):
+            if isinstance(segment, int):
+                path += "[%d]" % segment
+            elif path:
+                path += "." + segment
+            else:
+                path = segment
+        return path
+
+    def __str__(self):
+        if self.segments:
+            return "%s: %s" % (self.path, self.reason)
+        return self.reason
+
+
+def _compile_type(types):
+    if isinstance(types, str):
+        types = [types]
+    checks = tuple(_TYPES[t] for t in types)
+    malformed = bool(set(types) & {"array", "object"})
+    expected = " or ".join(types)
+
+    def validate_type(value):
+        for check in checks:
+            if check(value):
+                return
+        raise SchemaValidationError(
+            "expected %s, got %s" % (expected, type(value).__name__), malformed
+        )
+
+    return validate_type
+
+
+def _compile_minimum(minimum):
+    def validate_minimum(value):
+        if _TYPES["number"](value) and value < minimum:
+            raise SchemaValidationError("%s is less than %s" % (value, minimum))
+
+    return validate_minimum
+
+
+def _compile_properties(properties, required):
+    compiled = [(name, compile_schema(schema)) for name, schema in properties.items()]
+    required = tuple(required)
+
+    def validate_properties(value):
+        if not isinstance(value, dict):
+            return
+        for name in required:
+            if name not in value:
+                raise SchemaValidationError("missing required '%s'" % name, True)
+        for name, validator in compiled:
+            if name in value:
+                try:
+                    validator(value[name])
+                except SchemaValidationError as ex:
+                    ex.segments.append(name)
+                    raise
+
+    return validate_properties
+
+
+def _compile_items(items, min_items):
+    validator = compile_schema(items) if items is not None else None
+
+    def validate_items(value):
+        if not isinstance(value, list):
+            return
+        if min_items is not None and len(value) < min_items:
+            raise SchemaValidationError(
+                "expected at least %d item(s), got %d" % (min_items, len(value))
+            )
+        if validator is None:
+            return
+        index = 0
+        try:
+            for index, item in enumerate(value):
+                validator(item)
+        except SchemaValidationError as ex:
+            ex.segments.append(index)
+            raise
+
+    return validate_items
+
+
+def compile_schema(schema):
+    """
+    Compile the schema, and return a function that raises SchemaValidationError
+    if the document passed does not validate
+    """
+    unsupported = set(schema) - _KEYWORDS - _ANNOTATIONS
+    if unsupported:
+        raise ValueError("Unsupported schema keywords: %s" % ", ".join(unsupported))
+
+    validators = []
+    if "type" in schema:
+        validators.append(_compile_type(schema["type"]))
+    if "minimum" in schema:
+        validators.append(_compile_minimum(schema["minimum"]))
+    if "properties" in schema or "required" in schema:
+        validators.append(
+            _compile_properties(
+                schema.get("properties", {}), schema.get("required", [])
+            )
+        )
+    if "items" in schema or "minItems" in schema:
+        validators.append(
+            _compile_items(schema.get("items", None), schema.get("minItems", None))
+        )
+    validators = tuple(validators)
+
+    def validate(value):
+        for validator in validators:
+            validator(value)
+
+    return validate
@@ -13,8 +13,13 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+from fts3rest.lib.api.schema_validator import compile_schema
+
 urlSchema = {"title": "URL", "type": "string"}
 
+# Flags are interpreted as in JobBuilder_utils.safe_flag: booleans, 1/0 or "Y"/"N"
+flagType = ["boolean", "integer", "string", "null"]
+
 fileSchema = {
     "title": "Transfer",
     "type": "object",
@@ -22,14 +27,20 @@ fileSchema = {
     "properties": {
         "sources": {"type": "array", "items": urlSchema, "minItems": 1},
         "destinations": {"type": "array", "items": urlSchema, "minItems": 1},
+        "source_tokens": {"type": "array"},
+        "destination_tokens": {"type": "array"},
         "priority": {"type": ["integer", "null"], "title": "Job priority"},
-        "metadata": {"type": ["object", "null"]},
-        "filesize": {"type": ["integer", "null"], "minimum": 0},
+        "metadata": {"type": ["object", "string", "null"]},
+        "filesize": {"type": ["number", "string", "null"], "minimum": 0},
         "checksum": {
             "type": ["string", "null"],
             "title": "User defined checksum in the form algorithm:value",
         },
         "activity": {"type": ["string", "null"], "title": "Activity share"},
+        "selection_strategy": {
+            "type": "string",
+            "title": "Replica selection strategy for multiple sources",
+        },
     },
 }
 
@@ -37,49 +48,68 @@ paramSchema = {
     "title": "Job parameters",
     "type": ["object", "null"],
     "properties": {
-        "verify_checksum": {"type": ["boolean", "null"]},
+        "verify_checksum": {
+            "type": flagType,
+            "title": "true/false, or one of source, target, both or none",
+        },
         "reuse": {
-            "type": ["boolean", "null"],
+            "type": flagType,
             "title": "If set to true, srm sessions will be reused",
         },
+        "draft": {
+            "type": flagType,
+            "title": "If set to true, the job is kept on hold until it is sealed, so more files can be added",
+        },
         "destination_spacetoken": {
             "type": ["string", "null"],
             "title": "Destination space token",
         },
         "bring_online": {
-            "type": ["integer", "null"],
+            "type": ["integer", "string", "null"],
             "title": "Bring online operation timeout",
         },
         "copy_pin_lifetime": {
-            "type": ["integer", "null"],
+            "type": ["integer", "string", "null"],
             "title": "Minimum lifetime when bring online is used. -1 means no bring online",
             "minimum": -1,
         },
-        "job_metadata": {"type": ["object", "null"]},
+        "job_metadata": {"type": ["object", "string", "null"]},
         "source_spacetoken": {"type": ["string", "null"]},
-        "overwrite": {"type": ["boolean", "null"]},
-        "dst_file_report": {"type": ["boolean", "null"]},
+        "overwrite": {"type": flagType},
+        "dst_file_report": {"type": flagType},
         "gridftp": {"type": ["string", "null"], "title": "Reserved for future usage"},
-        "retry": {"type": ["integer", "null"]},
-        "multihop": {"type": ["boolean", "null"]},
-        "timeout": {"type": ["integer", "null"], "title": "Timeout in seconds"},
-        "nostreams": {"type": ["integer", "null"], "title": "Number of streams"},
-        "buffer_size": {"type": ["integer", "null"], "title": "Buffer size"},
+        "retry": {"type": ["integer", "string", "null"]},
+        "multihop": {"type": flagType},
+        "timeout": {
+            "type": ["integer", "string", "null"],
+            "title": "Timeout in seconds",
+        },
+        "nostreams": {
+            "type": ["integer", "string", "null"],
+            "title": "Number of streams",
+        },
+        "buffer_size": {
+            "type": ["integer", "string", "null"],
+            "title": "Buffer size",
+        },
         "strict_copy": {
-            "type": ["boolean", "null"],
+            "type": flagType,
             "title": "Disable all checks, just copy the file",
         },
         "disable_cleanup": {
-            "type": ["boolean", "null"],
+            "type": flagType,
             "title": "Enable/disable the copy clean-up happening when a transfer fails",
         },
-        "priority": {"type": ["integer", "null"], "title": "Job priority"},
+        "priority": {
+            "type": ["integer", "string", "null"],
+            "title": "Job priority",
+        },
         "ipv4": {
-            "type": ["boolean", "null"],
+            "type": flagType,
             "title": "Force IPv4 if the underlying protocol supports it",
         },
         "ipv6": {
-            "type": ["boolean", "null"],
+            "type": flagType,
             "title": "Force IPv6 if the underlying protocol supports it",
         },
     },
@@ -96,3 +126,28 @@ SubmitSchema = {
         "delete": {"type": "array", "items": deleteSchema},
     },
 }
+
+# Chunk of transfers appended to a draft job
+AddFilesSchema = {
+    "title": "Files appended to a draft job",
+    "type": "object",
+    "required": ["files"],
+    "properties": {
+        "files": {"type": "array", "items": fileSchema, "minItems": 1},
+    },
+}
+
+# Compiled once, when the module is loaded
+validate_submission = compile_schema(SubmitSchema)
+
+# For submissions whose transfers are validated one by one, as they are decoded
+validate_transfer = compile_schema(fileSchema)
+validate_submission_header = compile_schema(
+    dict(
+        SubmitSchema,
+        properties=dict(SubmitSchema["properties"], files={"type": "array"}),
+    )
+)
+validate_add_files_header = compile_schema(
+    dict(AddFilesSchema, properties={"files": {"type": "array", "minItems": 1}})
+)
@@ -15,19 +15,41 @@
 #   limitations under the License.
 
 
+import collections
 import errno
+import hashlib
+import importlib
 import json
 import os
+import select
+import shutil
 import signal
+import struct
+import tempfile
+import threading
+import time
+import types
 from urllib.parse import urlparse
-from io import StringIO
 
 try:
     import gfal2  # this requires an RPM: gfal2-python3
 
     context_type = gfal2.creat_context
+    gfal2_errors = (gfal2.GError,)
 except Exception:
     context_type = None
+    gfal2_errors = ()
+
+# Messages are a 4 bytes length followed by the JSON encoded payload
+_HEADER = struct.Struct("!I")
+
+# Contexts kept by each worker, one per credential
+_MAX_CONTEXTS = 16
+
+# Items sent at once by a worker running a generator
+_BATCH_SIZE = 256
+
+_X509_VARIABLES = ("X509_USER_CERT", "X509_USER_KEY", "X509_USER_PROXY")
 
 
 class Gfal2Error(Exception):
@@ -40,89 +62,408 @@ class Gfal2Error(Exception):
         self.message = message
 
 
-class Gfal2Wrapper(object):
+class _Timeout(Exception):
+    pass
+
+
+def _encode_frame(message):
+    payload = json.dumps(message).encode("utf-8")
+    return _HEADER.pack(len(payload)) + payload
+
+
+def _write_frame(fd, frame):
+    data = memoryview(frame)
+    while data:
+        data = data[os.write(fd, data) :]
+
+
+def _read_exactly(fd, size, deadline):
+    chunks = []
+    poller = select.poll()
+    poller.register(fd, select.POLLIN)
+    while size:
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not poller.poll(remaining * 1000):
+                raise _Timeout()
+        chunk = os.read(fd, min(size, 1024 * 1024))
+        if not chunk:
+            raise EOFError()
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _read_frame(fd, deadline=None):
+    (size,) = _HEADER.unpack(_read_exactly(fd, _HEADER.size, deadline))
+    return json.loads(_read_exactly(fd, size, deadline).decode("utf-8"))
+
+
+def _resolve(name):
+    module, qualname = name.split(":")
+    method = importlib.import_module(module)
+    for attr in qualname.split("."):
+        method = getattr(method, attr)
+    return method
+
+
+def _token_domain(args):
+    try:
+        if isinstance(args[0], dict):
+            if "surl" in args[0].keys():
+                return urlparse(args[0]["surl"]).hostname
+            else:
+                return urlparse(args[0]["old"]).hostname
+        else:
+            return urlparse(args[0]).hostname
+    except Exception:
+        # Will get a 401 from storage
+        return ""
+
+
+class _WorkerContexts(object):
     """
-    Wraps the calls to gfal2 in a separated process.
-    This reduces the risks of bugs from gfal2, or bad isolation
-    impacting the REST API (i.e FTS-35)
+    gfal2 contexts of a worker, reused as long as the same credential is used
     """
 
-    def __init__(self, cred, method):
+    def __init__(self, tmpdir):
+        self.tmpdir = tmpdir
+        self.contexts = collections.OrderedDict()
+        self.environ = dict((var, os.environ.get(var)) for var in _X509_VARIABLES)
+
+    def _set_environ(self, proxy_path):
+        for var in _X509_VARIABLES:
+            value = proxy_path or self.environ[var]
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+    def get(self, cred_type, cred, args, options):
+        if context_type is None:
+            raise RuntimeError("Could not load the gfal2 python module")
+
+        key = (cred_type, hashlib.sha256(cred.encode("utf-8")).hexdigest())
+        ctx, proxy_path = self.contexts.pop(key, (None, None))
+        if ctx is None and cred_type == "X509":
+            proxy_path = os.path.join(self.tmpdir, key[1] + ".pem")
+            fd = os.open(proxy_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as proxy_file:
+                proxy_file.write(cred)
+        self._set_environ(proxy_path)
+
+        if ctx is None:
+            ctx = context_type()
+            if proxy_path:
+                ctx.set_opt_string("X509", "CERT", proxy_path)
+                ctx.set_opt_string("X509", "KEY", proxy_path)
+            while len(self.contexts) >= _MAX_CONTEXTS:
+                _, (_, evicted_path) = self.contexts.popitem(last=False)
+                if evicted_path:
+                    os.unlink(evicted_path)
+        self.contexts[key] = (ctx, proxy_path)
+
+        if cred_type == "BEARER":
+            # A IAM token is used for authentication, set it in the context
+            s_cred = gfal2.cred_new("BEARER", cred.split(":")[0])
+            gfal2.cred_set(ctx, _token_domain(args), s_cred)
+        for group, key, value in options or []:
+            ctx.set_opt_string(group, key, value)
+        return ctx
+
+
+def _serve(requests, responses, tmpdir):
+    """
+    Main loop of a worker: run the requested methods until the pool closes the pipe
+    """
+    contexts = _WorkerContexts(tmpdir)
+    while True:
+        try:
+            request = _read_frame(requests)
+        except EOFError:
+            return
+        try:
+            method = _resolve(request["method"])
+            ctx = contexts.get(
+                request["cred_type"],
+                request["cred"],
+                request["args"],
+                request["options"],
+            )
+            result = method(ctx, *request["args"], **request["kwargs"])
+            if isinstance(result, types.GeneratorType):
+                result = _send_items(responses, result)
+            frame = _encode_frame({"result": result})
+        except gfal2_errors as ex:
+            frame = _encode_frame({"errno": ex.code, "message": ex.message})
+        except Exception as ex:
+            frame = _encode_frame({"errno": errno.EIO, "message": str(ex)})
+        _write_frame(responses, frame)
+
+
+def _send_items(responses, generator):
+    """
+    Send the items of the generator in batches. The first one is sent on its own,
+    so the errors that happen before the first item are known as soon as possible.
+    """
+    batch = []
+    batch_size = 1
+    try:
+        for item in generator:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                _write_frame(responses, _encode_frame({"items": batch}))
+                batch = []
+                batch_size = _BATCH_SIZE
+    finally:
+        # Items produced before a failure are sent before the error
+        if batch:
+            _write_frame(responses, _encode_frame({"items": batch}))
+    return None
+
+
+def _encode_request(method, cred, args, kwargs, options):
+    if isinstance(cred, str):
+        cred_type, cred = "BEARER", cred
+    else:
+        cred_type, cred = "X509", cred.proxy
+    request = {
+        "method": "%s:%s" % (method.__module__, method.__qualname__),
+        "cred_type": cred_type,
+        "cred": cred,
+        "args": args,
+        "kwargs": kwargs,
+        "options": options,
+    }
+    return _encode_frame(request)
+
+
+class _Worker(object):
+    """
+    A long-lived process running gfal2 calls, one at a time
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.tmpdir = tempfile.mkdtemp(prefix="fts3rest-gfal2-")
+        request_read, self.requests = os.pipe()
+        self.responses, response_write = os.pipe()
+        self.pid = os.fork()
+        if self.pid == 0:
+            try:
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                # Do not keep open the descriptors of the parent (database
+                # connections, other workers, pipes of other subprocesses)
+                low, high = sorted((request_read, response_write))
+                os.closerange(3, low)
+                os.closerange(low + 1, high)
+                os.closerange(high + 1, os.sysconf("SC_OPEN_MAX"))
+                _serve(request_read, response_write, self.tmpdir)
+            finally:
+                shutil.rmtree(self.tmpdir, ignore_errors=True)
+                os._exit(0)
+        os.close(request_read)
+        os.close(response_write)
+
+    def send(self, frame):
+        self.calls += 1
+        _write_frame(self.requests, frame)
+
+    def receive(self, timeout):
+        deadline = time.monotonic() + timeout if timeout else None
+        return _read_frame(self.responses, deadline)
+
+    def close(self, kill=False):
         """
-        Calls method in a new process, with the environment properly set up, and a
-        gfal2 context already initialized
+        Stop the worker, and return its exit status
         """
-        self.cred = cred
-        self.method = method
-
-    def __call__(self, *args, **kwargs):
-        pipe_read, pipe_write = os.pipe()
-        pid = os.fork()
-        if pid == 0:
-            os.close(pipe_read)
-            self._child(os.fdopen(pipe_write, "w"), args, kwargs)
-            raise AssertionError("This line must never be reached")
+        if kill:
+            os.kill(self.pid, signal.SIGKILL)
+        os.close(self.requests)
+        os.close(self.responses)
+        _, status = os.waitpid(self.pid, 0)
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+        return status
+
+
+class _ItemStream(object):
+    """
+    Iterator over the items sent by a worker running a generator
+    """
+
+    def __init__(self, pool, timeout):
+        self.pool = pool
+        self.timeout = timeout
+        self.worker = None
+        self.items = iter(())
+
+    def process(self, worker, response):
+        """
+        Take the items of the response, and release the worker once it is done
+        """
+        if "items" in response:
+            self.worker = worker
+            self.items = iter(response["items"])
         else:
-            os.close(pipe_write)
-            return self._parent(pid, os.fdopen(pipe_read, "r"))
-
-    def _parent(self, child_pid, pipe):
-        child_output = StringIO()
-        out = pipe.read()
-        while out:
-            child_output.write(out)
-            out = pipe.read()
-        child_pid, child_status = os.waitpid(child_pid, os.P_WAIT)
-        if os.WIFSIGNALED(child_status):
-            child_signal = os.WTERMSIG(child_status)
-            if child_signal == signal.SIGALRM:
-                raise Gfal2Error(errno.ETIMEDOUT, "Timeout expired")
-            else:
+            self.pool._release(worker)
+            if "errno" in response:
+                raise Gfal2Error(response["errno"], response["message"])
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        for item in self.items:
+            return item
+        while self.worker is not None:
+            worker, self.worker = self.worker, None
+            self.process(worker, self.pool._receive(worker, self.timeout))
+            for item in self.items:
+                return item
+        raise StopIteration()
+
+    def close(self):
+        """
+        Stop reading. The worker is killed if it has not sent everything yet.
+        """
+        if self.worker is not None:
+            worker, self.worker = self.worker, None
+            self.pool._discard(worker, kill=True)
+
+    def __del__(self):
+        self.close()
+
+
+class Gfal2WorkerPool(object):
+    """
+    Runs the calls to gfal2 in long-lived separated processes.
+    This reduces the risks of bugs from gfal2, or bad isolation
+    impacting the REST API (i.e FTS-35), without paying for a fork and a
+    new gfal2 context on each call.
+    Workers that crash or time out are replaced, and workers are recycled
+    after max_calls calls.
+    """
+
+    def __init__(self, size, max_calls):
+        self.size = max(size, 1)
+        self.max_calls = max_calls
+        self._idle = []
+        self._alive = 0
+        self._condition = threading.Condition()
+
+    def _checkout(self):
+        with self._condition:
+            while not self._idle and self._alive >= self.size:
+                self._condition.wait()
+            if self._idle:
+                return self._idle.pop()
+            worker = _Worker()
+            self._alive += 1
+            return worker
+
+    def _release(self, worker):
+        if self.max_calls and worker.calls >= self.max_calls:
+            self._discard(worker)
+        else:
+            with self._condition:
+                self._idle.append(worker)
+                self._condition.notify()
+
+    def _discard(self, worker, kill=False):
+        with self._condition:
+            self._alive -= 1
+            self._condition.notify()
+        return worker.close(kill)
+
+    def _receive(self, worker, timeout):
+        """
+        Read the next response of the worker, replacing it if it fails
+        """
+        try:
+            return worker.receive(timeout)
+        except _Timeout:
+            self._discard(worker, kill=True)
+            raise Gfal2Error(errno.ETIMEDOUT, "Timeout expired")
+        except Exception:
+            status = self._discard(worker, kill=True)
+            if os.WIFSIGNALED(status) and os.WTERMSIG(status) != signal.SIGKILL:
                 raise Gfal2Error(
-                    errno.EIO, "Child process killed by signal %d" % child_signal
+                    errno.EIO,
+                    "Worker process killed by signal %d" % os.WTERMSIG(status),
                 )
-        child_exit = os.WEXITSTATUS(child_status)
-        if child_exit:
-            raise Gfal2Error(child_exit, child_output.getvalue())
-        return json.loads(child_output.getvalue())
+            raise Gfal2Error(errno.EIO, "Worker process exited unexpectedly")
+
+    def _start(self, cred, method, args, kwargs, options, timeout):
+        frame = _encode_request(method, cred, list(args), kwargs, options)
+        worker = self._checkout()
+        try:
+            worker.send(frame)
+        except OSError:
+            # The worker is gone, _receive tells what happened to it
+            pass
+        return worker, self._receive(worker, timeout)
 
-    def _child(self, pipe, args, kwargs):
-        signal.alarm(30)
+    def call(self, cred, method, *args, timeout=30, options=None, **kwargs):
+        """
+        Calls method(context, *args, **kwargs) in a worker, with the environment
+        properly set up, and a gfal2 context initialized for cred
 
-        if not isinstance(self.cred, str):
-            os.environ["X509_USER_CERT"] = self.cred.name
-            os.environ["X509_USER_KEY"] = self.cred.name
-            os.environ["X509_USER_PROXY"] = self.cred.name
+        Args:
+            cred:    The delegated credential, or a token
+            method:  Module level function, its return value must be
+                     serializable as JSON
+            timeout: Seconds the call can take before the worker is killed
+            options: List of (group, key, value) to set in the context
 
-        exit_code = 0
-        try:
-            if context_type is None:
-                raise RuntimeError("Could not load the gfal2 python module")
-            ctx = context_type()
+        Raises:
+            Gfal2Error: The call failed, timed out, or the worker crashed
+        """
+        worker, response = self._start(cred, method, args, kwargs, options, timeout)
+        self._release(worker)
+        if "errno" in response:
+            raise Gfal2Error(response["errno"], response["message"])
+        return response["result"]
 
-            if isinstance(self.cred, str):
-                # A IAM token is used for authentication, set it in the context
-                s_cred = gfal2.cred_new("BEARER", self.cred.split(":")[0])
-                try:
-                    if isinstance(args[0], dict):
-                        if "surl" in args[0].keys():
-                            domain = urlparse(args[0]["surl"]).hostname
-                        else:
-                            domain = urlparse(args[0]["old"]).hostname
-                    else:
-                        domain = urlparse(args[0]).hostname
-                except Exception:
-                    # Will get a 401 from storage
-                    domain = ""
-                gfal2.cred_set(ctx, domain, s_cred)
-
-            result = self.method(ctx, *args, **kwargs)
-            pipe.write(json.dumps(result))
-        except gfal2.GError as ex:
-            pipe.write(ex.message)
-            exit_code = ex.code
-        except Exception as ex:
-            pipe.write(str(ex))
-            exit_code = errno.EIO
-        pipe.close()
-        os._exit(exit_code)
+    def stream(self, cred, method, *args, timeout=30, options=None, **kwargs):
+        """
+        Same as call, for methods that are generators. The items are returned
+        as soon as the worker produces them, so they are never held all at once.
+        The errors raised before the first item are raised by this method, and the
+        others while iterating. timeout applies to each batch of items.
+
+        Returns:
+            An iterator over the items, to be closed if not consumed entirely
+        """
+        worker, response = self._start(cred, method, args, kwargs, options, timeout)
+        stream = _ItemStream(self, timeout)
+        stream.process(worker, response)
+        return stream
+
+    def close(self):
+        """
+        Stop the idle workers
+        """
+        with self._condition:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            self._discard(worker)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool(size, max_calls):
+    """
+    Returns the pool of this process, creating it the first time.
+    Workers forked by another process (i.e. before the web server forks its
+    own workers) can not be shared, so each process has its own pool.
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool_pid != os.getpid():
+            _pool = Gfal2WorkerPool(size, max_calls)
+            _pool_pid = os.getpid()
+        return _pool
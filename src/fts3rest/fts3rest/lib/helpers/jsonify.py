@@ -22,6 +22,8 @@ import functools
 from flask import Response
 from flask import stream_with_context
 
+from fts3rest.lib.helpers import metrics
+
 log = logging.getLogger(__name__)
 
 
@@ -56,20 +58,45 @@ def to_json(data, indent=2):
     return json.dumps(data, cls=ClassEncoder, indent=indent, sort_keys=False)
 
 
+def _count_rows(count):
+    stats = metrics.current_request()
+    if stats is not None:
+        stats.rows += count
+
+
 def stream_response(data):
     """
     Serialize an iterable a a json-list using a generator, so we do not need to wait to serialize the full
     list before starting to send
     """
     log.debug("Yielding json response")
-    comma = False
-    yield "["
-    for item in data:
-        if comma:
-            yield ","
-        yield json.dumps(item, cls=ClassEncoder, indent=None, sort_keys=False)
-        comma = True
-    yield "]"
+    count = 0
+    try:
+        yield "["
+        for item in data:
+            if count:
+                yield ","
+            yield json.dumps(item, cls=ClassEncoder, indent=None, sort_keys=False)
+            count += 1
+        yield "]"
+    finally:
+        _count_rows(count)
+
+
+def stream_ndjson(data):
+    """
+    Serialize an iterable as newline-delimited JSON, one item per line
+    """
+    log.debug("Yielding ndjson response")
+    count = 0
+    try:
+        for item in data:
+            yield json.dumps(
+                item, cls=ClassEncoder, indent=None, sort_keys=False
+            ) + "\n"
+            count += 1
+    finally:
+        _count_rows(count)
 
 
 def jsonify(func):
@@ -86,7 +113,11 @@ def jsonify(func):
             response = data
             data = response.response
 
-        if (
+        if response is not None and response.mimetype == "text/csv":
+            return response
+        elif response is not None and response.mimetype == "application/x-ndjson":
+            data = stream_with_context(stream_ndjson(data))
+        elif (
             hasattr(data, "__iter__")
             and not isinstance(data, dict)
             and not isinstance(data, str)
@@ -0,0 +1,188 @@
+#   Copyright 2020 CERN
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Incremental parsing of a JSON object read from a stream.
+
+The document is read in chunks and decoded value by value, so neither the raw
+body nor its decoded text are ever held in memory as a whole. Selected
+top-level arrays are decoded one item at a time, and each item is handed to a
+hook as soon as it is available, so it can be validated before the rest of the
+body is even read.
+"""
+
+import codecs
+import json
+import re
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# Characters that can continue a number
+_NUMBER_CHARS = frozenset("0123456789.eE+-")
+
+
+class RequestTooLarge(ValueError):
+    """
+    Raised when the stream is longer than the allowed size
+    """
+
+    def __init__(self, max_size):
+        super().__init__("The request body exceeds %d bytes" % max_size)
+        self.max_size = max_size
+
+
+class _StreamReader:
+    """
+    Buffers the decoded text of the stream, and decodes JSON values from it
+    """
+
+    def __init__(self, stream, max_size, chunk_size):
+        self.stream = stream
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.read = 0
+        self.eof = False
+
+    def _fill(self, size):
+        # Drop what has been consumed already
+        if self.pos:
+            self.buffer = self.buffer[self.pos :]
+            self.pos = 0
+        data = self.stream.read(size)
+        if not data:
+            self.eof = True
+            self.buffer += self.decoder.decode(b"", final=True)
+            return
+        self.read += len(data)
+        if self.max_size and self.read > self.max_size:
+            raise RequestTooLarge(self.max_size)
+        self.buffer += self.decoder.decode(data)
+
+    def peek(self):
+        """
+        Skip whitespaces, and return the next character, or '' at the end
+        """
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or self.eof:
+                return self.buffer[self.pos : self.pos + 1]
+            self._fill(self.chunk_size)
+
+    def expect(self, chars):
+        """
+        Consume the next character, which must be one of chars
+        """
+        char = self.peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(
+                "Expecting one of '%s'" % chars, self.buffer, self.pos
+            )
+        self.pos += 1
+        return char
+
+    def value(self):
+        """
+        Decode the next value
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer, self.pos)
+                # A number may continue on the next chunk (e.g. '1' of '1.5e3'),
+                # so it is complete only once something else follows it
+                if (
+                    self.eof
+                    or not isinstance(value, (int, float))
+                    or isinstance(value, bool)
+                    or (
+                        end < len(self.buffer) and self.buffer[end] not in _NUMBER_CHARS
+                    )
+                ):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Grow geometrically, so a large value is not re-parsed once per chunk
+            self._fill(max(self.chunk_size, len(self.buffer) - self.pos))
+
+
+def load_object(stream, max_size=None, item_hooks=None, chunk_size=64 * 1024):
+    """
+    Decode a JSON object from a stream, without reading the stream all at once
+
+    Args:
+        stream:     File-like object, opened in binary mode
+        max_size:   Maximum number of bytes to read. None or 0 means no limit.
+        item_hooks: Dictionary top-level key => callable(index, item). The
+                    arrays under these keys are decoded item by item, and the
+                    hook is called for each one of them as soon as it is decoded.
+        chunk_size: Bytes read from the stream at a time
+
+    Returns:
+        The decoded object
+
+    Raises:
+        json.JSONDecodeError if the document is not valid JSON
+        TypeError if the document is valid JSON, but not an object
+        RequestTooLarge if the stream is longer than max_size
+    """
+    item_hooks = item_hooks or {}
+    reader = _StreamReader(stream, max_size, chunk_size)
+
+    if reader.peek() != "{":
+        # Let the decoder tell apart invalid JSON from something else
+        reader.value()
+        raise TypeError("Expecting a JSON object")
+    reader.pos += 1
+
+    document = {}
+    if reader.peek() == "}":
+        reader.pos += 1
+    else:
+        while True:
+            if reader.peek() != '"':
+                raise json.JSONDecodeError(
+                    "Expecting property name", reader.buffer, reader.pos
+                )
+            key = reader.value()
+            reader.expect(":")
+            hook = item_hooks.get(key)
+            if hook is not None and reader.peek() == "[":
+                document[key] = _load_array(reader, hook)
+            else:
+                document[key] = reader.value()
+            if reader.expect(",}") == "}":
+                break
+
+    if reader.peek():
+        raise json.JSONDecodeError("Extra data", reader.buffer, reader.pos)
+    return document
+
+
+def _load_array(reader, hook):
+    reader.expect("[")
+    items = []
+    if reader.peek() == "]":
+        reader.pos += 1
+        return items
+    while True:
+        item = reader.value()
+        hook(len(items), item)
+        items.append(item)
+        if reader.expect(",]") == "]":
+            return items
@@ -0,0 +1,180 @@
+#   Copyright 2020 CERN
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Pool of pre-generated RSA keys for the delegation requests.
+
+Generating a key is CPU bound, and takes long enough to saturate the workers
+when many clients delegate at the same time. Keys are generated ahead by a
+background thread, and handed out on demand. When the pool is empty, the key is
+generated by the caller, as it would have been without the pool.
+"""
+
+import collections
+import logging
+import os
+import threading
+import time
+
+from M2Crypto import RSA
+
+from fts3rest.lib.helpers import metrics
+
+log = logging.getLogger(__name__)
+
+
+def _mute_callback(*args, **kwargs):
+    pass
+
+
+def generate_key(key_len):
+    """
+    Generate an RSA key pair
+    """
+    return RSA.gen_key(key_len, 65537, callback=_mute_callback)
+
+
+class KeyPool:
+    """
+    Keeps up to 'size' RSA keys of 'key_len' bits ready to be used
+    """
+
+    def __init__(self, key_len, size, generator=generate_key):
+        self.key_len = key_len
+        self.size = size
+        self.generator = generator
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.generation_seconds = 0.0
+        self.wait_seconds = 0.0
+        self._keys = collections.deque()
+        self._lock = threading.Lock()
+        self._refill = threading.Event()
+        self._thread = None
+
+    def _generate(self):
+        start = time.perf_counter()
+        key = self.generator(self.key_len)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.generated += 1
+            self.generation_seconds += elapsed
+        return key
+
+    def _run(self):
+        while True:
+            while len(self._keys) < self.size:
+                try:
+                    key = self._generate()
+                except Exception:
+                    log.exception("Failed to pre-generate a %d bits key" % self.key_len)
+                    break
+                self._keys.append(key)
+            self._refill.wait()
+            self._refill.clear()
+
+    def start(self):
+        """
+        Start the background generation
+        """
+        if self.size > 0 and self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="keypool-%d" % self.key_len, daemon=True
+            )
+            self._thread.start()
+
+    def get(self):
+        """
+        Return a key from the pool, or a freshly generated one if it is empty
+        """
+        start = time.perf_counter()
+        try:
+            key = self._keys.popleft()
+            hit = True
+        except IndexError:
+            key = self._generate()
+            hit = False
+        self._refill.set()
+        elapsed = time.perf_counter() - start
+        metrics.CACHE_REQUESTS.inc("key_pool", "hit" if hit else "miss")
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.wait_seconds += elapsed
+        return key
+
+    def metrics(self):
+        """
+        Pool depth, hit ratio, and average latencies in seconds
+        """
+        with self._lock:
+            served = self.hits + self.misses
+            return dict(
+                key_len=self.key_len,
+                size=self.size,
+                depth=len(self._keys),
+                hits=self.hits,
+                misses=self.misses,
+                generated=self.generated,
+                avg_generation_seconds=(
+                    self.generation_seconds / self.generated if self.generated else 0.0
+                ),
+                avg_wait_seconds=self.wait_seconds / served if served else 0.0,
+            )
+
+
+_pools = {}
+_pools_pid = None
+_pools_lock = threading.Lock()
+
+
+def get_key_pool(key_len, size):
+    """
+    Returns the pool of this process for the given key length, starting it
+    the first time. Pools are created after the worker processes are forked,
+    since threads do not survive a fork.
+    """
+    global _pools_pid
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(key_len)
+        if pool is None:
+            pool = KeyPool(key_len, size)
+            pool.start()
+            _pools[key_len] = pool
+        return pool
+
+
+def key_pool_metrics():
+    """
+    Metrics of all the pools of this process
+    """
+    with _pools_lock:
+        pools = list(_pools.values()) if _pools_pid == os.getpid() else []
+    return [pool.metrics() for pool in pools]
+
+
+def _collect_metrics():
+    return [
+        (metrics.KEY_POOL_DEPTH, [str(m["key_len"])], m["depth"])
+        for m in key_pool_metrics()
+    ]
+
+
+metrics.register_collector(_collect_metrics)
@@ -0,0 +1,434 @@
+#   Copyright 2020 CERN
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Metrics of the service, exposed in the Prometheus text format by /metrics.
+
+Each process keeps its metrics in memory, so updating them only takes a lock.
+When the service runs in several processes (i.e. mod_wsgi daemon processes),
+each process writes a snapshot of its metrics into a shared directory
+(fts3.MetricsDir) every few seconds, and /metrics aggregates all the snapshots.
+Counters and histograms of the processes that are gone are kept, so they do not
+go backwards when a process is recycled. Gauges only count for live processes.
+The directory is not cleaned up by the service, and should be emptied when it
+is (re)started.
+"""
+
+import bisect
+import fcntl
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+_SNAPSHOT_RE = re.compile(r"^metrics-(\d+)-(\d+)\.json$")
+_ARCHIVE = "metrics-archive.json"
+_LOCK = ".metrics.lock"
+
+
+class _Registry:
+    """
+    Metric definitions, and the values of this process
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        self.reset()
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.values = {}
+        self.name = "metrics-%d-%d.json" % (os.getpid(), time.time_ns())
+        self.last_flush = time.monotonic()
+
+
+_registry = _Registry()
+# Values inherited from the parent would be counted twice
+os.register_at_fork(after_in_child=_registry.reset)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _registry.metrics[name] = self
+
+
+class Counter(_Metric):
+    """
+    Value that only goes up
+    """
+
+    type = "counter"
+
+    def inc(self, *labels, amount=1):
+        key = (self.name, labels)
+        with _registry.lock:
+            _registry.values[key] = _registry.values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """
+    Value that can go up and down. Gauges are set by the collectors when
+    the snapshot is taken.
+    """
+
+    type = "gauge"
+
+
+class Histogram(_Metric):
+    """
+    Distribution of the observed values. Internally each bucket only counts the
+    values that fall into it, followed by the overflow bucket and the sum.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        key = (self.name, labels)
+        with _registry.lock:
+            values = _registry.values.get(key)
+            if values is None:
+                values = [0] * (len(self.buckets) + 1) + [0.0]
+                _registry.values[key] = values
+            values[index] += 1
+            values[-1] += value
+
+
+def register_collector(collector):
+    """
+    Register a callable that returns a list of (metric, labels, value),
+    called every time a snapshot is taken
+    """
+    _registry.collectors.append(collector)
+
+
+REQUESTS = Counter(
+    "fts_rest_requests_total",
+    "HTTP requests handled",
+    ("endpoint", "method", "status"),
+)
+REQUEST_SECONDS = Histogram(
+    "fts_rest_request_duration_seconds",
+    "Time spent handling the request, including sending the response",
+    ("endpoint", "method"),
+)
+REQUEST_DB_SECONDS = Histogram(
+    "fts_rest_request_db_seconds",
+    "Time spent executing database statements per request",
+    ("endpoint",),
+)
+ROWS_SERIALIZED = Counter(
+    "fts_rest_rows_serialized_total",
+    "Items serialized into list responses",
+    ("endpoint",),
+)
+DB_OPERATION_SECONDS = Histogram(
+    "fts_rest_db_operation_seconds",
+    "Time spent on the database by the submission steps",
+    ("operation",),
+)
+JOB_REQUESTS = Counter(
+    "fts_rest_job_requests_total",
+    "Requests to the job endpoints, per VO",
+    ("vo", "method", "status"),
+)
+CACHE_REQUESTS = Counter(
+    "fts_rest_cache_requests_total",
+    "Cache lookups, per cache and result (hit or miss)",
+    ("cache", "result"),
+)
+DB_REPLICA_ROUTES = Counter(
+    "fts_rest_db_replica_routes_total",
+    "Read only sessions, per database they were sent to (replica or primary)",
+    ("target",),
+)
+STATEMENT_TIMEOUTS = Counter(
+    "fts_rest_statement_timeouts_total",
+    "Statements cancelled by the database for exceeding the statement timeout",
+    ("endpoint",),
+)
+KEY_POOL_DEPTH = Gauge(
+    "fts_rest_key_pool_depth",
+    "Pre-generated delegation keys ready to be used",
+    ("key_len",),
+)
+
+
+class RequestStats:
+    """
+    What a request has done so far, filled as it goes
+    """
+
+    __slots__ = ("endpoint", "db_seconds", "rows", "statements", "statement_counts")
+
+    def __init__(self):
+        self.endpoint = None
+        self.db_seconds = 0.0
+        self.rows = 0
+        # Only filled by the SQL instrumentation (see helpers.sqlstats)
+        self.statements = 0
+        self.statement_counts = {}
+
+
+_local = threading.local()
+
+
+def begin_request(stats):
+    _local.request = stats
+
+
+def end_request():
+    _local.request = None
+
+
+def current_request():
+    """
+    Stats of the request being handled by this thread, or None
+    """
+    return getattr(_local, "request", None)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._fts3_started = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_request()
+    if stats is not None and context is not None:
+        stats.db_seconds += time.perf_counter() - context._fts3_started
+
+
+def _snapshot():
+    values = {}
+    with _registry.lock:
+        for key, value in _registry.values.items():
+            values[key] = list(value) if isinstance(value, list) else value
+    for collector in _registry.collectors:
+        try:
+            for metric, labels, value in collector():
+                values[(metric.name, tuple(labels))] = value
+        except Exception:
+            log.exception("Metrics collector failed")
+    return values
+
+
+def _write(path, values):
+    tmp_path = "%s.%d.%d.tmp" % (path, os.getpid(), threading.get_ident())
+    with open(tmp_path, "w") as fd:
+        json.dump(
+            [[name, labels, value] for (name, labels), value in values.items()], fd
+        )
+    os.replace(tmp_path, path)
+
+
+def _read(path):
+    try:
+        with open(path) as fd:
+            return dict(
+                ((name, tuple(labels)), value) for name, labels, value in json.load(fd)
+            )
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        log.warning("Ignoring corrupted metrics snapshot %s" % path)
+        return {}
+
+
+def flush(directory):
+    """
+    Write the snapshot of this process into the directory
+    """
+    _registry.last_flush = time.monotonic()
+    try:
+        _write(os.path.join(directory, _registry.name), _snapshot())
+    except OSError as e:
+        log.warning("Could not write the metrics snapshot: %s" % str(e))
+
+
+def maybe_flush(directory, interval):
+    """
+    Flush if the last one was more than interval seconds ago
+    """
+    if directory and time.monotonic() - _registry.last_flush >= interval:
+        flush(directory)
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _merge(into, values, gauges=True):
+    for key, value in values.items():
+        metric = _registry.metrics.get(key[0])
+        if metric is None:
+            continue
+        if metric.type == "gauge" and not gauges:
+            continue
+        current = into.get(key)
+        if current is None:
+            into[key] = list(value) if isinstance(value, list) else value
+        elif isinstance(value, list):
+            if len(value) == len(current):
+                into[key] = [a + b for a, b in zip(current, value)]
+        else:
+            into[key] = current + value
+
+
+def _aggregate(directory):
+    """
+    Merge the snapshots found in the directory. The snapshots of dead processes
+    are moved into the archive, so the directory does not grow forever.
+    """
+    aggregated = {}
+    with open(os.path.join(directory, _LOCK), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        archive_path = os.path.join(directory, _ARCHIVE)
+        archive = _read(archive_path)
+        dead = []
+        for name in os.listdir(directory):
+            match = _SNAPSHOT_RE.match(name)
+            if not match:
+                continue
+            path = os.path.join(directory, name)
+            if name == _registry.name:
+                continue
+            if _is_alive(int(match.group(1))):
+                _merge(aggregated, _read(path))
+            else:
+                _merge(archive, _read(path), gauges=False)
+                dead.append(path)
+        if dead:
+            _write(archive_path, archive)
+            for path in dead:
+                os.unlink(path)
+        _merge(aggregated, archive)
+    return aggregated
+
+
+def collect(directory=None):
+    """
+    Values of all the metrics, of this process or of all the processes
+    sharing the directory
+
+    Returns:
+        A dictionary (name, labels) => value
+    """
+    values = _snapshot()
+    if directory:
+        _registry.last_flush = time.monotonic()
+        try:
+            _write(os.path.join(directory, _registry.name), values)
+            aggregated = _aggregate(directory)
+        except OSError as e:
+            log.warning("Could not aggregate the metrics snapshots: %s" % str(e))
+        else:
+            _merge(aggregated, values)
+            values = aggregated
+    return values
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labelnames, labels, extra=()):
+    pairs = list(zip(labelnames, labels)) + list(extra)
+    if not pairs:
+        return ""
+    return "{%s}" % ",".join('%s="%s"' % (k, _escape(v)) for k, v in pairs)
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def render(directory=None):
+    """
+    Metrics in the Prometheus text exposition format
+    """
+    values = collect(directory)
+    by_metric = {}
+    for (name, labels), value in values.items():
+        by_metric.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name, metric in _registry.metrics.items():
+        lines.append("# HELP %s %s" % (name, metric.documentation))
+        lines.append("# TYPE %s %s" % (name, metric.type))
+        for labels, value in sorted(by_metric.get(name, [])):
+            if metric.type != "histogram":
+                lines.append(
+                    "%s%s %s"
+                    % (name, _labels(metric.labelnames, labels), _number(value))
+                )
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + ("+Inf",), value[:-1]):
+                cumulative += count
+                le = bound if isinstance(bound, str) else _number(float(bound))
+                lines.append(
+                    "%s_bucket%s %d"
+                    % (
+                        name,
+                        _labels(metric.labelnames, labels, [("le", le)]),
+                        cumulative,
+                    )
+                )
+            lines.append(
+                "%s_sum%s %s"
+                % (name, _labels(metric.labelnames, labels), _number(value[-1]))
+            )
+            lines.append(
+                "%s_count%s %d" % (name, _labels(metric.labelnames, labels), cumulative)
+            )
+    return "\n".join(lines) + "\n"
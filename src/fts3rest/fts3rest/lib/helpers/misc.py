@@ -1,11 +1,22 @@
 import json
 from urllib.parse import unquote_plus
-from werkzeug.exceptions import BadRequest
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
 
+from fts3rest.lib.helpers.jsonstream import load_object, RequestTooLarge
 
-def get_input_as_dict(request, from_query=False):
+
+def get_input_as_dict(
+    request, from_query=False, stream=False, max_size=None, item_hooks=None
+):
     """
     Return a valid dictionary from the request input
+
+    If stream is True, JSON bodies are decoded incrementally from the request
+    stream instead of being read all at once.
+    Bodies longer than max_size bytes are rejected with a 413, whatever their
+    content type.
+    item_hooks maps top-level keys to a callable(index, item), called for
+    each item of the array under that key (see jsonstream.load_object)
     """
     content_type = request.content_type
     if from_query:
@@ -14,10 +25,17 @@ def get_input_as_dict(request, from_query=False):
         content_type
         and content_type == "application/json, application/x-www-form-urlencoded"
     ):
-        input_dict = json.loads(unquote_plus(request.data))
+        try:
+            input_dict = json.loads(
+                unquote_plus(_read_body(request, max_size).decode("utf-8"))
+            )
+        except ValueError:
+            raise BadRequest("Badly formatted JSON request")
     elif (
         content_type and content_type.startswith("application/json")
     ) or request.method == "PUT":
+        if stream:
+            return _load_stream(request, max_size, item_hooks)
         try:
             input_dict = json.loads(request.data)
         except Exception:
@@ -25,6 +43,9 @@ def get_input_as_dict(request, from_query=False):
     elif content_type and request.content_type.startswith(
         "application/x-www-form-urlencoded"
     ):
+        # Something else may have parsed the form already, so the stream
+        # can not be read again: only the announced size can be checked
+        _check_size(request, max_size)
         input_dict = dict(request.values)
     else:
         raise BadRequest(
@@ -33,4 +54,55 @@ def get_input_as_dict(request, from_query=False):
 
     if not hasattr(input_dict, "__getitem__") or not hasattr(input_dict, "get"):
         raise BadRequest("Expecting a dictionary")
+    for key, hook in (item_hooks or {}).items():
+        items = input_dict.get(key)
+        if isinstance(items, list):
+            for index, item in enumerate(items):
+                hook(index, item)
     return input_dict
+
+
+def _check_size(request, max_size):
+    if max_size and request.content_length and request.content_length > max_size:
+        raise RequestEntityTooLarge("The request body exceeds %d bytes" % max_size)
+
+
+def _read_body(request, max_size):
+    """
+    Read the whole body, but never more than max_size bytes of it
+    """
+    if not max_size:
+        return request.get_data()
+    _check_size(request, max_size)
+    data = request.stream.read(max_size + 1)
+    if len(data) > max_size:
+        raise RequestEntityTooLarge("The request body exceeds %d bytes" % max_size)
+    return data
+
+
+def _load_stream(request, max_size, item_hooks):
+    _check_size(request, max_size)
+    try:
+        return load_object(request.stream, max_size=max_size, item_hooks=item_hooks)
+    except RequestTooLarge as ex:
+        raise RequestEntityTooLarge(str(ex))
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise BadRequest("Badly formatted JSON request")
+    except TypeError:
+        raise BadRequest("Expecting a dictionary")
+
+
+def parse_endpoint_map(value, convert=int):
+    """
+    Parse a configuration value like 'endpoint:value, endpoint:value'
+
+    Returns:
+        A dictionary endpoint => converted value
+    """
+    parsed = {}
+    for item in (value or "").split(","):
+        if not item.strip():
+            continue
+        endpoint, endpoint_value = item.rsplit(":", 1)
+        parsed[endpoint.strip()] = convert(endpoint_value.strip())
+    return parsed
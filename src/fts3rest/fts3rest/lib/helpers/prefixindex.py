@@ -0,0 +1,155 @@
+#   Copyright 2020 CERN
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+In memory prefix indexes for the autocomplete endpoints.
+
+The DNs, storages and VO names are loaded once per process, and searched with a
+binary search instead of a SELECT DISTINCT ... LIKE per keystroke. When the
+indexes get older than the refresh interval, they are refreshed by a background
+thread while the requests keep using the previous ones. The VO names come from
+t_job, so only the jobs submitted since the last refresh are read, and the
+whole table is only scanned again every full refresh interval.
+"""
+
+import bisect
+import logging
+import threading
+import time
+
+from sqlalchemy import func
+
+from fts3rest.model import Credential, LinkConfig, Job
+from fts3rest.model.meta import Session
+
+log = logging.getLogger(__name__)
+
+
+class PrefixIndex:
+    """
+    Sorted unique values, searched by prefix in O(log n + k)
+    """
+
+    def __init__(self, values=()):
+        self.values = sorted(set(values))
+
+    def __len__(self):
+        return len(self.values)
+
+    def search(self, prefix, limit=None):
+        """
+        Values that start with prefix, in order, up to limit
+        """
+        values = self.values
+        matches = []
+        i = bisect.bisect_left(values, prefix)
+        while i < len(values) and values[i].startswith(prefix):
+            if limit is not None and len(matches) >= limit:
+                break
+            matches.append(values[i])
+            i += 1
+        return matches
+
+    def union(self, values):
+        """
+        New index with the values of this one plus the given ones
+        """
+        return PrefixIndex(self.values + list(values))
+
+
+class AutocompleteIndex:
+    """
+    Prefix indexes of the DNs ("dn"), storages ("source", "destination" and
+    "storage") and VO names ("vo")
+    """
+
+    def __init__(self, refresh_interval=300, full_refresh_interval=3600):
+        self.refresh_interval = refresh_interval
+        self.full_refresh_interval = full_refresh_interval
+        self.indexes = None
+        self.refreshed = 0
+        self.full_refreshed = 0
+        self.vo_since = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _load_vos(self, full):
+        if full or self.vo_since is None:
+            query = Session.query(Job.vo_name, func.max(Job.submit_time))
+            vos = PrefixIndex()
+        else:
+            query = Session.query(Job.vo_name, func.max(Job.submit_time)).filter(
+                Job.submit_time >= self.vo_since
+            )
+            vos = self.indexes["vo"]
+        rows = query.group_by(Job.vo_name).all()
+        since = max([row[1] for row in rows if row[1]], default=self.vo_since)
+        return vos.union(row[0] for row in rows if row[0]), since
+
+    def refresh(self, full=False):
+        """
+        Load the values from the database, and publish the new indexes
+        """
+        start = time.monotonic()
+        full = full or start - self.full_refreshed >= self.full_refresh_interval
+        dns = [row[0] for row in Session.query(Credential.dn).distinct()]
+        links = Session.query(LinkConfig.source, LinkConfig.destination).all()
+        sources = [row[0] for row in links if row[0]]
+        destinations = [row[1] for row in links if row[1]]
+        vos, self.vo_since = self._load_vos(full)
+
+        self.indexes = {
+            "dn": PrefixIndex(dns),
+            "source": PrefixIndex(sources),
+            "destination": PrefixIndex(destinations),
+            "storage": PrefixIndex(sources + destinations),
+            "vo": vos,
+        }
+        self.refreshed = start
+        if full:
+            self.full_refreshed = start
+        log.debug(
+            "Autocomplete indexes refreshed in %.3f seconds"
+            % (time.monotonic() - start)
+        )
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            log.warning("Could not refresh the autocomplete indexes: %s" % str(e))
+        finally:
+            Session.remove()
+            self._refreshing = False
+
+    def search(self, name, prefix, limit=None):
+        """
+        Search the index 'name'. The first search loads the indexes, the
+        following ones trigger a background refresh when they are too old
+        """
+        if self.indexes is None:
+            with self._lock:
+                if self.indexes is None:
+                    self.refresh(full=True)
+        elif time.monotonic() - self.refreshed >= self.refresh_interval:
+            with self._lock:
+                start = not self._refreshing
+                self._refreshing = True
+            if start:
+                threading.Thread(
+                    target=self._refresh_in_background,
+                    name="autocomplete_refresh",
+                    daemon=True,
+                ).start()
+        return self.indexes[name].search(prefix, limit)
@@ -0,0 +1,300 @@
+#   Copyright 2020 CERN
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+In-process inspection of X509 proxies, so voms-proxy-info does not need to be
+spawned to know the type, the FQANs or the lifetime of a proxy.
+
+The chain is loaded with M2Crypto. M2Crypto does not expose the value of the
+extensions OpenSSL does not know about, so the VOMS attribute certificates
+(RFC 5755) are read from the DER encoding of the certificate by a minimal
+DER reader.
+"""
+
+from datetime import datetime
+
+from M2Crypto import BIO, X509
+
+OID_PROXY_CERT_INFO = "1.3.6.1.5.5.7.1.14"
+OID_PROXY_CERT_INFO_DRAFT = "1.3.6.1.4.1.3536.1.222"
+OID_VOMS_AC_SEQUENCE = "1.3.6.1.4.1.8005.100.100.5"
+OID_VOMS_FQAN = "1.3.6.1.4.1.8005.100.100.4"
+
+_OCTET_STRING = 0x04
+_OID = 0x06
+_UTF8_STRING = 0x0C
+_UTC_TIME = 0x17
+_GENERALIZED_TIME = 0x18
+_SEQUENCE = 0x30
+_SET = 0x31
+_CONTEXT_0 = 0xA0
+_CONTEXT_3 = 0xA3
+_URI = 0x86
+
+
+class ProxyInfoException(Exception):
+    """
+    Raised when the proxy can not be parsed
+    """
+
+
+def _elements(data, start, end):
+    """
+    Split the DER encoded elements found between start and end
+
+    Returns:
+        A list of tuples (tag, start of the content, end of the content)
+    """
+    elements = []
+    pos = start
+    while pos < end:
+        if pos + 2 > end:
+            raise ProxyInfoException("Truncated DER element")
+        tag = data[pos]
+        if tag & 0x1F == 0x1F:
+            raise ProxyInfoException("Unsupported DER tag")
+        length = data[pos + 1]
+        pos += 2
+        if length & 0x80:
+            nbytes = length & 0x7F
+            if nbytes == 0 or nbytes > 4 or pos + nbytes > end:
+                raise ProxyInfoException("Invalid DER length")
+            length = int.from_bytes(data[pos : pos + nbytes], "big")
+            pos += nbytes
+        if pos + length > end:
+            raise ProxyInfoException("Truncated DER element")
+        elements.append((tag, pos, pos + length))
+        pos += length
+    return elements
+
+
+def _sequence(data, element, min_length=0):
+    """
+    Elements contained in a DER sequence (or set, or explicitly tagged element)
+    """
+    elements = _elements(data, element[1], element[2])
+    if len(elements) < min_length:
+        raise ProxyInfoException("Expecting at least %d DER elements" % min_length)
+    return elements
+
+
+def _expect(element, *tags):
+    if element[0] not in tags:
+        raise ProxyInfoException("Unexpected DER tag 0x%02x" % element[0])
+    return element
+
+
+def _decode_oid(raw):
+    arcs = []
+    value = 0
+    for byte in raw:
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            arcs.append(value)
+            value = 0
+    if not arcs:
+        raise ProxyInfoException("Empty OID")
+    first = min(arcs[0] // 40, 2)
+    return ".".join(str(arc) for arc in [first, arcs[0] - 40 * first] + arcs[1:])
+
+
+def _decode_time(data, element):
+    tag, start, end = _expect(element, _GENERALIZED_TIME, _UTC_TIME)
+    value = data[start:end].decode("ascii")
+    try:
+        if tag == _UTC_TIME:
+            return datetime.strptime(value, "%y%m%d%H%M%SZ")
+        # Fractions of seconds are allowed, but irrelevant for a lifetime
+        if "." in value:
+            value = value[: value.index(".")] + "Z"
+        return datetime.strptime(value, "%Y%m%d%H%M%SZ")
+    except ValueError:
+        raise ProxyInfoException("Invalid time: %s" % value)
+
+
+def get_extensions(der):
+    """
+    Extensions of a DER encoded certificate
+
+    Returns:
+        A dictionary OID => value of the extension, DER encoded
+    """
+    certificate = _expect(_elements(der, 0, len(der))[0], _SEQUENCE)
+    tbs_certificate = _expect(_sequence(der, certificate, 1)[0], _SEQUENCE)
+    extensions = {}
+    for element in _sequence(der, tbs_certificate):
+        if element[0] != _CONTEXT_3:
+            continue
+        extension_list = _expect(_sequence(der, element, 1)[0], _SEQUENCE)
+        for extension in _sequence(der, extension_list):
+            fields = _sequence(der, _expect(extension, _SEQUENCE), 2)
+            _, oid_start, oid_end = _expect(fields[0], _OID)
+            # The critical flag is optional
+            _, start, end = _expect(fields[-1], _OCTET_STRING)
+            extensions[_decode_oid(der[oid_start:oid_end])] = der[start:end]
+    return extensions
+
+
+class AttributeCertificate(object):
+    """
+    A VOMS attribute certificate
+
+    Attributes:
+        vo:         Name of the VO that issued it
+        fqans:      List of FQANs, the primary one first
+        not_before: Start of the validity, naive UTC
+        not_after:  End of the validity, naive UTC
+    """
+
+    def __init__(self, vo, fqans, not_before, not_after):
+        self.vo = vo
+        self.fqans = fqans
+        self.not_before = not_before
+        self.not_after = not_after
+
+
+def _parse_ietf_attr_syntax(data, element):
+    """
+    IetfAttrSyntax ::= SEQUENCE {
+        policyAuthority [0] GeneralNames OPTIONAL,
+        values SEQUENCE OF CHOICE { OCTET STRING, OID, UTF8String } }
+
+    Returns:
+        A tuple (policy authority, values)
+    """
+    fields = _sequence(data, _expect(element, _SEQUENCE), 1)
+    authority = None
+    if fields[0][0] == _CONTEXT_0:
+        # A single GeneralName, uniformResourceIdentifier [6] IA5String
+        for tag, start, end in _sequence(data, fields[0]):
+            if tag == _URI:
+                authority = data[start:end].decode("utf-8", "replace")
+                break
+        fields = fields[1:]
+    values = []
+    if fields:
+        for tag, start, end in _sequence(data, _expect(fields[0], _SEQUENCE)):
+            if tag in (_OCTET_STRING, _UTF8_STRING):
+                values.append(data[start:end].decode("utf-8"))
+    return authority, values
+
+
+def _parse_attribute_certificate(data, element):
+    """
+    AttributeCertificate ::= SEQUENCE {
+        acinfo SEQUENCE {
+            version, holder, issuer, signature, serialNumber,
+            attrCertValidityPeriod SEQUENCE { notBefore, notAfter },
+            attributes SEQUENCE OF Attribute, ... },
+        signatureAlgorithm, signatureValue }
+    """
+    acinfo = _expect(_sequence(data, _expect(element, _SEQUENCE), 1)[0], _SEQUENCE)
+    fields = _sequence(data, acinfo, 7)
+    validity = _sequence(data, _expect(fields[5], _SEQUENCE), 2)
+    not_before = _decode_time(data, validity[0])
+    not_after = _decode_time(data, validity[1])
+
+    vo = None
+    fqans = []
+    for attribute in _sequence(data, _expect(fields[6], _SEQUENCE)):
+        attr_type, attr_values = _sequence(data, _expect(attribute, _SEQUENCE), 2)[:2]
+        _, oid_start, oid_end = _expect(attr_type, _OID)
+        if _decode_oid(data[oid_start:oid_end]) != OID_VOMS_FQAN:
+            continue
+        for value in _sequence(data, _expect(attr_values, _SET)):
+            authority, values = _parse_ietf_attr_syntax(data, value)
+            if authority and vo is None:
+                # voname://host:port
+                vo = authority.split("://", 1)[0]
+            fqans.extend(values)
+    return AttributeCertificate(vo, fqans, not_before, not_after)
+
+
+def parse_voms_extension(value):
+    """
+    Parse the value of the VOMS extension, which holds a sequence of
+    attribute certificates
+
+    Returns:
+        A list of AttributeCertificate
+    """
+    sequence = _expect(_elements(value, 0, len(value))[0], _SEQUENCE)
+    certificates = []
+    for ac_list in _sequence(value, sequence):
+        # ACs are wrapped into one more sequence
+        for element in _sequence(value, _expect(ac_list, _SEQUENCE)):
+            certificates.append(_parse_attribute_certificate(value, element))
+    return certificates
+
+
+def _read_x509_list(proxy_pem):
+    x509_list = []
+    bio = BIO.MemoryBuffer(proxy_pem)
+    try:
+        while bio.readable():
+            x509_list.append(X509.load_cert_bio(bio))
+    except X509.X509Error:
+        pass
+    return x509_list
+
+
+class ProxyInfo(object):
+    """
+    Information of a PEM encoded proxy, equivalent to what voms-proxy-info gives
+    """
+
+    def __init__(self, proxy_pem):
+        x509_list = _read_x509_list(proxy_pem)
+        if not x509_list:
+            raise ProxyInfoException("Could not load the proxy")
+
+        self.not_after = min(
+            x509.get_not_after().get_datetime().replace(tzinfo=None)
+            for x509 in x509_list
+        )
+
+        extensions = get_extensions(x509_list[0].as_der())
+        if OID_PROXY_CERT_INFO in extensions:
+            self.type = "RFC"
+        elif OID_PROXY_CERT_INFO_DRAFT in extensions:
+            self.type = "draft"
+        else:
+            self.type = "legacy"
+
+        # The ACs are on the last delegation that added them
+        self.attribute_certificates = []
+        for x509 in x509_list:
+            if x509 is not x509_list[0]:
+                extensions = get_extensions(x509.as_der())
+            if OID_VOMS_AC_SEQUENCE in extensions:
+                self.attribute_certificates = parse_voms_extension(
+                    extensions[OID_VOMS_AC_SEQUENCE]
+                )
+                break
+
+    @property
+    def fqans(self):
+        """
+        FQANs of all the attribute certificates
+        """
+        return [fqan for ac in self.attribute_certificates for fqan in ac.fqans]
+
+    @property
+    def termination_time(self):
+        """
+        End of the validity of both the chain and the attribute certificates
+        """
+        return min(
+            [self.not_after] + [ac.not_after for ac in self.attribute_certificates]
+        )
@@ -0,0 +1,115 @@
+#   Copyright 2020 CERN
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Choice of the read replica used by the read only endpoints.
+
+A replica is only used while its replication lag is below the configured
+maximum. The lag is measured at most once every check interval per replica and
+process; a replica that can not be queried, or whose replication is stopped,
+counts as lagging. When no replica qualifies, the primary is used.
+"""
+
+import itertools
+import logging
+import threading
+import time
+
+from sqlalchemy import text
+
+from fts3rest.lib.helpers import metrics
+
+log = logging.getLogger(__name__)
+
+_MYSQL_LAG = "SHOW SLAVE STATUS"
+_POSTGRESQL_LAG = (
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+def get_replication_lag(connection):
+    """
+    Replication lag in seconds of the database behind the connection,
+    or None if it is unknown
+    """
+    dialect = connection.dialect.name
+    if dialect == "mysql":
+        row = connection.execute(text(_MYSQL_LAG)).mappings().first()
+        if row is None:
+            # Not a replica
+            return 0
+        return row["Seconds_Behind_Master"]
+    elif dialect == "postgresql":
+        return connection.execute(text(_POSTGRESQL_LAG)).scalar()
+    return 0
+
+
+class _Replica:
+    def __init__(self, engine):
+        self.engine = engine
+        self.lag = None
+        self.checked = None
+        self.lock = threading.Lock()
+
+
+class ReplicaRouter:
+    """
+    Hands out the replicas in turns, skipping those that lag behind
+    """
+
+    def __init__(self, engines, max_lag=30, check_interval=10):
+        self.replicas = [_Replica(engine) for engine in engines]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._turn = itertools.count()
+
+    def _check(self, replica):
+        try:
+            with replica.engine.connect() as connection:
+                replica.lag = get_replication_lag(connection)
+        except Exception as e:
+            log.warning(
+                "Could not get the replication lag of %s: %s"
+                % (repr(replica.engine.url), str(e))
+            )
+            replica.lag = None
+        replica.checked = time.monotonic()
+
+    def _usable(self, replica):
+        if replica.checked is None or (
+            time.monotonic() - replica.checked >= self.check_interval
+        ):
+            # Only one thread measures, the others use the last value
+            if replica.lock.acquire(blocking=replica.checked is None):
+                try:
+                    self._check(replica)
+                finally:
+                    replica.lock.release()
+        return replica.lag is not None and replica.lag <= self.max_lag
+
+    def pick(self):
+        """
+        Returns the engine of a replica, or None if none is usable
+        """
+        if not self.replicas:
+            return None
+        start = next(self._turn)
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(start + i) % len(self.replicas)]
+            if self._usable(replica):
+                metrics.DB_REPLICA_ROUTES.inc("replica")
+                return replica.engine
+        metrics.DB_REPLICA_ROUTES.inc("primary")
+        return None
@@ -0,0 +1,131 @@
+#   Copyright 2020 CERN
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Values that are expensive to compute, and can be served a bit stale.
+
+A snapshot is recomputed at most once per interval. Within a process, only one
+thread computes it, and the others keep serving the previous value meanwhile.
+With a directory shared by the processes, the value is also written there, and
+the processes take turns through a file lock: the one holding it computes,
+the others read its result.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+
+from fts3rest.lib.helpers import metrics
+
+log = logging.getLogger(__name__)
+
+
+class SharedSnapshot:
+    """
+    Value returned by 'compute', refreshed every 'interval' seconds
+    """
+
+    def __init__(self, name, compute, interval=60, directory=None):
+        self.name = name
+        self.compute = compute
+        self.interval = interval
+        self.directory = directory
+        self.value = None
+        self.computed = None
+        self._lock = threading.Lock()
+
+    def _fresh(self):
+        return self.computed is not None and (
+            time.time() - self.computed < self.interval
+        )
+
+    def _path(self):
+        return os.path.join(self.directory, self.name + ".json")
+
+    def _read(self):
+        try:
+            with open(self._path()) as snapshot_file:
+                content = json.load(snapshot_file)
+        except (OSError, ValueError):
+            return
+        if self.computed is None or content["computed"] > self.computed:
+            self.value = content["value"]
+            self.computed = content["computed"]
+
+    def _write(self):
+        path = self._path()
+        tmp_path = "%s.%d.%d" % (path, os.getpid(), threading.get_ident())
+        try:
+            with open(tmp_path, "w") as snapshot_file:
+                json.dump(
+                    {"computed": self.computed, "value": self.value}, snapshot_file
+                )
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log.warning("Could not write the %s snapshot: %s" % (self.name, str(e)))
+
+    def _refresh(self):
+        self.value = self.compute()
+        self.computed = time.time()
+
+    def _lead(self):
+        """
+        Refresh the value, unless another thread or process is already doing it
+        and there is a previous value to serve meanwhile
+        :return: True if the value has been computed by this call
+        """
+        wait = self.value is None
+        if not self._lock.acquire(blocking=wait):
+            return False
+        try:
+            if not self.directory:
+                if self._fresh():
+                    return False
+                self._refresh()
+                return True
+            with open(
+                os.path.join(self.directory, "." + self.name + ".lock"), "a"
+            ) as lock:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+                except BlockingIOError:
+                    return False
+                # The previous holder of the lock may have just refreshed it
+                self._read()
+                if self._fresh():
+                    return False
+                self._refresh()
+                self._write()
+                return True
+        finally:
+            self._lock.release()
+
+    def get(self):
+        """
+        :return: a tuple (value, age of the value in seconds)
+        """
+        if not self._fresh() and self.directory:
+            self._read()
+        try:
+            computed = not self._fresh() and self._lead()
+        except Exception as e:
+            if self.value is None:
+                raise
+            log.warning("Could not refresh the %s snapshot: %s" % (self.name, str(e)))
+            computed = False
+        metrics.CACHE_REQUESTS.inc(self.name, "miss" if computed else "hit")
+        return self.value, max(0.0, time.time() - self.computed)
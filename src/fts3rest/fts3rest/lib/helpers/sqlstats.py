@@ -0,0 +1,105 @@
+#   Copyright 2020 CERN
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Per request SQL instrumentation, enabled with fts3.SqlInstrumentation.
+
+Statements are counted per request, statements slower than
+fts3.SlowStatementThreshold seconds are logged, and requests that run more
+statements than their budget are flagged as a possible N+1 pattern, together
+with the statements they repeat the most.
+
+The statements are timed by the metrics hooks (see helpers.metrics), which must
+be installed on the engine as well.
+"""
+
+import logging
+import re
+import time
+
+from sqlalchemy import event
+
+from fts3rest.lib.helpers import metrics
+from fts3rest.lib.helpers.misc import parse_endpoint_map
+
+log = logging.getLogger(__name__)
+
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM_RE = re.compile(r"%\(\w+\)s|%s|(?<!:):\w+|\?")
+_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_statement(statement):
+    """
+    Replace the literals and the bound parameters by '?', so the statements
+    that only differ by their values look the same
+    """
+    statement = _STRING_RE.sub("?", statement)
+    statement = _NUMBER_RE.sub("?", statement)
+    statement = _PARAM_RE.sub("?", statement)
+    statement = _LIST_RE.sub("(?...)", statement)
+    return _SPACE_RE.sub(" ", statement).strip()
+
+
+class SqlInstrumentation:
+    """
+    Hooks the engine to count and check the statements run by each request
+    """
+
+    def __init__(self, config):
+        self.slow_threshold = float(config.get("fts3.SlowStatementThreshold", 1))
+        self.budget = int(config.get("fts3.StatementBudget", 100))
+        self.budgets = parse_endpoint_map(config.get("fts3.StatementBudgets"))
+
+    def install(self, engine):
+        event.listen(engine, "after_cursor_execute", self.after_cursor_execute)
+
+    def budget_for(self, endpoint):
+        return self.budgets.get(endpoint, self.budget)
+
+    def after_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        stats = metrics.current_request()
+        if stats is None:
+            return
+        stats.statements += 1
+        stats.statement_counts[statement] = stats.statement_counts.get(statement, 0) + 1
+
+        if context is not None and self.slow_threshold > 0:
+            elapsed = time.perf_counter() - context._fts3_started
+            if elapsed >= self.slow_threshold:
+                log.warning(
+                    "Slow statement (%.3f seconds) from %s: %s"
+                    % (elapsed, stats.endpoint, normalize_statement(statement))
+                )
+
+        # Flag only once, when the budget is exceeded
+        if stats.statements == self.budget_for(stats.endpoint) + 1:
+            repeated = sorted(
+                stats.statement_counts.items(), key=lambda item: item[1], reverse=True
+            )[:3]
+            log.warning(
+                "Possible N+1 pattern: %s ran more than %d statements. Most repeated: %s"
+                % (
+                    stats.endpoint,
+                    stats.statements - 1,
+                    "; ".join(
+                        "%d x %s" % (count, normalize_statement(statement))
+                        for statement, count in repeated
+                    ),
+                )
+            )
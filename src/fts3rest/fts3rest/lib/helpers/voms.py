@@ -13,12 +13,14 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
-from datetime import datetime, timedelta
+from datetime import datetime
 from subprocess import Popen, PIPE, STDOUT
 from tempfile import NamedTemporaryFile
 import logging
 import os
 
+from fts3rest.lib.helpers.proxyinfo import ProxyInfo, ProxyInfoException
+
 log = logging.getLogger(__name__)
 
 
@@ -31,87 +33,24 @@ class VomsException(Exception):
         super().__init__(args, kwargs)
 
 
-def _check_proxy_validity(proxy_path):
-    """
-    voms-proxy-init may return != 0 even when the proxy was created
-    (something to do with the remaining lifetime), so check the validity
-    using voms-proxy-info
-    """
-    args = ["voms-proxy-info", "--file", proxy_path, "--exists"]
-    log.debug(" ".join(args))
-    proc = Popen(args, shell=False, stdin=None, stdout=None, stderr=None)
-    return proc.wait() == 0
-
-
-def _get_proxy_fqans(proxy_path):
-    """
-    Get the VOMS FQAN from the proxy specified by proxy_path
-    """
-    args = [
-        "voms-proxy-info",
-        "--file",
-        proxy_path,
-        "--fqan",
-    ]
-    log.debug(" ".join(args))
-    proc = Popen(args, shell=False, stdin=None, stdout=PIPE, stderr=STDOUT)
-    out = ""
-    for l in proc.stdout:
-        out += l.decode()
-    rcode = proc.wait()
-    if rcode != 0:
-        raise VomsException("Failed to get the FQANs of a proxy: " + out)
-    fqans = []
-    try:
-        for fqan in out.split("\n"):
-            fqans.append(fqan)
-        return fqans
-    except Exception as ex:
-        raise VomsException("Failed to get the FQANs of a proxy: " + str(ex))
-
-
-def _get_proxy_termination_time(proxy_path):
+def _get_proxy_info(proxy_pem):
     """
-    Get the termination time of the proxy specified by proxy_path
+    Inspect the proxy, without spawning voms-proxy-info
     """
-    args = ["voms-proxy-info", "--file", proxy_path, "--timeleft", "--actimeleft"]
-    log.debug(" ".join(args))
-
-    proc = Popen(args, shell=False, stdin=None, stdout=PIPE, stderr=STDOUT)
-    out = ""
-    for l in proc.stdout:
-        out += l.decode()
-    rcode = proc.wait()
-    if rcode != 0:
-        raise VomsException("Failed to get the termination time of a proxy: " + out)
-
     try:
-        timeleft = min([int(v) for v in out.split("\n") if v])
-        return datetime.utcnow() + timedelta(seconds=timeleft)
-    except Exception as ex:
-        raise VomsException("Failed to get the termination time of a proxy: " + str(ex))
+        return ProxyInfo(proxy_pem)
+    except ProxyInfoException as ex:
+        raise VomsException("Failed to inspect a proxy: " + str(ex))
 
 
-def _get_proxy_type(proxy_path):
+def _is_valid(proxy_pem):
     """
-    Get the type of the proxy specified by proxy_path
+    True if the proxy can be loaded, and has not expired
     """
-    args = ["voms-proxy-info", "--file", proxy_path, "--type"]
-    log.debug(" ".join(args))
-
-    proc = Popen(args, shell=False, stdin=None, stdout=PIPE, stderr=STDOUT)
-    out = ""
-    for l in proc.stdout:
-        out += l.decode()
-    rcode = proc.wait()
-    if rcode != 0:
-        raise VomsException("Failed to get the type of a proxy: " + out)
-
     try:
-        type = out.split(" ")[0]
-        return type
-    except Exception as ex:
-        raise VomsException("Failed to get the type of a proxy: " + str(ex))
+        return ProxyInfo(proxy_pem).termination_time > datetime.utcnow()
+    except ProxyInfoException:
+        return False
 
 
 class VomsClient(object):
@@ -120,6 +59,7 @@ class VomsClient(object):
     """
 
     def __init__(self, proxy):
+        self.proxy = proxy
         proxy_fd = NamedTemporaryFile(mode="w", suffix=".pem", delete=False)
         proxy_fd.write(proxy)
         proxy_fd.close()
@@ -143,12 +83,8 @@ class VomsClient(object):
             VomsException: There was an 'expected' error getting the proxy
                            Meaning: The user requested a voms to which he/she doesn't belong
         """
-        new_proxy = self._voms_proxy_init(voms_list, lifetime)
-        new_termination_time = _get_proxy_termination_time(new_proxy)
-
-        new_proxy_pem = open(new_proxy).read()
-        os.unlink(new_proxy)
-
+        new_proxy_pem = self._voms_proxy_init(voms_list, lifetime)
+        new_termination_time = _get_proxy_info(new_proxy_pem).termination_time
         return new_proxy_pem, new_termination_time
 
     def _voms_proxy_init(self, voms_list, lifetime):
@@ -168,7 +104,7 @@ class VomsClient(object):
             "--ignorewarn",
         ]
 
-        if _get_proxy_type(self.proxy_path) == "RFC":
+        if _get_proxy_info(self.proxy).type == "RFC":
             args.append("--rfc")
 
         for v in voms_list:
@@ -183,13 +119,20 @@ class VomsClient(object):
         for l in proc.stdout:
             out += l.decode()
         rcode = proc.wait()
-        if rcode != 0 and not _check_proxy_validity(new_proxy):
+
+        with open(new_proxy) as fd:
+            new_proxy_pem = fd.read()
+        os.unlink(new_proxy)
+
+        # voms-proxy-init may return != 0 even when the proxy was created
+        # (something to do with the remaining lifetime), so check its validity
+        if rcode != 0 and not _is_valid(new_proxy_pem):
             raise VomsException("Failed to generate a proxy (%d): %s" % (rcode, out))
 
-        return new_proxy
+        return new_proxy_pem
 
     def get_proxy_fqans(self):
         """
         Get the proxy fqans
         """
-        return _get_proxy_fqans(self.proxy_path)
+        return _get_proxy_info(self.proxy).fqans
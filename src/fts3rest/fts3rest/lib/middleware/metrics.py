@@ -0,0 +1,69 @@
+#   Copyright 2020 CERN
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import time
+
+from werkzeug.wsgi import ClosingIterator
+
+from fts3rest.lib.helpers import metrics
+
+_METHODS = frozenset(["GET", "HEAD", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"])
+
+
+class MetricsHandler:
+    """
+    Count and time the requests. The time includes sending the response, since
+    most of the list responses are serialized while they are sent.
+    """
+
+    def __init__(self, wrap_app, config):
+        self.app = wrap_app
+        self.config = config
+
+    def _finish(self, stats, method, status, started):
+        elapsed = time.perf_counter() - started
+        metrics.end_request()
+        endpoint = stats.endpoint or "none"
+        metrics.REQUESTS.inc(endpoint, method, status[0] if status else "500")
+        metrics.REQUEST_SECONDS.observe(elapsed, endpoint, method)
+        metrics.REQUEST_DB_SECONDS.observe(stats.db_seconds, endpoint)
+        if stats.rows:
+            metrics.ROWS_SERIALIZED.inc(endpoint, amount=stats.rows)
+        # Read for each request, to follow the reloads of the configuration
+        metrics.maybe_flush(
+            self.config.get("fts3.MetricsDir") or None,
+            float(self.config.get("fts3.MetricsFlushInterval", 5)),
+        )
+
+    def __call__(self, environ, start_response):
+        started = time.perf_counter()
+        method = environ.get("REQUEST_METHOD", "GET")
+        if method not in _METHODS:
+            method = "other"
+        status = []
+
+        def _start_response(status_line, headers, exc_info=None):
+            status[:] = [status_line.split(" ", 1)[0]]
+            return start_response(status_line, headers, exc_info)
+
+        stats = metrics.RequestStats()
+        metrics.begin_request(stats)
+        try:
+            response = self.app(environ, _start_response)
+        except Exception:
+            self._finish(stats, method, None, started)
+            raise
+        return ClosingIterator(
+            response, lambda: self._finish(stats, method, status, started)
+        )
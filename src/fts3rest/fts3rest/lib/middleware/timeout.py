@@ -12,9 +12,28 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
-from sqlalchemy.exc import TimeoutError
+import logging
+import math
+
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError, TimeoutError
 from werkzeug.exceptions import ServiceUnavailable
 
+from fts3rest.lib.helpers import metrics
+from fts3rest.lib.helpers.misc import parse_endpoint_map
+from fts3rest.lib.helpers.sqlstats import normalize_statement
+
+log = logging.getLogger(__name__)
+
+# MySQL ER_QUERY_TIMEOUT, MariaDB ER_STATEMENT_TIMEOUT
+_MYSQL_TIMEOUT_ERRORS = (3024, 1969)
+# PostgreSQL query_canceled
+_POSTGRESQL_TIMEOUT_ERROR = "57014"
+# cx_Oracle call timeout exceeded
+_ORACLE_TIMEOUT_ERROR = "DPI-1067"
+
+_CURRENT_TIMEOUT = "fts3.statement_timeout"
+
 
 def _asbool(obj):
     if isinstance(obj, str):
@@ -28,6 +47,119 @@ def _asbool(obj):
     return bool(obj)
 
 
+def is_statement_timeout(error):
+    """
+    True if the error is the database cancelling a statement that ran
+    longer than the statement timeout
+    """
+    if isinstance(error, DBAPIError):
+        error = error.orig
+    if getattr(error, "pgcode", None) == _POSTGRESQL_TIMEOUT_ERROR:
+        return True
+    args = getattr(error, "args", None)
+    if args and args[0] in _MYSQL_TIMEOUT_ERRORS:
+        return True
+    return _ORACLE_TIMEOUT_ERROR in str(error)
+
+
+class StatementTimeouts:
+    """
+    Limits how long the statements can run on the database, per endpoint.
+
+    The timeout is set on the connection before running a statement, when it
+    differs from the one the connection already has. The connection is
+    usually checked out by the authentication, before the endpoint is known,
+    so it can not be set at checkout time.
+    """
+
+    def __init__(self, config):
+        self.default = float(config.get("fts3.StatementTimeout", 0))
+        self.timeouts = parse_endpoint_map(config.get("fts3.StatementTimeouts"), float)
+
+    def timeout_for(self, endpoint):
+        return self.timeouts.get(endpoint, self.default)
+
+    def retry_after(self, endpoint):
+        """
+        Seconds the client should wait before retrying
+        """
+        return max(1, int(math.ceil(self.timeout_for(endpoint))))
+
+    def install(self, engine):
+        if self.default <= 0 and not self.timeouts:
+            return
+        event.listen(engine, "connect", self.on_connect)
+        event.listen(engine, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(engine, "handle_error", self.handle_error)
+        # On PostgreSQL a rollback undoes the SET, including the one done
+        # when the connection goes back to the pool
+        if engine.dialect.name == "postgresql":
+            event.listen(engine, "rollback", self.on_rollback)
+            event.listen(engine, "reset", self.on_reset)
+
+    def _apply(self, conn, timeout):
+        dialect = conn.dialect
+        dbapi_connection = conn.connection.connection
+        if dialect.name == "oracle":
+            dbapi_connection.call_timeout = int(timeout * 1000)
+            return
+        if dialect.name == "mysql":
+            if getattr(dialect, "is_mariadb", False):
+                sql = "SET SESSION max_statement_time = %f" % timeout
+            else:
+                sql = "SET SESSION max_execution_time = %d" % int(timeout * 1000)
+        elif dialect.name == "postgresql":
+            sql = "SET statement_timeout = %d" % int(timeout * 1000)
+        else:
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(sql)
+        finally:
+            cursor.close()
+
+    def before_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        stats = metrics.current_request()
+        timeout = self.timeout_for(stats.endpoint if stats is not None else None)
+        if conn.info.get(_CURRENT_TIMEOUT) != timeout:
+            self._apply(conn, timeout)
+            conn.info[_CURRENT_TIMEOUT] = timeout
+
+    def on_connect(self, dbapi_connection, connection_record):
+        # New connections have no timeout
+        connection_record.info[_CURRENT_TIMEOUT] = 0
+
+    def on_rollback(self, conn):
+        conn.info[_CURRENT_TIMEOUT] = None
+
+    def on_reset(self, dbapi_connection, connection_record):
+        connection_record.info[_CURRENT_TIMEOUT] = None
+
+    def handle_error(self, context):
+        if not is_statement_timeout(context.original_exception):
+            return
+        stats = metrics.current_request()
+        endpoint = stats.endpoint if stats is not None else None
+        metrics.STATEMENT_TIMEOUTS.inc(endpoint or "none")
+        log.warning(
+            "Statement cancelled after %s seconds in %s: %s"
+            % (
+                self.timeout_for(endpoint),
+                endpoint,
+                normalize_statement(context.statement or ""),
+            )
+        )
+
+
+def statement_timeout_error(statement_timeouts, endpoint):
+    return ServiceUnavailable(
+        "The database took too long to answer, try again later",
+        retry_after=statement_timeouts.retry_after(endpoint),
+    )
+
+
 class TimeoutHandler:
     """
     Catch Timeout and similar errors, and return an HTTPServiceUnavailable instead
@@ -36,6 +168,7 @@ class TimeoutHandler:
     def __init__(self, wrap_app, config):
         self.app = wrap_app
         self.config = config
+        self.statement_timeouts = StatementTimeouts(config)
 
     def __call__(self, environ, start_response):
         try:
@@ -45,3 +178,11 @@ class TimeoutHandler:
                 raise
             else:
                 return ServiceUnavailable()(environ, start_response)
+        except DBAPIError as e:
+            if not is_statement_timeout(e):
+                raise
+            stats = metrics.current_request()
+            error = statement_timeout_error(
+                self.statement_timeouts, stats.endpoint if stats is not None else None
+            )
+            return error(environ, start_response)
@@ -1,17 +1,43 @@
+import hashlib
+import itertools
+import json
 import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import jwt
 from oic import rndstr
 from oic.extension.message import TokenIntrospectionRequest, TokenIntrospectionResponse
 from oic.oic import Client, Grant, Token
-from oic.oic.message import AccessTokenResponse, Message, RegistrationResponse
+from oic.oic.message import (
+    AccessTokenResponse,
+    Message,
+    ProviderConfigurationResponse,
+    RegistrationResponse,
+)
 from oic.utils import time_util
 from oic.utils.authn.client import CLIENT_AUTHN_METHOD
+from oic.utils.keyio import KeyJar
+from oic.utils.settings import OicClientSettings
 
 log = logging.getLogger(__name__)
 
 
+class ProviderNotReady(Exception):
+    """
+    The provider of a token is configured, but could not be contacted yet
+    """
+
+    pass
+
+
+def _normalize_issuer(issuer):
+    return issuer.rstrip("/")
+
+
 class OIDCmanager:
     """
     Class that interfaces with PyOIDC
@@ -24,46 +50,185 @@ class OIDCmanager:
         self.clients = {}
         self.clients_config = {}
         self.config = None
+        self.pending = set()
+        self.configured = set()
+        # Incremented by each setup, so the results of a previous one are dropped
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.timeout = 5
+        self.cache_dir = None
+        self.keys_cache_time = 86400
 
-    def setup(self, config):
+    def setup(self, config, block=True):
+        """
+        Configure the clients of the providers.
+        With block=False, the providers are contacted from a background thread, and
+        their tokens are refused as not ready until then, unless their last known
+        metadata is found in fts3.OIDCCacheDir.
+        """
         self.config = config
-        self._configure_clients(config["fts3.Providers"])
-        self._set_keys_cache_time(config["fts3.JWKCacheSeconds"])
-        self._retrieve_clients_keys()
-
-    def _configure_clients(self, providers_config):
-        for provider in providers_config:
-            try:
-                client = Client(client_authn_method=CLIENT_AUTHN_METHOD)
-                # Retrieve well-known configuration
-                client.provider_config(provider)
-                # Register
-                client_reg = RegistrationResponse(
-                    client_id=providers_config[provider]["client_id"],
-                    client_secret=providers_config[provider]["client_secret"],
+        self.timeout = float(config.get("fts3.OIDCProviderTimeout", 5))
+        self.cache_dir = config.get("fts3.OIDCCacheDir")
+        self.keys_cache_time = config["fts3.JWKCacheSeconds"]
+        providers_config = config["fts3.Providers"]
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+            self.configured = {
+                _normalize_issuer(provider) for provider in providers_config
+            }
+            # Forget the providers removed from the configuration
+            for issuer in list(self.clients):
+                if _normalize_issuer(issuer) not in self.configured:
+                    del self.clients[issuer]
+            self.pending = self.configured - {
+                _normalize_issuer(issuer) for issuer in self.clients
+            }
+        if self.cache_dir:
+            for provider in providers_config:
+                self._load_cached_client(
+                    provider, providers_config[provider], generation
                 )
-                client.store_registration_info(client_reg)
-                issuer = client.provider_info["issuer"]
-                if "introspection_endpoint" not in client.provider_info:
-                    log.warning("{} -- missing introspection endpoint".format(issuer))
-                self.clients[issuer] = client
-                # Store custom configuration options for this provider
-                self.clients_config[issuer] = providers_config[provider]["custom"]
-            except Exception as ex:
-                log.warning("Exception registering provider: {}".format(provider))
-                log.warning(ex)
-
-    def _retrieve_clients_keys(self):
-        for provider in self.clients:
-            client = self.clients[provider]
-            client.keyjar.get_issuer_keys(provider)
-
-    def _set_keys_cache_time(self, cache_time):
-        for provider in self.clients:
-            client = self.clients[provider]
-            keybundles = client.keyjar.issuer_keys[provider]
-            for keybundle in keybundles:
-                keybundle.cache_time = cache_time
+        if block:
+            self._configure_clients(providers_config, generation)
+        else:
+            threading.Thread(
+                target=self._bootstrap,
+                args=(providers_config, generation),
+                name="oidc_bootstrap",
+                daemon=True,
+            ).start()
+
+    def _bootstrap(self, providers_config, generation):
+        retry_interval = float(self.config.get("fts3.OIDCProviderRetryInterval", 60))
+        start = time.monotonic()
+        failed = self._configure_clients(providers_config, generation)
+        log.info(
+            "OIDC providers configured in {:.3f} seconds".format(
+                time.monotonic() - start
+            )
+        )
+        # A later setup retries its own providers
+        while failed and generation == self.generation:
+            time.sleep(retry_interval)
+            failed = self._configure_clients(
+                {provider: providers_config[provider] for provider in failed},
+                generation,
+            )
+
+    def _configure_clients(self, providers_config, generation):
+        """
+        Configure the providers concurrently
+        :return: list of the providers that could not be configured
+        """
+        if not providers_config or generation != self.generation:
+            return []
+        with ThreadPoolExecutor(max_workers=len(providers_config)) as executor:
+            results = executor.map(
+                self._configure_client,
+                providers_config.keys(),
+                providers_config.values(),
+                itertools.repeat(generation),
+            )
+            return [
+                provider
+                for provider, configured in zip(providers_config, results)
+                if not configured
+            ]
+
+    def _new_client(self, provider_config):
+        client = Client(
+            client_authn_method=CLIENT_AUTHN_METHOD,
+            keyjar=KeyJar(timeout=self.timeout),
+            settings=OicClientSettings(timeout=self.timeout),
+        )
+        client_reg = RegistrationResponse(
+            client_id=provider_config["client_id"],
+            client_secret=provider_config["client_secret"],
+        )
+        client.store_registration_info(client_reg)
+        return client
+
+    def _configure_client(self, provider, provider_config, generation):
+        try:
+            client = self._new_client(provider_config)
+            # Retrieve well-known configuration
+            client.provider_config(provider)
+            issuer = client.provider_info["issuer"]
+            for keybundle in client.keyjar.issuer_keys[issuer]:
+                keybundle.cache_time = self.keys_cache_time
+            # Retrieve the keys now rather than with the first token
+            client.keyjar.get_issuer_keys(issuer)
+        except Exception as ex:
+            log.warning("Exception registering provider: {}".format(provider))
+            log.warning(ex)
+            return False
+        if self._add_client(provider, client, provider_config, generation):
+            if self.cache_dir:
+                self._save_cached_client(provider, client)
+        return True
+
+    def _add_client(self, provider, client, provider_config, generation):
+        """
+        :return: False if the client was dropped, because the configuration
+                 changed since it has been requested
+        """
+        issuer = client.provider_info["issuer"]
+        with self.lock:
+            if (
+                generation != self.generation
+                or _normalize_issuer(provider) not in self.configured
+            ):
+                log.info("{} -- dropped, the configuration changed".format(issuer))
+                return False
+            if "introspection_endpoint" not in client.provider_info:
+                log.warning("{} -- missing introspection endpoint".format(issuer))
+            # Store custom configuration options for this provider
+            self.clients_config[issuer] = provider_config["custom"]
+            self.clients[issuer] = client
+            self.pending.discard(_normalize_issuer(provider))
+        return True
+
+    def _cache_path(self, provider):
+        name = hashlib.sha1(provider.encode()).hexdigest()
+        return os.path.join(self.cache_dir, "oidc-{}.json".format(name))
+
+    def _save_cached_client(self, provider, client):
+        issuer = client.provider_info["issuer"]
+        content = {
+            "provider": provider,
+            "provider_info": client.provider_info.to_dict(),
+            "jwks": client.keyjar.export_jwks(issuer=issuer),
+        }
+        path = self._cache_path(provider)
+        tmp_path = "{}.{}".format(path, os.getpid())
+        try:
+            with open(tmp_path, "w") as cache_file:
+                json.dump(content, cache_file)
+            os.replace(tmp_path, path)
+        except OSError as ex:
+            log.warning("Could not cache the metadata of {}: {}".format(provider, ex))
+
+    def _load_cached_client(self, provider, provider_config, generation):
+        try:
+            with open(self._cache_path(provider)) as cache_file:
+                content = json.load(cache_file)
+            client = self._new_client(provider_config)
+            client.handle_provider_config(
+                ProviderConfigurationResponse(**content["provider_info"]),
+                provider,
+                keys=False,
+            )
+            client.keyjar.import_jwks(content["jwks"], client.provider_info["issuer"])
+        except FileNotFoundError:
+            return
+        except Exception as ex:
+            log.warning(
+                "Could not load the cached metadata of {}: {}".format(provider, ex)
+            )
+            return
+        if self._add_client(provider, client, provider_config, generation):
+            log.info("Using the cached metadata of {}".format(provider))
 
     def token_issuer_supported(self, access_token):
         """
@@ -72,11 +237,16 @@ class OIDCmanager:
         :param access_token:
         :return: true if token issuer is supported, false otherwise
         :raise KeyError: issuer claim missing
+        :raise ProviderNotReady: issuer configured, but not contacted yet
         """
         unverified_payload = jwt.decode(access_token, options=jwt_options_unverified())
         issuer = unverified_payload["iss"]
         log.debug("Checking client registration for issuer={}".format(issuer))
-        return issuer in self.clients
+        if issuer in self.clients:
+            return True
+        if _normalize_issuer(issuer) in self.pending:
+            raise ProviderNotReady("TokenProvider not ready: {}".format(issuer))
+        return False
 
     def filter_provider_keys(self, issuer, kid=None, alg=None):
         """
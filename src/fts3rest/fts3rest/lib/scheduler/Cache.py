@@ -3,6 +3,8 @@ import logging
 
 from datetime import datetime
 
+from fts3rest.lib.helpers import metrics
+
 log = logging.getLogger(__name__)
 threadLocal = threading.local()
 
@@ -92,16 +94,20 @@ class ThreadLocalCache:
             ThreadLocalCache.cache_cleanup()
 
         if key not in thread_dict:
+            metrics.CACHE_REQUESTS.inc("scheduler", "miss")
             val.append(func(*args))
             val.append(datetime.utcnow())
             thread_dict[key] = val
         else:
             val = thread_dict[key]
             if ThreadLocalCache.check_expiry(val[1], ThreadLocalCache.cache_entry_life):
+                metrics.CACHE_REQUESTS.inc("scheduler", "miss")
                 val = []
                 val.append(func(*args))
                 val.append(datetime.utcnow())
                 thread_dict[key] = val
+            else:
+                metrics.CACHE_REQUESTS.inc("scheduler", "hit")
         return val[0]
 
     def get_submitted(self, src, dst, vo):
@@ -1,6 +1,8 @@
 import operator
 import logging
 
+from fts3rest.lib.scheduler.strategies import get_strategy
+
 log = logging.getLogger(__name__)
 
 
@@ -9,12 +11,18 @@ class Scheduler:
     The scheduler class is used to rank the source sites based on a number
     of factors e.g queued files, success rate etc.
 
-    If the throughput is 0 for a given src dst pair, we should select this
-    source site, in this way we can probe the network to get throughput info
-    for future transfers
+    The ranking itself is delegated to the scoring functions registered in
+    fts3rest.lib.scheduler.strategies. Links without throughput information
+    can not be scored. If an exploration budget is given, an unprobed link
+    is ranked first while the budget allows it, so we can probe the network
+    to get throughput info for future transfers. Otherwise, or once the budget
+    is exhausted, unprobed links are ranked last.
+
+    All rank methods return a list of (source, score) tuples, sorted from
+    best to worst. Unprobed links have a score of None.
     """
 
-    def __init__(self, cls):
+    def __init__(self, cls, exploration=None):
         """
         cls is the querying mechanism, it can either be a cache or a database
         impelmentation.
@@ -27,58 +35,67 @@ class Scheduler:
         Using a direct database implementation with scheduler:
         queue_provider = Database(Session)
         s = Scheduler (queue_provider)
+
+        exploration is an optional ExplorationBudget
         """
         self.cls = cls
+        self.exploration = exploration
 
-    @staticmethod
-    def select_source(source, throughput):
-        return [source, throughput]
+    def rank(
+        self, strategy, sources, dst, vo=None, user_activity=None, user_file_size=0
+    ):
+        """
+        Ranks the source sites using the named strategy.
+        Raises KeyError if the strategy is not registered.
+        """
+        if strategy == "orderly":
+            return [(src, index) for index, src in enumerate(sources)]
+
+        scorer = get_strategy(strategy)
+        scored = []
+        unprobed = []
+        for src in sources:
+            score = scorer.score(self.cls, src, dst, vo, user_activity, user_file_size)
+            if score is None:
+                unprobed.append((src, None))
+            else:
+                scored.append((src, score))
+        ranks = sorted(scored, key=operator.itemgetter(1), reverse=scorer.reverse)
+
+        if self.exploration is not None:
+            for index, (src, _) in enumerate(unprobed):
+                if self.exploration.should_explore(src, dst):
+                    log.debug("Exploring unprobed link %s => %s" % (src, dst))
+                    return [unprobed.pop(index)] + ranks + unprobed
+        return ranks + unprobed
 
     def rank_submitted(self, sources, dst, vo):
         """
         Ranks the source sites based on the number of pending files
         in the queue
         """
-        ranks = []
-        for src in sources:
-            ranks.append((src, self.cls.get_submitted(src, dst, vo)))
-        return sorted(ranks, key=operator.itemgetter(1))
+        return self.rank("queue", sources, dst, vo)
 
     def rank_success_rate(self, sources, dst):
         """
         Ranks the source sites based on the success rate of the transfers
         in the last 1 hour
         """
-        ranks = []
-        for src in sources:
-            ranks.append((src, self.cls.get_success_rate(src, dst)))
-        return sorted(ranks, key=operator.itemgetter(1), reverse=True)
+        return self.rank("success", sources, dst)
 
     def rank_throughput(self, sources, dst):
         """
         Ranks the source sites based on the total throughput rate between
         a source destination pair in the last 1 hour
         """
-        ranks = []
-        for src in sources:
-            throughput = self.cls.get_throughput(src, dst)
-            if throughput == 0:
-                return Scheduler.select_source(src, throughput)
-            ranks.append((src, throughput))
-        return sorted(ranks, key=operator.itemgetter(1), reverse=True)
+        return self.rank("throughput", sources, dst)
 
     def rank_per_file_throughput(self, sources, dst):
         """
         Ranks the source sites based on the per file throughput rate between
         a source destination pair in the last 1 hour
         """
-        ranks = []
-        for src in sources:
-            per_file_throughput = self.cls.get_per_file_throughput(src, dst)
-            if per_file_throughput == 0:
-                return Scheduler.select_source(src, per_file_throughput)
-            ranks.append((src, per_file_throughput))
-        return sorted(ranks, key=operator.itemgetter(1), reverse=True)
+        return self.rank("file-throughput", sources, dst)
 
     def rank_pending_data(self, sources, dst, vo, user_activity):
         """
@@ -87,25 +104,14 @@ class Scheduler:
         amount of data from all activites with priorities >= to the
         user_activities's priority
         """
-        ranks = []
-        for src in sources:
-            ranks.append((src, self.cls.get_pending_data(src, dst, vo, user_activity)))
-        return sorted(ranks, key=operator.itemgetter(1))
+        return self.rank("pending-data", sources, dst, vo, user_activity)
 
     def rank_waiting_time(self, sources, dst, vo, user_activity):
         """
         Ranks the source sites based on the waiting time for the incoming
         job in the queue
         """
-        ranks = []
-        for src in sources:
-            pending_data = self.cls.get_pending_data(src, dst, vo, user_activity)
-            throughput = self.cls.get_throughput(src, dst)
-            if throughput == 0:
-                return Scheduler.select_source(src, throughput)
-            waiting_time = pending_data / throughput
-            ranks.append((src, waiting_time))
-        return sorted(ranks, key=operator.itemgetter(1))
+        return self.rank("waiting-time", sources, dst, vo, user_activity)
 
     def rank_waiting_time_with_error(self, sources, dst, vo, user_activity):
         """
@@ -113,36 +119,18 @@ class Scheduler:
         be resent. Rank based on the waiting time plus the time for resending
         failed data
         """
-        ranks = []
-        for src in sources:
-            pending_data = self.cls.get_pending_data(src, dst, vo, user_activity)
-            throughput = self.cls.get_throughput(src, dst)
-            if throughput == 0:
-                return Scheduler.select_source(src, throughput)
-            waiting_time = pending_data / throughput
-            failure_rate = 100 - self.cls.get_success_rate(src, dst)
-            error = failure_rate * waiting_time / 100
-            wait_time_with_error = waiting_time + error
-            ranks.append((src, wait_time_with_error))
-        return sorted(ranks, key=operator.itemgetter(1))
+        return self.rank("waiting-time-with-error", sources, dst, vo, user_activity)
 
     def rank_finish_time(self, sources, dst, vo, user_activity, user_file_size):
         """
         Ranks the source sites based on the waiting time with error plus the
         time required to transfer the file
         """
-        ranks = []
-        for src in sources:
-            pending_data = self.cls.get_pending_data(src, dst, vo, user_activity)
-            throughput = self.cls.get_throughput(src, dst)
-            if throughput == 0:
-                return Scheduler.select_source(src, throughput)
-            waiting_time = pending_data / throughput
-            failure_rate = 100 - self.cls.get_success_rate(src, dst)
-            error = failure_rate * waiting_time / 100
-            wait_time_with_error = waiting_time + error
-            file_throughput = self.cls.get_per_file_throughput(src, dst)
-            file_transfer_time = (user_file_size / 1024 / 1024) / file_throughput
-            finish_time = wait_time_with_error + file_transfer_time
-            ranks.append((src, finish_time))
-        return sorted(ranks, key=operator.itemgetter(1))
+        return self.rank("duration", sources, dst, vo, user_activity, user_file_size)
+
+    def rank_cost(self, sources, dst, vo, user_activity, user_file_size):
+        """
+        Ranks the source sites based on the expected time to complete the
+        file, combining queue time, throughput and success rate
+        """
+        return self.rank("cost", sources, dst, vo, user_activity, user_file_size)
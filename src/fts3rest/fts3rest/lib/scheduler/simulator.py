@@ -0,0 +1,228 @@
+#   Copyright 2020 CERN
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Offline evaluation of the scheduler strategies.
+
+The history stored in t_optimizer_evolution is replayed decision by decision:
+at each point in time the strategies only see the samples of the previous hour,
+as the Database provider would, and the throughput they obtain is the one
+observed on the chosen link right after the decision.
+"""
+
+import bisect
+import logging
+from collections import namedtuple
+from datetime import timedelta
+
+from fts3rest.model import OptimizerEvolution
+from fts3rest.lib.scheduler.schd import Scheduler
+from fts3rest.lib.scheduler.strategies import ExplorationBudget
+
+log = logging.getLogger(__name__)
+
+Sample = namedtuple(
+    "Sample",
+    ["datetime", "throughput", "active", "success", "queue_size", "filesize_avg"],
+)
+
+
+class HistoryProvider:
+    """
+    Queue provider that answers from the samples of t_optimizer_evolution
+    older than 'now', over the same window used by the Database provider
+    """
+
+    def __init__(self, history, window=timedelta(hours=1)):
+        self.history = history
+        self.window = window
+        self.now = None
+        self._timestamps = {
+            link: [s.datetime for s in samples] for link, samples in history.items()
+        }
+
+    def _samples(self, src, dst):
+        link = (src, dst)
+        if link not in self.history:
+            return []
+        timestamps = self._timestamps[link]
+        start = bisect.bisect_left(timestamps, self.now - self.window)
+        end = bisect.bisect_right(timestamps, self.now)
+        return self.history[link][start:end]
+
+    def get_submitted(self, src, dst, vo):
+        samples = self._samples(src, dst)
+        if not samples:
+            return 0
+        return samples[-1].queue_size or 0
+
+    def get_success_rate(self, src, dst):
+        samples = self._samples(src, dst)
+        total = sum(s.success or 0 for s in samples)
+        return 100 if total == 0 else total / len(samples)
+
+    def get_throughput(self, src, dst):
+        samples = self._samples(src, dst)
+        if not samples:
+            return 0
+        return sum((s.throughput or 0) * (s.active or 0) for s in samples) / len(
+            samples
+        )
+
+    def get_per_file_throughput(self, src, dst):
+        samples = self._samples(src, dst)
+        if not samples:
+            return 0
+        return sum(s.throughput or 0 for s in samples) / len(samples)
+
+    def get_pending_data(self, src, dst, vo, user_activity):
+        samples = self._samples(src, dst)
+        if not samples:
+            return 0
+        return (samples[-1].queue_size or 0) * (samples[-1].filesize_avg or 0)
+
+    def observed_throughput(self, src, dst, horizon):
+        """
+        Per file throughput of the first sample of the link after 'now',
+        or None if nothing was observed within the horizon
+        """
+        link = (src, dst)
+        if link not in self.history:
+            return None
+        timestamps = self._timestamps[link]
+        index = bisect.bisect_right(timestamps, self.now)
+        if index >= len(timestamps) or timestamps[index] > self.now + horizon:
+            return None
+        return self.history[link][index].throughput
+
+
+class StrategyReport:
+    """
+    Outcome of replaying the history for one strategy
+    """
+
+    def __init__(self, strategy):
+        self.strategy = strategy
+        self.decisions = 0
+        self.observed = 0
+        self.explored = 0
+        self.total_throughput = 0.0
+        self.choices = {}
+
+    @property
+    def avg_throughput(self):
+        if self.observed == 0:
+            return 0.0
+        return self.total_throughput / self.observed
+
+
+def load_history(session, sources, dst, since=None, until=None):
+    """
+    Load the evolution of the links sources => dst from t_optimizer_evolution
+
+    Returns:
+        A dictionary (source, destination) => list of Sample sorted by time
+    """
+    query = session.query(
+        OptimizerEvolution.source_se,
+        OptimizerEvolution.datetime,
+        OptimizerEvolution.throughput,
+        OptimizerEvolution.active,
+        OptimizerEvolution.success,
+        OptimizerEvolution.queue_size,
+        OptimizerEvolution.filesize_avg,
+    ).filter(
+        OptimizerEvolution.source_se.in_(sources), OptimizerEvolution.dest_se == dst
+    )
+    if since:
+        query = query.filter(OptimizerEvolution.datetime >= since)
+    if until:
+        query = query.filter(OptimizerEvolution.datetime <= until)
+
+    history = {}
+    for row in query.order_by(OptimizerEvolution.datetime):
+        history.setdefault((row[0], dst), []).append(Sample(*row[1:]))
+    return history
+
+
+def replay(
+    history,
+    sources,
+    dst,
+    strategies,
+    step=timedelta(minutes=5),
+    horizon=timedelta(minutes=15),
+    vo=None,
+    activity="default",
+    filesize=0,
+    epsilon=0.1,
+):
+    """
+    Replay the history, taking one decision per strategy every 'step'
+
+    Args:
+        history:    As returned by load_history
+        sources:    Candidate sources
+        dst:        Destination storage
+        strategies: Names of the strategies to evaluate
+        step:       Interval between decisions
+        horizon:    Maximum delay between a decision and the sample used to
+                    measure its outcome
+        epsilon:    Exploration rate given to each strategy
+
+    Returns:
+        A dictionary strategy name => StrategyReport
+    """
+    provider = HistoryProvider(history)
+    reports = {}
+    schedulers = {}
+    for strategy in strategies:
+        reports[strategy] = StrategyReport(strategy)
+        schedulers[strategy] = Scheduler(
+            provider, exploration=ExplorationBudget(epsilon)
+        )
+
+    timeline = sorted(set(s.datetime for samples in history.values() for s in samples))
+    if not timeline:
+        return reports
+
+    provider.now = timeline[0]
+    while provider.now <= timeline[-1]:
+        for strategy in strategies:
+            report = reports[strategy]
+            ranks = schedulers[strategy].rank(
+                strategy, sources, dst, vo, activity, filesize
+            )
+            chosen = ranks[0][0]
+            report.decisions += 1
+            report.choices[chosen] = report.choices.get(chosen, 0) + 1
+            observed = provider.observed_throughput(chosen, dst, horizon)
+            if observed is not None:
+                report.observed += 1
+                report.total_throughput += observed
+        provider.now += step
+
+    for strategy in strategies:
+        reports[strategy].explored = schedulers[strategy].exploration.explored_total
+    log.debug("Replayed the history of %s => %s" % (sources, dst))
+    return reports
+
+
+def simulate(session, sources, dst, strategies, since=None, until=None, **kwargs):
+    """
+    Load the history of the links from the database and replay it.
+    See replay for the accepted keyword arguments.
+    """
+    history = load_history(session, sources, dst, since, until)
+    return replay(history, sources, dst, strategies, **kwargs)
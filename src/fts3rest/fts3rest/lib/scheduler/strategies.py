@@ -0,0 +1,222 @@
+#   Copyright 2020 CERN
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Registry of the scoring functions used by the scheduler to rank the
+candidate sources of a multiple replica job.
+
+A scoring function receives the queue provider (database or cache), the
+source and destination storages, and the submission context (vo, activity and
+file size). It returns the score of the link, or None when the link has never
+been probed, so there is not enough information to score it.
+"""
+
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+STRATEGIES = {}
+
+
+class Strategy:
+    """
+    A registered scoring function, together with its sort order
+    """
+
+    def __init__(self, name, score, reverse=False):
+        self.name = name
+        self.score = score
+        self.reverse = reverse
+
+
+def register_strategy(name, reverse=False, aliases=()):
+    """
+    Decorator that registers a scoring function under the given name(s).
+
+    Args:
+        name:    Name of the strategy, as used in "selection_strategy"
+        reverse: If True, higher scores rank first
+        aliases: Additional names for the same strategy
+    """
+
+    def decorator(func):
+        for strategy_name in (name,) + tuple(aliases):
+            STRATEGIES[strategy_name] = Strategy(strategy_name, func, reverse)
+        return func
+
+    return decorator
+
+
+def get_strategy(name):
+    """
+    Returns the registered strategy, or raises KeyError if unknown
+    """
+    return STRATEGIES[name]
+
+
+class ExplorationBudget:
+    """
+    Epsilon-style exploration budget, kept per link.
+
+    Unprobed links (no throughput information) are only promoted to the top of
+    the ranking while the link is within its budget: 'initial' free probes, plus
+    'epsilon' probes per decision where the link was a candidate.
+    Otherwise, unprobed links are ranked last.
+    """
+
+    def __init__(self, epsilon=0.1, initial=1):
+        self.epsilon = epsilon
+        self.initial = initial
+        self.explored_total = 0
+        self._seen = {}
+        self._explored = {}
+        self._lock = threading.Lock()
+
+    def should_explore(self, src, dst):
+        """
+        Account for a decision where the link src => dst was an unprobed
+        candidate, and return True if it can be explored
+        """
+        link = (src, dst)
+        with self._lock:
+            seen = self._seen.get(link, 0) + 1
+            self._seen[link] = seen
+            explored = self._explored.get(link, 0)
+            if explored + 1 > self.initial + self.epsilon * seen:
+                return False
+            self._explored[link] = explored + 1
+            self.explored_total += 1
+            return True
+
+
+_shared_budgets = {}
+_shared_budgets_lock = threading.Lock()
+
+
+def shared_budget(epsilon, initial=1):
+    """
+    Returns the process-wide exploration budget for the given parameters
+    """
+    key = (epsilon, initial)
+    with _shared_budgets_lock:
+        if key not in _shared_budgets:
+            _shared_budgets[key] = ExplorationBudget(epsilon, initial)
+        return _shared_budgets[key]
+
+
+def _waiting_time(provider, src, dst, vo, activity):
+    throughput = provider.get_throughput(src, dst)
+    if throughput == 0:
+        return None
+    return provider.get_pending_data(src, dst, vo, activity) / throughput
+
+
+def _waiting_time_with_error(provider, src, dst, vo, activity):
+    waiting_time = _waiting_time(provider, src, dst, vo, activity)
+    if waiting_time is None:
+        return None
+    failure_rate = 100 - provider.get_success_rate(src, dst)
+    return waiting_time + failure_rate * waiting_time / 100
+
+
+def _transfer_time(provider, src, dst, filesize):
+    file_throughput = provider.get_per_file_throughput(src, dst)
+    if file_throughput == 0:
+        return None
+    return (filesize / 1024 / 1024) / file_throughput
+
+
+@register_strategy("queue", aliases=("auto",))
+def score_submitted(provider, src, dst, vo, activity, filesize):
+    """
+    Number of pending files in the queue
+    """
+    return provider.get_submitted(src, dst, vo)
+
+
+@register_strategy("success", reverse=True)
+def score_success_rate(provider, src, dst, vo, activity, filesize):
+    """
+    Success rate of the transfers in the last hour
+    """
+    return provider.get_success_rate(src, dst)
+
+
+@register_strategy("throughput", reverse=True)
+def score_throughput(provider, src, dst, vo, activity, filesize):
+    """
+    Total throughput of the link in the last hour
+    """
+    throughput = provider.get_throughput(src, dst)
+    return throughput if throughput != 0 else None
+
+
+@register_strategy("file-throughput", reverse=True)
+def score_per_file_throughput(provider, src, dst, vo, activity, filesize):
+    """
+    Per file throughput of the link in the last hour
+    """
+    throughput = provider.get_per_file_throughput(src, dst)
+    return throughput if throughput != 0 else None
+
+
+@register_strategy("pending-data")
+def score_pending_data(provider, src, dst, vo, activity, filesize):
+    """
+    Pending data in the queue from activities with equal or higher priority
+    """
+    return provider.get_pending_data(src, dst, vo, activity)
+
+
+@register_strategy("waiting-time")
+def score_waiting_time(provider, src, dst, vo, activity, filesize):
+    """
+    Time for the pending data to be transferred
+    """
+    return _waiting_time(provider, src, dst, vo, activity)
+
+
+@register_strategy("waiting-time-with-error")
+def score_waiting_time_with_error(provider, src, dst, vo, activity, filesize):
+    """
+    Waiting time, plus the time to resend the data expected to fail
+    """
+    return _waiting_time_with_error(provider, src, dst, vo, activity)
+
+
+@register_strategy("duration")
+def score_finish_time(provider, src, dst, vo, activity, filesize):
+    """
+    Waiting time with error, plus the time to transfer the submitted file
+    """
+    waiting_time = _waiting_time_with_error(provider, src, dst, vo, activity)
+    transfer_time = _transfer_time(provider, src, dst, filesize)
+    if waiting_time is None or transfer_time is None:
+        return None
+    return waiting_time + transfer_time
+
+
+@register_strategy("cost")
+def score_cost(provider, src, dst, vo, activity, filesize):
+    """
+    Expected time to complete the submitted file: queue time plus transfer time,
+    scaled by the expected number of attempts given the success rate
+    """
+    waiting_time = _waiting_time(provider, src, dst, vo, activity)
+    transfer_time = _transfer_time(provider, src, dst, filesize)
+    if waiting_time is None or transfer_time is None:
+        return None
+    success_rate = max(provider.get_success_rate(src, dst), 1)
+    return (waiting_time + transfer_time) * 100 / success_rate
@@ -0,0 +1,141 @@
+#   Copyright 2020 CERN
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Startup profile of the application: creates it in a fresh interpreter, run with
+python -X importtime, and reports the time spent importing each module.
+"""
+
+import argparse
+import collections
+import re
+import subprocess
+import sys
+
+DEFAULT_CONFIG = "/etc/fts3/fts3restconfig"
+
+_CREATE_APP = (
+    "import sys, time\n"
+    "start = time.perf_counter()\n"
+    "from fts3rest.config.middleware import create_app\n"
+    "create_app(sys.argv[1])\n"
+    "print('create_app %f' % (time.perf_counter() - start))\n"
+)
+
+_IMPORT_TIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+_CREATE_APP_RE = re.compile(r"^create_app (\S+)$", re.MULTILINE)
+
+ModuleTime = collections.namedtuple("ModuleTime", ["name", "self", "cumulative"])
+
+
+def parse_import_times(output):
+    """
+    Parse the output of python -X importtime
+    :return: list of ModuleTime, with the times in seconds
+    """
+    modules = []
+    for line in output.splitlines():
+        match = _IMPORT_TIME_RE.match(line)
+        if match:
+            modules.append(
+                ModuleTime(
+                    match.group(4),
+                    int(match.group(1)) / 1e6,
+                    int(match.group(2)) / 1e6,
+                )
+            )
+    return modules
+
+
+def profile_startup(config_file):
+    """
+    Create the application in a new interpreter
+    :return: a tuple (seconds spent in create_app, list of ModuleTime)
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CREATE_APP, config_file],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    match = _CREATE_APP_RE.search(process.stdout)
+    if process.returncode != 0 or not match:
+        errors = [
+            line
+            for line in process.stderr.splitlines()
+            if not line.startswith("import time:")
+        ]
+        raise RuntimeError("Could not create the application:\n" + "\n".join(errors))
+    return float(match.group(1)), parse_import_times(process.stderr)
+
+
+def by_package(modules):
+    """
+    Sum the time spent importing the modules of each top level package
+    """
+    packages = collections.defaultdict(float)
+    for module in modules:
+        packages[module.name.split(".")[0]] += module.self
+    return [ModuleTime(name, seconds, seconds) for name, seconds in packages.items()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Report the import time of each module when the application starts"
+    )
+    parser.add_argument("config", nargs="?", default=DEFAULT_CONFIG)
+    parser.add_argument(
+        "-n", "--top", type=int, default=25, help="number of modules to show"
+    )
+    parser.add_argument(
+        "-s",
+        "--sort",
+        choices=["self", "cumulative"],
+        default="cumulative",
+        help="order of the modules",
+    )
+    parser.add_argument(
+        "-p",
+        "--packages",
+        action="store_true",
+        help="aggregate the modules per top level package",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        elapsed, modules = profile_startup(args.config)
+    except RuntimeError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+
+    count = len(modules)
+    total = sum(module.self for module in modules)
+    if args.packages:
+        modules = by_package(modules)
+    modules.sort(key=lambda module: getattr(module, args.sort), reverse=True)
+
+    print("Application created in %.3f seconds" % elapsed)
+    print("%d modules imported in %.3f seconds" % (count, total))
+    print()
+    print("%10s %10s  %s" % ("self (ms)", "cumul (ms)", "module"))
+    for module in modules[: args.top]:
+        print(
+            "%10.1f %10.1f  %s"
+            % (module.self * 1000, module.cumulative * 1000, module.name)
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
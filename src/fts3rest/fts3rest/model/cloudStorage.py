@@ -12,6 +12,7 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 from sqlalchemy import Column, String, ForeignKey
+from sqlalchemy.orm import relation
 
 from .base import Base
 
@@ -24,6 +25,8 @@ class CloudStorage(Base):
     app_secret = Column(String(255))
     service_api_url = Column(String(1024))
 
+    users = relation("CloudStorageUser", uselist=True, lazy=True, viewonly=True)
+
 
 class CloudStorageUser(Base):
     __tablename__ = "t_cloudStorageUser"
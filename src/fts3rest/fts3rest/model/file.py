@@ -37,6 +37,9 @@ FileTokenStates = [
 FileTerminalStates = ["FINISHED", "FAILED", "CANCELED"]
 # NOT_USED is not terminal, nor not-terminal
 FileOnHoldStates = ["NOT_USED", "ON_HOLD", "ON_HOLD_STAGING"]
+# The files of a draft job are on hold until it is sealed, with the state
+# to enter once sealed kept in file_state_initial
+FileDraftStates = {"SUBMITTED": "ON_HOLD", "STAGING": "ON_HOLD_STAGING"}
 
 # sqlite doesn't like auto increment with BIGINT, so we need to use a variant
 # on that case
@@ -14,18 +14,58 @@
 #   limitations under the License.
 
 """SQLAlchemy Metadata and Session object"""
+import functools
 import logging
 
 import sqlalchemy
 from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.orm import Session as BaseSession
+
+
+class RoutingSession(BaseSession):
+    """
+    Session that sends the reads of the read only requests to a replica.
+    Once the session writes, everything goes to the primary, so the request
+    reads what it has written.
+    """
+
+    router = None
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.info.get("read_only") and self.router is not None:
+            if self._flushing or getattr(clause, "is_dml", False):
+                self.info["read_only"] = False
+            else:
+                if "replica" not in self.info:
+                    self.info["replica"] = self.router.pick()
+                if self.info["replica"] is not None:
+                    return self.info["replica"]
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
 
 # SQLAlchemy session manager. Updated by model.init_model()
-Session = scoped_session(sessionmaker())
+Session = scoped_session(sessionmaker(class_=RoutingSession))
 
 # Log the version
 logging.getLogger(__name__).info("Using SQLAlchemy %s" % sqlalchemy.__version__)
 
 
-def init_model(engine):
+def init_model(engine, router=None):
     """Call me before using any of the tables or classes in the model"""
     Session.configure(bind=engine)
+    RoutingSession.router = router
+
+
+def read_only(func):
+    """
+    Decorates the controllers that only read, so their queries can be served
+    by a replica. The session is removed at the end of the request, and with
+    it the routing.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        Session().info["read_only"] = True
+        return func(*args, **kwargs)
+
+    return wrapper
@@ -12,7 +12,7 @@
 #   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
-from sqlalchemy import Column, DateTime, Float, Integer, String, Text
+from sqlalchemy import Column, DateTime, Float, Index, Integer, String, Text
 
 from .base import Base
 
@@ -34,6 +34,10 @@ class OptimizerEvolution(Base):
     filesize_avg = Column(Float)
     filesize_stddev = Column(Float)
 
+    __table_args__ = (
+        Index("idx_optimizer_evolution_link", "source_se", "dest_se", "datetime"),
+    )
+
 
 class Optimizer(Base):
     __tablename__ = "t_optimizer"
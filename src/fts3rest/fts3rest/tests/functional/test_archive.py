@@ -9,22 +9,23 @@ class TestArchive(TestController):
     Archived jobs
     """
 
-    def _insert_job(self):
+    def _insert_job(self, job_id="111-222-333", files=1, first_file_id=1234):
         job = ArchivedJob()
 
-        job.job_id = "111-222-333"
+        job.job_id = job_id
         job.job_state = "CANCELED"
         job.user_dn = TestController.TEST_USER_DN
 
-        archived = ArchivedFile()
-        archived.job_id = job.job_id
-        archived.file_id = 1234
-        archived.file_state = "CANCELED"
-        archived.source_se = "srm://source"
-        archived.dest_se = "srm://dest"
-
         Session.merge(job)
-        Session.merge(archived)
+        for i in range(files):
+            archived = ArchivedFile()
+            archived.job_id = job.job_id
+            archived.file_id = first_file_id + i
+            archived.file_index = i
+            archived.file_state = "CANCELED"
+            archived.source_se = "srm://source"
+            archived.dest_se = "srm://dest"
+            Session.merge(archived)
         Session.commit()
         return job.job_id
 
@@ -46,13 +47,62 @@ class TestArchive(TestController):
 
         self.assertEqual(job["job_id"], job_id)
         self.assertEqual(job["job_state"], "CANCELED")
+        self.assertNotIn("files", job)
+
+        files = self.app.get(url="/archive/%s/files" % job_id, status=200).json
+        self.assertEqual(len(files), 1)
+
+        self.assertEqual(files[0]["file_state"], "CANCELED")
+        self.assertEqual(files[0]["source_se"], "srm://source")
+        self.assertEqual(files[0]["dest_se"], "srm://dest")
+        self.assertEqual(files[0]["file_id"], 1234)
+
+    def test_get_files_from_archive(self):
+        """
+        Query the files of an archived job, a page and some fields at a time
+        """
+        self.setup_gridsite_environment()
+        job_id = self._insert_job(files=5)
+
+        files = self.app.get(
+            url="/archive/%s/files?fields=file_id,file_state&limit=2" % job_id,
+            status=200,
+        ).json
+        self.assertEqual(
+            files,
+            [
+                {"file_id": 1234, "file_state": "CANCELED"},
+                {"file_id": 1235, "file_state": "CANCELED"},
+            ],
+        )
+
+        files = self.app.get(
+            url="/archive/%s/files?fields=file_id&marker=1235" % job_id,
+            status=200,
+        ).json
+        self.assertEqual([f["file_id"] for f in files], [1236, 1237, 1238])
+
+        self.app.get(url="/archive/%s/files?limit=0" % job_id, status=400)
+        self.app.get(url="/archive/1234-5678-98765/files", status=404)
+
+    def test_get_multiple_from_archive(self):
+        """
+        Query several archived jobs at once, some of them missing
+        """
+        self.setup_gridsite_environment()
+        job1 = self._insert_job("111-222-333")
+        job2 = self._insert_job("444-555-666", files=2, first_file_id=2000)
 
-        self.assertEqual(len(job["files"]), 1)
+        jobs = self.app.get(
+            url="/archive/%s,%s?files=file_id" % (job1, job2), status=200
+        ).json
+        self.assertEqual([job["job_id"] for job in jobs], [job1, job2])
+        self.assertEqual(jobs[0]["files"], [{"file_id": 1234}])
+        self.assertEqual(jobs[1]["files"], [{"file_id": 2000}, {"file_id": 2001}])
 
-        self.assertEqual(job["files"][0]["file_state"], "CANCELED")
-        self.assertEqual(job["files"][0]["source_se"], "srm://source")
-        self.assertEqual(job["files"][0]["dest_se"], "srm://dest")
-        self.assertEqual(job["files"][0]["file_id"], 1234)
+        jobs = self.app.get(url="/archive/%s,1234-5678-98765" % job1, status=207).json
+        self.assertEqual(jobs[0]["http_status"], "200 Ok")
+        self.assertEqual(jobs[1]["http_status"], "404 Not Found")
 
     def test_get_field_from_archive(self):
         """
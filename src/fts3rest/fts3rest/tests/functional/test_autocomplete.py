@@ -1,3 +1,8 @@
+from datetime import datetime
+
+from fts3rest.lib.helpers.prefixindex import PrefixIndex
+from fts3rest.model import Credential
+from fts3rest.model.meta import Session
 from fts3rest.tests import TestController
 
 
@@ -64,3 +69,36 @@ class TestAutocomplete(TestController):
             status=200,
         ).json
         self.assertEqual(0, len(autocomp))
+
+    def test_autocomplete_dn_matches(self):
+        """
+        Test autocomplete dn with matches, and a limit
+        """
+        for i, dn in enumerate(["/DC=ch/CN=a", "/DC=ch/CN=b", "/DC=org/CN=c"]):
+            Session.add(
+                Credential(
+                    dlg_id=str(i), dn=dn, proxy="", termination_time=datetime.utcnow()
+                )
+            )
+        Session.commit()
+
+        autocomp = self.app.get(
+            url="/autocomplete/dn", params={"term": "/DC=ch"}, status=200
+        ).json
+        self.assertEqual(["/DC=ch/CN=a", "/DC=ch/CN=b"], autocomp)
+
+        autocomp = self.app.get(
+            url="/autocomplete/dn", params={"term": "/DC=", "limit": 1}, status=200
+        ).json
+        self.assertEqual(["/DC=ch/CN=a"], autocomp)
+
+    def test_prefix_index(self):
+        """
+        Test the search of the prefix index
+        """
+        index = PrefixIndex(["srm://b", "srm://a", "gsiftp://a", "srm://a"])
+        self.assertEqual(3, len(index))
+        self.assertEqual(["srm://a", "srm://b"], index.search("srm://"))
+        self.assertEqual(["srm://a"], index.search("srm://", 1))
+        self.assertEqual([], index.search("root://"))
+        self.assertEqual(["root://a"], index.union(["root://a"]).search("root"))
@@ -591,6 +591,78 @@ class TestBanning(TestController):
         for f in files:
             self.assertEqual("SUBMITTED", f.file_state)
 
+    def _create_draft(self):
+        return self.app.post(
+            url="/jobs",
+            content_type="application/json",
+            params=json.dumps(
+                {
+                    "files": [
+                        {
+                            "sources": ["gsiftp://source/file"],
+                            "destinations": ["gsiftp://destination/file"],
+                        }
+                    ],
+                    "params": {"draft": True},
+                }
+            ),
+            status=200,
+        ).json["job_id"]
+
+    def _ban_wait(self):
+        self.app.post(
+            url="/ban/se",
+            params={
+                "storage": "gsiftp://source",
+                "status": "wait",
+                "allow_submit": True,
+            },
+            status=200,
+        )
+
+    def test_unban_keeps_drafts(self):
+        """
+        Unbanning a storage must not release the files of a draft job
+        that has not been sealed yet
+        """
+        self.push_delegation()
+        self._ban_wait()
+        job_id = self._create_draft()
+
+        self.app.delete(url="/ban/se?storage=%s" % quote("gsiftp://source"), status=204)
+
+        Session.expire_all()
+        files = Session.query(File).filter(File.job_id == job_id).all()
+        self.assertEqual(1, len(files))
+        for f in files:
+            self.assertEqual("ON_HOLD", f.file_state)
+            self.assertEqual("SUBMITTED", f.file_state_initial)
+
+        self.app.post(url="/jobs/%s/seal" % job_id, status=200)
+        Session.expire_all()
+        for f in Session.query(File).filter(File.job_id == job_id):
+            self.assertEqual("SUBMITTED", f.file_state)
+
+    def test_seal_draft_banned(self):
+        """
+        The files of a draft sealed while its storage is banned stay on hold
+        until the storage is unbanned
+        """
+        self.push_delegation()
+        job_id = self._create_draft()
+        self._ban_wait()
+
+        self.app.post(url="/jobs/%s/seal" % job_id, status=200)
+        Session.expire_all()
+        for f in Session.query(File).filter(File.job_id == job_id):
+            self.assertEqual("ON_HOLD", f.file_state)
+            self.assertEqual("", f.file_state_initial)
+
+        self.app.delete(url="/ban/se?storage=%s" % quote("gsiftp://source"), status=204)
+        Session.expire_all()
+        for f in Session.query(File).filter(File.job_id == job_id):
+            self.assertEqual("SUBMITTED", f.file_state)
+
     # Some requests that must be rejected
     def test_ban_dn_empty(self):
         """
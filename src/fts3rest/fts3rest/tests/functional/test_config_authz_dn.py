@@ -137,3 +137,49 @@ class TestConfigAuthz(TestController):
         self.assertEqual(1, len(authz))
         self.assertEqual(authz[0]["dn"], "/DN=a.test.user")
         self.assertEqual(authz[0]["operation"], "admin")
+
+    def test_list_authz_paginated(self):
+        """
+        List the authorizations a page at a time
+        """
+        for dn in ("/DN=a", "/DN=b"):
+            for op in ("config", "deleg"):
+                Session.add(AuthorizationByDn(dn=dn, operation=op))
+        Session.commit()
+
+        url = "/config/authorize?limit=3"
+        resp = self.app.get_json(url, status=200)
+        self.assertEqual(
+            [("/DN=a", "config"), ("/DN=a", "deleg"), ("/DN=b", "config")],
+            [(a["dn"], a["operation"]) for a in resp.json],
+        )
+
+        url = resp.headers["Link"].split(">")[0][1:]
+        resp = self.app.get_json(url, status=200)
+        self.assertEqual(
+            [("/DN=b", "deleg")], [(a["dn"], a["operation"]) for a in resp.json]
+        )
+        self.assertNotIn("Link", resp.headers)
+
+        self.app.get_json("/config/authorize?cursor=1234", status=400)
+        self.app.get_json("/config/authorize?limit=0", status=400)
+
+    def test_list_authz_etag(self):
+        """
+        The listing is not sent again if it did not change
+        """
+        self.test_add_authz()
+        etag = self.app.get_json("/config/authorize", status=200).headers["ETag"]
+
+        self.app.get(
+            "/config/authorize",
+            headers=[("Accept", "application/json"), ("If-None-Match", etag)],
+            status=304,
+        )
+
+        self._add_admin_level_authz("/DN=another.user")
+        self.app.get(
+            "/config/authorize",
+            headers=[("Accept", "application/json"), ("If-None-Match", etag)],
+            status=200,
+        )
@@ -58,6 +58,33 @@ class TestConfigCloud(TestController):
 
         self.assertEqual(2, len(storages))
 
+    def test_list_cloud_storages_users(self):
+        """
+        The storages are listed with their users
+        """
+        self.test_add_vo_s3()
+        self.test_add_dropbox()
+
+        # The order depends on the collation, so do not rely on it
+        storages = self.app.get_json(url="/config/cloud_storage", status=200).json
+        storages = {s["storage_name"]: s for s in storages}
+
+        self.assertEqual({"S3:host", "dropbox"}, set(storages))
+        self.assertEqual(1, len(storages["S3:host"]["users"]))
+        self.assertEqual("testvo", storages["S3:host"]["users"][0]["vo_name"])
+        self.assertEqual([], storages["dropbox"]["users"])
+
+        # Otherwise the storages loaded by the test keep all their fields
+        Session.expire_all()
+        storages = self.app.get_json(
+            url="/config/cloud_storage?fields=service_api_url", status=200
+        ).json
+        storages = {s["storage_name"]: s for s in storages}
+        self.assertEqual(
+            "https://www.dropbox.com/1", storages["dropbox"]["service_api_url"]
+        )
+        self.assertNotIn("app_key", storages["dropbox"])
+
     def test_remove_storage(self):
         """
         Remove an entry
@@ -0,0 +1,128 @@
+import os
+import re
+import shutil
+import tempfile
+import time
+
+from fts3rest.config.middleware import _load_configuration
+from fts3rest.config.watcher import ConfigWatcher
+from fts3rest.tests import TestController
+
+
+class TestConfigReload(TestController):
+    """
+    Tests for the reload of the configuration file
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.config_file = os.path.join(self.directory, "fts3restconfig")
+        shutil.copy(os.environ["FTS3TESTCONFIG"], self.config_file)
+        self.watcher = ConfigWatcher(
+            self.flask_app,
+            self.config_file,
+            lambda path: _load_configuration(path, True, configure_logging=False),
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super().tearDown()
+
+    def _edit(self, key, value):
+        with open(self.config_file) as config:
+            content = config.read()
+        # Whatever the original value, which the CI may have rewritten
+        content, count = re.subn(
+            r"^%s\s*=.*$" % re.escape(key),
+            lambda match: "%s=%s" % (key, value),
+            content,
+            flags=re.MULTILINE,
+        )
+        # The file starts with the settings, without a section header
+        if not count:
+            content = "%s=%s\n%s" % (key, value, content)
+        with open(self.config_file, "w") as config:
+            config.write(content)
+        # Old enough to not be considered as being written
+        mtime = time.time() - 10
+        os.utime(self.config_file, (mtime, mtime))
+
+    def test_unchanged(self):
+        """
+        Nothing is reloaded while the file does not change
+        """
+        config = self.flask_app.config
+        self.assertFalse(self.watcher.check())
+        self.assertIs(config, self.flask_app.config)
+
+    def test_reload(self):
+        """
+        A new configuration replaces the old one, and is seen by the middlewares
+        """
+        self.setup_gridsite_environment()
+        self.app.get(url="/whoami", status=200)
+
+        old_config = self.flask_app.config
+        self._edit("AuthorizedVO", "othervo")
+        self.assertTrue(self.watcher.check())
+        self.assertEqual(["othervo"], self.flask_app.config["fts3.AuthorizedVO"])
+        self.assertEqual(["*"], old_config["fts3.AuthorizedVO"])
+
+        self.app.get(url="/whoami", status=403)
+
+    def test_invalid(self):
+        """
+        An invalid configuration is not published
+        """
+        config = self.flask_app.config
+        self._edit("DbType", "unknown")
+        self.assertFalse(self.watcher.check())
+        self.assertIs(config, self.flask_app.config)
+
+    def test_restart_only(self):
+        """
+        The database settings are kept until the restart
+        """
+        url = self.flask_app.config["sqlalchemy.url"]
+        self._edit("DbConnectString", "otherhost:3306/ftsflask")
+        self._edit("AuthorizedVO", "othervo")
+        with self.assertLogs("fts3rest.config.watcher", "WARNING") as logs:
+            self.assertTrue(self.watcher.check())
+        self.assertIn(
+            "WARNING:fts3rest.config.watcher:"
+            "fts3.DbConnectString can not be changed without a restart",
+            logs.output,
+        )
+        self.assertEqual(url, self.flask_app.config["sqlalchemy.url"])
+        self.assertEqual(["othervo"], self.flask_app.config["fts3.AuthorizedVO"])
+
+    def test_restart_statement_timeouts(self):
+        """
+        The statement timeouts are installed on the engine, so need a restart
+        """
+        timeouts = self.flask_app.config.get("fts3.StatementTimeouts")
+        self._edit("StatementTimeouts", "jobs.index:30")
+        with self.assertLogs("fts3rest.config.watcher", "WARNING") as logs:
+            self.assertTrue(self.watcher.check())
+        self.assertIn(
+            "WARNING:fts3rest.config.watcher:"
+            "fts3.StatementTimeouts can not be changed without a restart",
+            logs.output,
+        )
+        self.assertEqual(timeouts, self.flask_app.config.get("fts3.StatementTimeouts"))
+
+    def test_reload_metrics(self):
+        """
+        The metrics are flushed where the reloaded configuration says
+        """
+        self.setup_gridsite_environment()
+        self._edit("MetricsDir", self.directory)
+        self._edit("MetricsFlushInterval", "0")
+        self.assertTrue(self.watcher.check())
+
+        self.app.get(url="/whoami", status=200, buffered=True)
+        snapshots = [
+            name for name in os.listdir(self.directory) if name.startswith("metrics-")
+        ]
+        self.assertEqual(1, len(snapshots))
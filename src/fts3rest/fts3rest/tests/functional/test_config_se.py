@@ -333,3 +333,99 @@ class TestConfigSe(TestController):
 
         se = Session.query(Se).filter(Se.storage == "test.cern.ch").all()
         self.assertEqual(0, len(se))
+
+    def test_set_se_config_dry_run(self):
+        """
+        A dry run returns the changes without applying them
+        """
+        self.test_set_se_config()
+
+        config = {
+            "test.cern.ch": {
+                "operations": {"atlas": {"delete": 22, "staging": 0}},
+                "se_info": {"ipv6": 1, "outbound_max_active": 88},
+            },
+            "test2.cern.ch": {"operations": {"atlas": {"delete": 5}}},
+        }
+        diff = self.app.post_json(
+            "/config/se?dry_run=true", params=config, status=200
+        ).json
+
+        self.assertEqual(
+            {
+                "se": {
+                    "insert": [],
+                    "update": [{"storage": "test.cern.ch", "outbound_max_active": 88}],
+                },
+                "operations": {
+                    "insert": [
+                        {
+                            "vo_name": "atlas",
+                            "host": "test2.cern.ch",
+                            "operation": "delete",
+                            "concurrent_ops": 5,
+                        }
+                    ],
+                    "update": [],
+                    "delete": [
+                        {
+                            "vo_name": "atlas",
+                            "host": "test.cern.ch",
+                            "operation": "staging",
+                        }
+                    ],
+                },
+            },
+            diff,
+        )
+
+        self.assertEqual(2, Session.query(ConfigAudit).count())
+        se = Session.query(Se).get("test.cern.ch")
+        self.assertEqual(55, se.outbound_max_active)
+        self.assertEqual(
+            0,
+            Session.query(OperationConfig)
+            .filter(OperationConfig.host == "test2.cern.ch")
+            .count(),
+        )
+
+        self.app.post_json("/config/se", params=config, status=200)
+        Session.expire_all()
+        self.assertEqual(5, Session.query(ConfigAudit).count())
+        se = Session.query(Se).get("test.cern.ch")
+        self.assertEqual(88, se.outbound_max_active)
+        self.assertIsNone(
+            Session.query(OperationConfig).get(("atlas", "test.cern.ch", "staging"))
+        )
+        self.assertEqual(
+            5,
+            Session.query(OperationConfig)
+            .get(("atlas", "test2.cern.ch", "delete"))
+            .concurrent_ops,
+        )
+
+    def test_set_se_config_many(self):
+        """
+        Set the configuration of many storages at once
+        """
+        config = {"test%d.cern.ch" % i: self.host_config for i in range(100)}
+        self.app.post_json("/config/se", params=config, status=200)
+
+        self.assertEqual(200, Session.query(ConfigAudit).count())
+        self.assertEqual(100, Session.query(Se).count())
+        self.assertEqual(400, Session.query(OperationConfig).count())
+
+    def test_set_se_config_invalid_rolls_back(self):
+        """
+        An invalid storage at the end leaves the configuration and the audit
+        untouched
+        """
+        config = {
+            "test.cern.ch": self.host_config,
+            "test2.cern.ch": {"se_info": {"tpc_support": "whatever"}},
+        }
+        self.app.post_json("/config/se", params=config, status=400)
+
+        self.assertEqual(0, Session.query(ConfigAudit).count())
+        self.assertEqual(0, Session.query(Se).count())
+        self.assertEqual(0, Session.query(OperationConfig).count())
@@ -3,10 +3,28 @@ from M2Crypto import EVP, RSA
 import time
 
 from fts3rest.controllers.delegation import _generate_proxy_request
+from fts3rest.lib.helpers.keypool import KeyPool, key_pool_metrics
+from fts3rest.lib.helpers.proxyinfo import (
+    ProxyInfo,
+    ProxyInfoException,
+    parse_voms_extension,
+)
 from fts3rest.tests import TestController
 from fts3rest.model.meta import Session
 from fts3rest.model import Credential, CredentialCache
 
+# Value of a VOMS extension holding one AC for dteam, with two FQANs,
+# valid from 2026-01-01 00:00 to 12:00 UTC
+VOMS_EXTENSION = bytes.fromhex(
+    "3081d43081d13081ce3081bb0201013000a000300b06092a864886f70d01010b"
+    "0201053022180f32303236303130313030303030305a180f3230323630313031"
+    "3132303030305a307e307c060a2b06010401be45646404316e306ca020861e64"
+    "7465616d3a2f2f766f6d732e6578616d706c652e6f72673a3135303034304804"
+    "202f647465616d2f526f6c653d4e554c4c2f4361706162696c6974793d4e554c"
+    "4c04242f647465616d2f526f6c653d6c636761646d696e2f4361706162696c69"
+    "74793d4e554c4c300b06092a864886f70d01010b030100"
+)
+
 
 class TestDelegation(TestController):
     """
@@ -243,6 +261,51 @@ class TestDelegation(TestController):
         self.assertNotEqual(proxy.proxy, proxy2.proxy)
         self.assertEqual("dteam:/dteam/Role=lcgadmin", proxy2.voms_attrs)
 
+    def test_proxy_info(self):
+        """
+        Inspect a proxy without VOMS extensions
+        """
+        self.setup_gridsite_environment()
+        creds = self.get_user_credentials()
+
+        request = self.app.get(
+            url="/delegation/%s/request" % creds.delegation_id, status=200
+        )
+        proxy = self.get_x509_proxy(request.get_data(as_text=True))
+
+        info = ProxyInfo(proxy)
+        self.assertEqual("legacy", info.type)
+        self.assertEqual([], info.fqans)
+        # The proxy expires before its issuer
+        self.assertLess(
+            info.not_after,
+            self.cert.get_not_after().get_datetime().replace(tzinfo=None),
+        )
+        self.assertEqual(info.not_after, info.termination_time)
+
+        self.assertRaises(ProxyInfoException, ProxyInfo, "not a proxy")
+
+    def test_voms_extension(self):
+        """
+        Extract the FQANs and the lifetime of the VOMS attribute certificates
+        """
+        acs = parse_voms_extension(VOMS_EXTENSION)
+        self.assertEqual(1, len(acs))
+        self.assertEqual("dteam", acs[0].vo)
+        self.assertEqual(
+            [
+                "/dteam/Role=NULL/Capability=NULL",
+                "/dteam/Role=lcgadmin/Capability=NULL",
+            ],
+            acs[0].fqans,
+        )
+        self.assertEqual(datetime(2026, 1, 1, 0, 0), acs[0].not_before)
+        self.assertEqual(datetime(2026, 1, 1, 12, 0), acs[0].not_after)
+
+        self.assertRaises(
+            ProxyInfoException, parse_voms_extension, VOMS_EXTENSION[:-3]
+        )
+
     def test_delegate_rfc(self):
         """
         Delegate an RFC-like proxy
@@ -286,3 +349,37 @@ class TestDelegation(TestController):
             as_text=True
         )
         self.assertEqual("certificate:" + cert, returns)
+
+    def test_key_pool(self):
+        """
+        Keys are served from the pool while there are some left, and generated
+        on demand otherwise
+        """
+        pool = KeyPool(1024, 2)
+        pool.start()
+        for _ in range(50):
+            if pool.metrics()["depth"] == 2:
+                break
+            time.sleep(0.1)
+        self.assertEqual(2, pool.metrics()["depth"])
+
+        for _ in range(3):
+            (request, private_key) = _generate_proxy_request(1024, pool)
+            self.assertEqual(1024, request.get_pubkey().size() * 8)
+
+        metrics = pool.metrics()
+        self.assertEqual(3, metrics["hits"] + metrics["misses"])
+        self.assertGreaterEqual(metrics["hits"], 2)
+        self.assertGreater(metrics["avg_generation_seconds"], 0)
+
+    def test_request_uses_key_pool(self):
+        """
+        Delegation requests take their keys from the pool of the process
+        """
+        self.setup_gridsite_environment()
+        creds = self.get_user_credentials()
+
+        self.app.get(url="/delegation/%s/request" % creds.delegation_id, status=200)
+        metrics = [m for m in key_pool_metrics() if m["key_len"] == 2048]
+        self.assertEqual(1, len(metrics))
+        self.assertGreaterEqual(metrics[0]["hits"] + metrics[0]["misses"], 1)
@@ -0,0 +1,141 @@
+import errno
+import json
+
+from fts3rest.lib import gfal2_wrapper
+from fts3rest.lib.gfal2_wrapper import get_worker_pool
+from fts3rest.tests import TestController
+
+
+class MockGError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class MockStat(object):
+    st_mode = 0o100644
+    st_nlink = 1
+    st_size = 1024
+    st_atime = st_mtime = st_ctime = 0
+
+
+class MockContext(object):
+    def set_opt_string(self, group, key, value):
+        pass
+
+    def stat(self, surl):
+        if "missing" in surl:
+            raise MockGError(errno.ENOENT, "No such file or directory")
+        return MockStat()
+
+    def unlink(self, surl):
+        if "protected" in surl:
+            raise MockGError(errno.EACCES, "Permission denied")
+
+    def mkdir(self, surl, mode):
+        pass
+
+
+class TestDmBatch(TestController):
+    """
+    Tests for the data management batch endpoint, with a mock gfal2 context
+    """
+
+    def setUp(self):
+        super().setUp()
+        get_worker_pool(1, 0).close()
+        self.context_type = gfal2_wrapper.context_type
+        self.gfal2_errors = gfal2_wrapper.gfal2_errors
+        gfal2_wrapper.context_type = MockContext
+        gfal2_wrapper.gfal2_errors = (MockGError,)
+
+    def tearDown(self):
+        get_worker_pool(1, 0).close()
+        gfal2_wrapper.context_type = self.context_type
+        gfal2_wrapper.gfal2_errors = self.gfal2_errors
+        super().tearDown()
+
+    def _batch(self, operations, status=207):
+        response = self.app.post(
+            url="/dm/batch",
+            content_type="application/json",
+            params=json.dumps({"operations": operations}),
+            status=status,
+        )
+        if status != 207:
+            return response.json
+        return [
+            json.loads(line) for line in response.get_data(as_text=True).splitlines()
+        ]
+
+    def test_batch(self):
+        """
+        Each operation gets its own status
+        """
+        self.setup_gridsite_environment()
+        self.push_delegation()
+
+        operations = []
+        for i in range(20):
+            operations.append(
+                {"op": "stat", "surl": "root://host%d.ch/file%d" % (i % 3, i)}
+            )
+        operations.append({"op": "stat", "surl": "root://host0.ch/missing"})
+        operations.append({"op": "unlink", "surl": "root://host1.ch/protected"})
+        operations.append({"op": "mkdir", "surl": "root://host2.ch/dir"})
+
+        results = self._batch(operations)
+        self.assertEqual(len(operations), len(results))
+        results = dict((r["index"], r) for r in results)
+        for i in range(20):
+            self.assertEqual(200, results[i]["status"])
+            self.assertEqual(operations[i]["surl"], results[i]["surl"])
+            self.assertEqual(1024, results[i]["result"]["size"])
+        self.assertEqual(404, results[20]["status"])
+        self.assertEqual("[2] No such file or directory", results[20]["message"])
+        self.assertEqual(403, results[21]["status"])
+        self.assertEqual(200, results[22]["status"])
+
+    def test_batch_invalid(self):
+        """
+        The batch is rejected as a whole if an operation is not valid
+        """
+        self.setup_gridsite_environment()
+        self.push_delegation()
+
+        error = self._batch(
+            [
+                {"op": "stat", "surl": "root://host.ch/file"},
+                {"op": "rename", "surl": "root://host.ch/file"},
+            ],
+            status=400,
+        )
+        self.assertEqual(
+            "Invalid value within the request: operations[1]: "
+            "unsupported operation 'rename'",
+            error["message"],
+        )
+        self._batch([{"op": "stat", "surl": "file:///etc/passwd"}], status=400)
+        self._batch([{"op": "stat"}], status=400)
+        self._batch([], status=400)
+
+        self.flask_app.config["fts3.DmBatchMaxOperations"] = 2
+        self._batch(
+            [{"op": "stat", "surl": "root://host.ch/file%d" % i} for i in range(3)],
+            status=400,
+        )
+
+    def test_batch_zero_concurrency(self):
+        """
+        A concurrency configured to 0 must still run the operations one by one
+        """
+        self.setup_gridsite_environment()
+        self.push_delegation()
+
+        self.flask_app.config["fts3.DmBatchConcurrency"] = 0
+        self.flask_app.config["fts3.DmBatchHostConcurrency"] = 0
+        results = self._batch(
+            [{"op": "stat", "surl": "root://host.ch/file%d" % i} for i in range(3)]
+        )
+        self.assertEqual([200] * 3, [r["status"] for r in results])
@@ -0,0 +1,145 @@
+import errno
+import os
+import signal
+import time
+
+from fts3rest.lib import gfal2_wrapper
+from fts3rest.lib.gfal2_wrapper import Gfal2WorkerPool, Gfal2Error
+from fts3rest.tests import TestController
+
+
+class MockContext(object):
+    def __init__(self):
+        self.options = {}
+
+    def set_opt_string(self, group, key, value):
+        self.options["%s.%s" % (group, key)] = value
+
+
+class MockCredential(object):
+    def __init__(self, proxy):
+        self.proxy = proxy
+
+
+def _whoami(context):
+    with open(os.environ["X509_USER_PROXY"]) as proxy:
+        return {"pid": os.getpid(), "context": id(context), "proxy": proxy.read()}
+
+
+def _options(context):
+    return context.options
+
+
+def _fail(context):
+    raise ValueError("Something went wrong")
+
+
+def _sleep(context, seconds):
+    time.sleep(seconds)
+
+
+def _count(context, count, fail_at=None):
+    for i in range(count):
+        if i == fail_at:
+            raise IOError("Failed at %d" % i)
+        yield i
+
+
+def _crash(context):
+    os.kill(os.getpid(), signal.SIGSEGV)
+
+
+class TestGfal2Wrapper(TestController):
+    """
+    Tests for the pool of gfal2 workers, with a mock gfal2 context
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.context_type = gfal2_wrapper.context_type
+        gfal2_wrapper.context_type = MockContext
+        self.pool = Gfal2WorkerPool(1, 5)
+
+    def tearDown(self):
+        self.pool.close()
+        gfal2_wrapper.context_type = self.context_type
+        super().tearDown()
+
+    def test_context_reuse(self):
+        """
+        The context is kept between calls with the same credential
+        """
+        first = self.pool.call(MockCredential("proxy-1"), _whoami)
+        second = self.pool.call(MockCredential("proxy-1"), _whoami)
+        other = self.pool.call(MockCredential("proxy-2"), _whoami)
+
+        self.assertEqual("proxy-1", first["proxy"])
+        self.assertEqual(first, second)
+        self.assertEqual(first["pid"], other["pid"])
+        self.assertNotEqual(first["context"], other["context"])
+        self.assertEqual("proxy-2", other["proxy"])
+
+        options = self.pool.call(
+            MockCredential("proxy-1"), _options, options=[("DROPBOX", "APP_KEY", "key")]
+        )
+        self.assertEqual("key", options["DROPBOX.APP_KEY"])
+
+    def test_errors(self):
+        """
+        Errors, timeouts and crashes do not affect the following calls
+        """
+        cred = MockCredential("proxy")
+        pid = self.pool.call(cred, _whoami)["pid"]
+
+        with self.assertRaises(Gfal2Error) as error:
+            self.pool.call(cred, _fail)
+        self.assertEqual(errno.EIO, error.exception.errno)
+        self.assertEqual("Something went wrong", error.exception.message)
+        self.assertEqual(pid, self.pool.call(cred, _whoami)["pid"])
+
+        with self.assertRaises(Gfal2Error) as error:
+            self.pool.call(cred, _sleep, 10, timeout=1)
+        self.assertEqual(errno.ETIMEDOUT, error.exception.errno)
+
+        with self.assertRaises(Gfal2Error) as error:
+            self.pool.call(cred, _crash)
+        self.assertEqual(
+            "Worker process killed by signal %d" % signal.SIGSEGV,
+            error.exception.message,
+        )
+
+        self.assertEqual("proxy", self.pool.call(cred, _whoami)["proxy"])
+
+    def test_recycle(self):
+        """
+        Workers are replaced after max_calls calls
+        """
+        cred = MockCredential("proxy")
+        pids = [self.pool.call(cred, _whoami)["pid"] for _ in range(10)]
+        self.assertEqual(1, len(set(pids[:5])))
+        self.assertEqual(1, len(set(pids[5:])))
+        self.assertNotEqual(pids[0], pids[5])
+
+    def test_stream(self):
+        """
+        Generators are sent item by item, and can be abandoned
+        """
+        cred = MockCredential("proxy")
+        self.assertEqual(list(range(1000)), list(self.pool.stream(cred, _count, 1000)))
+        self.assertEqual([], list(self.pool.stream(cred, _count, 0)))
+
+        with self.assertRaises(Gfal2Error):
+            self.pool.stream(cred, _count, 10, fail_at=0)
+
+        items = []
+        with self.assertRaises(Gfal2Error) as error:
+            for item in self.pool.stream(cred, _count, 1000, fail_at=500):
+                items.append(item)
+        self.assertEqual(list(range(500)), items)
+        self.assertEqual("Failed at 500", error.exception.message)
+
+        stream = self.pool.stream(cred, _count, 100000)
+        self.assertEqual(0, next(stream))
+        stream.close()
+        # The worker is replaced
+        self.assertEqual([0, 1], list(self.pool.stream(cred, _count, 2)))
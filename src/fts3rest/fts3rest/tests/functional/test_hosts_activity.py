@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+from fts3rest.model import File, Host, Job
+from fts3rest.model.meta import Session
+from fts3rest.tests import TestController
+
+
+class TestHostsActivity(TestController):
+    """
+    Tests for the activity of the hosts
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.setup_gridsite_environment()
+        Session.add(Job(job_id="1234", vo_name="testvo", job_state="ACTIVE"))
+        files = [
+            ("STARTED", "stager", None),
+            ("STARTED", "stager", None),
+            ("ACTIVE", None, "server"),
+            ("READY", None, "server"),
+            ("FINISHED", None, "server"),
+        ]
+        for i, (state, staging_host, transfer_host) in enumerate(files):
+            Session.add(
+                File(
+                    job_id="1234",
+                    file_state=state,
+                    staging_host=staging_host,
+                    transfer_host=transfer_host,
+                    source_surl="root://source/%d" % i,
+                    dest_surl="root://dest/%d" % i,
+                )
+            )
+        Session.add(
+            Host(
+                hostname="server",
+                service_name="fts_server",
+                beat=datetime.utcnow() - timedelta(seconds=30),
+                drain=False,
+            )
+        )
+        Session.commit()
+
+    def tearDown(self):
+        Session.query(Host).delete()
+        Session.commit()
+        super().tearDown()
+
+    def test_hosts_activity(self):
+        """
+        Files and heartbeats per host
+        """
+        response = self.app.get(url="/status/hosts", status=200)
+        activity = response.json
+        self.assertEqual({"staging": 2}, activity["stager"])
+        self.assertEqual(1, activity["server"]["active"])
+        self.assertEqual(1, activity["server"]["queued"])
+        self.assertLessEqual(30, activity["server"]["heartbeat_age"]["fts_server"])
+        self.assertIn("Age", response.headers)
+
+    def test_snapshot(self):
+        """
+        The activity is served from memory until the snapshot is too old
+        """
+        self.app.get(url="/status/hosts", status=200)
+        Session.query(File).filter(File.file_state == "READY").update(
+            {"file_state": "ACTIVE"}
+        )
+        Session.commit()
+
+        activity = self.app.get(url="/status/hosts", status=200).json
+        self.assertEqual(1, activity["server"]["active"])
+
+        self.flask_app.extensions["fts3.hosts_activity"].interval = 0
+        activity = self.app.get(url="/status/hosts", status=200).json
+        self.assertEqual(2, activity["server"]["active"])
+        self.assertNotIn("queued", activity["server"])
@@ -0,0 +1,151 @@
+import json
+
+from fts3rest.tests import TestController
+from fts3rest.model.meta import Session
+from fts3rest.model import Job, File
+
+
+class TestJobDraft(TestController):
+    """
+    Tests the submission of jobs in chunks
+    """
+
+    def _files(self, start, count, source="root://source.es"):
+        return [
+            {
+                "sources": ["%s/file%d" % (source, i)],
+                "destinations": ["root://dest.ch/file%d" % i],
+            }
+            for i in range(start, start + count)
+        ]
+
+    def _create_draft(self, files, **params):
+        params["draft"] = True
+        return self.app.post(
+            url="/jobs",
+            content_type="application/json",
+            params=json.dumps({"files": files, "params": params}),
+            status=200,
+        ).json["job_id"]
+
+    def _add_files(self, job_id, files, status=200):
+        return self.app.post(
+            url="/jobs/%s/files" % job_id,
+            content_type="application/json",
+            params=json.dumps({"files": files}),
+            status=status,
+        ).json
+
+    def test_draft_submit_and_seal(self):
+        """
+        The files of a draft are kept on hold until it is sealed
+        """
+        self.setup_gridsite_environment()
+        self.push_delegation()
+
+        job_id = self._create_draft(self._files(0, 10))
+        self.assertEqual(10, self._add_files(job_id, self._files(10, 10))["files"])
+        self._add_files(job_id, self._files(20, 10, source="root://other.es"))
+
+        job = Session.query(Job).get(job_id)
+        self.assertEqual("SUBMITTED", job.job_state)
+        self.assertIsNone(job.source_se)
+        self.assertEqual("root://dest.ch", job.dest_se)
+        files = Session.query(File).filter(File.job_id == job_id).all()
+        self.assertEqual(30, len(files))
+        self.assertEqual(list(range(30)), sorted(f.file_index for f in files))
+        for f in files:
+            self.assertEqual("ON_HOLD", f.file_state)
+            self.assertEqual("SUBMITTED", f.file_state_initial)
+
+        sealed = self.app.post(url="/jobs/%s/seal" % job_id, status=200).json
+        self.assertEqual(30, sealed["files"])
+
+        Session.expire_all()
+        for f in Session.query(File).filter(File.job_id == job_id):
+            self.assertEqual("SUBMITTED", f.file_state)
+            self.assertEqual("", f.file_state_initial)
+
+        # Sealed jobs can not be modified anymore
+        self._add_files(job_id, self._files(30, 1), status=409)
+        self.app.post(url="/jobs/%s/seal" % job_id, status=409)
+
+    def test_draft_staging(self):
+        """
+        Staging drafts keep the shared hash across chunks
+        """
+        self.setup_gridsite_environment()
+        self.push_delegation()
+
+        job_id = self._create_draft(self._files(0, 2), bring_online=60)
+        self._add_files(job_id, self._files(2, 2))
+
+        files = Session.query(File).filter(File.job_id == job_id).all()
+        self.assertEqual(1, len(set(f.hashed_id for f in files)))
+        for f in files:
+            self.assertEqual("ON_HOLD_STAGING", f.file_state)
+
+        self.app.post(url="/jobs/%s/seal" % job_id, status=200)
+        Session.expire_all()
+        for f in Session.query(File).filter(File.job_id == job_id):
+            self.assertEqual("STAGING", f.file_state)
+
+    def test_draft_invalid_chunk(self):
+        """
+        An invalid chunk is rejected without affecting the draft
+        """
+        self.setup_gridsite_environment()
+        self.push_delegation()
+
+        job_id = self._create_draft(self._files(0, 2))
+        files = self._files(2, 3)
+        del files[1]["destinations"]
+        error = self._add_files(job_id, files, status=400)
+        self.assertEqual(
+            "Malformed request: files[1]: missing required 'destinations'",
+            error["message"],
+        )
+        self._add_files(job_id, [], status=400)
+        self.assertEqual(2, Session.query(File).filter(File.job_id == job_id).count())
+
+    def test_draft_not_supported(self):
+        """
+        Multihop jobs need all their files at once
+        """
+        self.setup_gridsite_environment()
+        self.push_delegation()
+
+        job = {
+            "files": [
+                {
+                    "sources": ["root://source.es/file"],
+                    "destinations": ["root://middle.ch/file"],
+                },
+                {
+                    "sources": ["root://middle.ch/file"],
+                    "destinations": ["root://dest.ch/file"],
+                },
+            ],
+            "params": {"multihop": True, "draft": True},
+        }
+        self.app.post(
+            url="/jobs",
+            content_type="application/json",
+            params=json.dumps(job),
+            status=400,
+        )
+
+    def test_add_files_not_draft(self):
+        """
+        Files can not be appended to regular jobs
+        """
+        self.setup_gridsite_environment()
+        self.push_delegation()
+
+        job_id = self.app.post(
+            url="/jobs",
+            content_type="application/json",
+            params=json.dumps({"files": self._files(0, 1)}),
+            status=200,
+        ).json["job_id"]
+        self._add_files(job_id, self._files(1, 1), status=409)
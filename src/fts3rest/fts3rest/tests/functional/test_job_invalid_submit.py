@@ -1,6 +1,10 @@
 from datetime import timedelta
 import json
+from urllib.parse import quote_plus
 
+from flask import request
+
+from fts3rest.lib.helpers.misc import get_input_as_dict
 from fts3rest.tests import TestController
 
 
@@ -431,3 +435,148 @@ class TestJobInvalidSubmits(TestController):
             params=json.dumps(job),
             status=400,
         )
+
+    def test_submit_schema_error_path(self):
+        """
+        Submissions not following the schema must be rejected pointing
+        at the offending entry
+        """
+        self.setup_gridsite_environment()
+        self.push_delegation()
+
+        files = [
+            {
+                "sources": ["root://source.es/file%d" % i],
+                "destinations": ["root://dest.ch/file%d" % i],
+            }
+            for i in range(1000)
+        ]
+        files[742]["destinations"] = [42]
+        error = self.app.put(
+            url="/jobs", params=json.dumps({"files": files}), status=400
+        ).json
+        self.assertEqual(
+            error["message"],
+            "Invalid value within the request: files[742].destinations[0]: expected string, got int",
+        )
+
+        files[742]["destinations"] = []
+        error = self.app.put(
+            url="/jobs", params=json.dumps({"files": files}), status=400
+        ).json
+        self.assertIn("files[742].destinations", error["message"])
+
+        del files[742]["destinations"]
+        error = self.app.put(
+            url="/jobs", params=json.dumps({"files": files}), status=400
+        ).json
+        self.assertEqual(
+            error["message"],
+            "Malformed request: files[742]: missing required 'destinations'",
+        )
+
+    def test_submit_too_large(self):
+        """
+        Submissions larger than MaxSubmissionSize must be rejected with a 413
+        """
+        self.setup_gridsite_environment()
+        self.push_delegation()
+
+        files = [
+            {
+                "sources": ["root://source.es/file%d" % i],
+                "destinations": ["root://dest.ch/file%d" % i],
+            }
+            for i in range(100)
+        ]
+        self.flask_app.config["fts3.MaxSubmissionSize"] = 1024
+        self.app.post(
+            url="/jobs",
+            content_type="application/json",
+            params=json.dumps({"files": files}),
+            status=413,
+        )
+
+    def test_submit_too_large_form(self):
+        """
+        MaxSubmissionSize applies to url-encoded submissions too
+        """
+        self.setup_gridsite_environment()
+        self.push_delegation()
+
+        job = {
+            "files": [
+                {
+                    "sources": ["root://source.es/file%d" % i],
+                    "destinations": ["root://dest.ch/file%d" % i],
+                }
+                for i in range(100)
+            ]
+        }
+        self.flask_app.config["fts3.MaxSubmissionSize"] = 1024
+        self.app.post(
+            url="/jobs",
+            content_type="application/json, application/x-www-form-urlencoded",
+            params=quote_plus(json.dumps(job)),
+            status=413,
+        )
+        self.app.post(
+            url="/jobs",
+            params={"files": json.dumps(job["files"])},
+            status=413,
+        )
+
+    def test_submit_form_under_limit(self):
+        """
+        Url-encoded submissions under MaxSubmissionSize are accepted
+        """
+        self.setup_gridsite_environment()
+        self.push_delegation()
+
+        job = {
+            "files": [
+                {
+                    "sources": ["root://source.es/file"],
+                    "destinations": ["root://dest.ch/file"],
+                }
+            ]
+        }
+        self.flask_app.config["fts3.MaxSubmissionSize"] = 1024
+        job_id = self.app.post(
+            url="/jobs",
+            content_type="application/json, application/x-www-form-urlencoded",
+            params=quote_plus(json.dumps(job)),
+            status=200,
+        ).json["job_id"]
+        self.assertTrue(job_id)
+
+        # The form is still there if something read it before
+        with self.flask_app.test_request_context(
+            "/jobs", method="POST", data={"files": "[]", "priority": "3"}
+        ):
+            str(request.values)
+            submitted = get_input_as_dict(request, stream=True, max_size=1024)
+        self.assertEqual({"files": "[]", "priority": "3"}, submitted)
+
+    def test_submit_trailing_garbage(self):
+        """
+        The whole body must be valid JSON, even after the transfers
+        """
+        self.setup_gridsite_environment()
+        self.push_delegation()
+
+        job = {
+            "files": [
+                {
+                    "sources": ["root://source.es/file"],
+                    "destinations": ["root://dest.ch/file"],
+                }
+            ]
+        }
+        error = self.app.post(
+            url="/jobs",
+            content_type="application/json",
+            params=json.dumps(job) + "}",
+            status=400,
+        ).json
+        self.assertTrue(error["message"].startswith("Badly formatted JSON request"))
@@ -0,0 +1,82 @@
+import logging
+import time
+
+from flask import request
+from werkzeug.exceptions import BadRequest
+
+from fts3rest.tests import TestController
+from fts3rest.lib.JobBuilder import JobBuilder
+
+log = logging.getLogger(__name__)
+
+
+class TestJobSubmissionBulk(TestController):
+    """
+    Micro-benchmark of the expansion of very large submissions into transfers
+    """
+
+    NB_FILES = 20000
+
+    def _request_context(self):
+        self.setup_gridsite_environment()
+        environ = {
+            "fts3.User.Credentials": self.get_user_credentials(),
+            "REMOTE_ADDR": "127.0.0.1",
+        }
+        return self.flask_app.test_request_context(environ_base=environ)
+
+    def _build(self, files, params=None):
+        with self._request_context():
+            start = time.perf_counter()
+            builder = JobBuilder(request, files=files, params=params or {})
+            elapsed = time.perf_counter() - start
+        log.info(
+            "Expanded %d files in %.3f seconds (%.0f files/s)"
+            % (len(files), elapsed, len(files) / elapsed)
+        )
+        return builder, elapsed
+
+    def test_bulk_expansion(self):
+        """
+        Expand a large bulk submission. The storage elements must be resolved
+        once per host, and the metadata must be kept per file.
+        """
+        files = [
+            {
+                "sources": ["root://source%d.es/path/file%d" % (i % 4, i)],
+                "destinations": ["root://dest.ch/path/file%d" % i],
+                "filesize": 1024,
+                "metadata": {"index": i},
+            }
+            for i in range(self.NB_FILES)
+        ]
+        builder, elapsed = self._build(files)
+
+        self.assertEqual(self.NB_FILES, len(builder.files))
+        self.assertEqual(5, len(builder._storage_elements))
+        self.assertEqual("root://source3.es", builder.files[3]["source_se"])
+        self.assertEqual("root://dest.ch", builder.files[3]["dest_se"])
+        self.assertEqual({"index": 3}, builder.files[3]["file_metadata"])
+        self.assertEqual("SUBMITTED", builder.files[-1]["file_state"])
+        # Generous bound, only meant to catch regressions back to quadratic
+        # or per-file configuration lookups
+        self.assertLess(elapsed, 60)
+
+    def test_bulk_expansion_invalid_url(self):
+        """
+        A url with a missing path must be rejected even if its host has
+        already been seen
+        """
+        files = [
+            {
+                "sources": ["root://source.es/path/file"],
+                "destinations": ["root://dest.ch/path/file"],
+            },
+            {
+                "sources": ["root://source.es/"],
+                "destinations": ["root://dest.ch/path/file2"],
+            },
+        ]
+        with self._request_context():
+            with self.assertRaises(BadRequest):
+                JobBuilder(request, files=files, params={})
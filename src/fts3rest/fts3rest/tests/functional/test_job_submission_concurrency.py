@@ -0,0 +1,92 @@
+import json
+import logging
+import threading
+import time
+import unittest
+
+from fts3rest.tests import TestController
+from fts3rest.model.meta import Session
+
+log = logging.getLogger(__name__)
+
+
+class TestJobSubmissionConcurrency(TestController):
+    """
+    Benchmark of concurrent submissions to the same links.
+    On PostgreSQL, all of them update the same t_queue rows.
+    """
+
+    NB_SUBMITTERS = 50
+    NB_JOBS = 5
+    NB_FILES = 10
+
+    def setUp(self):
+        super().setUp()
+        if self.flask_app.config["fts3.DbType"] != "postgresql":
+            raise unittest.SkipTest("t_queue counters are only kept on PostgreSQL")
+
+    def _submitter(self, index, errors):
+        client = self.flask_app.test_client()
+        client.environ_base.update(self.app.environ_base)
+        try:
+            for job in range(self.NB_JOBS):
+                files = [
+                    {
+                        # Two links per job, in a different order on each
+                        # submitter, to exercise the lock ordering
+                        "sources": [
+                            "root://source%d.es/file-%d-%d-%d"
+                            % ((index + i) % 2, index, job, i)
+                        ],
+                        "destinations": [
+                            "root://dest.ch/file-%d-%d-%d" % (index, job, i)
+                        ],
+                    }
+                    for i in range(self.NB_FILES)
+                ]
+                client.post(
+                    url="/jobs",
+                    content_type="application/json",
+                    params=json.dumps({"files": files}),
+                    status=200,
+                )
+        except Exception as ex:
+            errors.append(ex)
+        finally:
+            Session.remove()
+
+    def _queued(self):
+        return Session.execute(
+            "SELECT COALESCE(SUM(nb_files), 0) FROM t_queue"
+            " WHERE dest_se = 'root://dest.ch' AND file_state = 'SUBMITTED'"
+        ).scalar()
+
+    def test_concurrent_submissions(self):
+        """
+        Parallel submitters hitting the same links must neither deadlock
+        nor lose counts
+        """
+        self.setup_gridsite_environment()
+        self.push_delegation()
+        queued_before = self._queued()
+
+        errors = []
+        threads = [
+            threading.Thread(target=self._submitter, args=(i, errors))
+            for i in range(self.NB_SUBMITTERS)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        nb_jobs = self.NB_SUBMITTERS * self.NB_JOBS
+        log.info(
+            "%d submitters: %d jobs in %.3f seconds (%.1f jobs/s)"
+            % (self.NB_SUBMITTERS, nb_jobs, elapsed, nb_jobs / elapsed)
+        )
+        self.assertEqual([], errors)
+        Session.expire_all()
+        self.assertEqual(nb_jobs * self.NB_FILES, self._queued() - queued_before)
@@ -0,0 +1,62 @@
+import io
+import json
+
+from fts3rest.lib.helpers.jsonstream import load_object, RequestTooLarge
+from fts3rest.tests import TestController
+
+
+class TestJsonStream(TestController):
+    """
+    Tests for the incremental JSON decoder
+    """
+
+    DOCUMENTS = [
+        '{"b": 1.5}',
+        '{"f": 1e10, "g": 2}',
+        '{"a": -12.5e-3, "b": [1, 2.25, -3E+2], "c": true, "d": null}',
+        '{"files": [{"filesize": 1024, "checksum": "ADLER32:\\u00e9"}], "n": 0}',
+        "{}",
+    ]
+
+    def test_every_chunk_size(self):
+        """
+        The decoded document must not depend on where the chunks are split
+        """
+        for document in self.DOCUMENTS:
+            raw = document.encode("utf-8")
+            for chunk_size in range(1, len(raw) + 1):
+                self.assertEqual(
+                    json.loads(document),
+                    load_object(io.BytesIO(raw), chunk_size=chunk_size),
+                    "chunk_size=%d" % chunk_size,
+                )
+
+    def test_item_hooks(self):
+        """
+        The hook must be called once per item, in order
+        """
+        seen = []
+        document = load_object(
+            io.BytesIO(b'{"files": [1.5, 20, {"a": 3}], "other": [4]}'),
+            item_hooks={"files": lambda index, item: seen.append((index, item))},
+            chunk_size=3,
+        )
+        self.assertEqual([(0, 1.5), (1, 20), (2, {"a": 3})], seen)
+        self.assertEqual([4], document["other"])
+
+    def test_invalid(self):
+        """
+        Invalid documents must be rejected at every chunk size
+        """
+        for document in ['{"a": 1x}', '{"a": 1.}', '{"a": 01}', '{"a": 1', "[1]"]:
+            raw = document.encode("utf-8")
+            for chunk_size in range(1, len(raw) + 1):
+                with self.assertRaises((json.JSONDecodeError, TypeError)):
+                    load_object(io.BytesIO(raw), chunk_size=chunk_size)
+
+    def test_too_large(self):
+        """
+        Reading past max_size must fail
+        """
+        with self.assertRaises(RequestTooLarge):
+            load_object(io.BytesIO(b'{"a": "%s"}' % (b"x" * 100)), max_size=50)
@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+
+from fts3rest.lib.helpers import metrics
+from fts3rest.tests import TestController
+
+
+class TestMetrics(TestController):
+    """
+    Tests for the metrics endpoint, and the aggregation between processes
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super().tearDown()
+
+    def _value(self, key):
+        return metrics.collect(self.directory).get(key, 0)
+
+    def test_metrics(self):
+        """
+        Requests are counted per endpoint, method and status
+        """
+        self.setup_gridsite_environment()
+        self.push_delegation()
+
+        key = ("fts_rest_requests_total", ("jobs.index", "GET", "200"))
+        before = self._value(key)
+        # Requests are accounted when the server closes the response
+        self.app.get(url="/jobs", status=200, buffered=True)
+        self.app.get(url="/jobs", status=200, buffered=True)
+        self.assertEqual(before + 2, self._value(key))
+
+        job_key = ("fts_rest_job_requests_total", ("testvo", "GET", "200"))
+        self.assertLessEqual(2, self._value(job_key))
+
+        self.flask_app.config["fts3.MetricsDir"] = self.directory
+        response = self.app.get(url="/metrics", status=200)
+        self.assertEqual("text/plain", response.mimetype)
+        body = response.get_data(as_text=True)
+        self.assertIn("# TYPE fts_rest_request_duration_seconds histogram", body)
+        self.assertIn(
+            'fts_rest_requests_total{endpoint="jobs.index",method="GET",status="200"}',
+            body,
+        )
+        self.assertIn(
+            'fts_rest_request_duration_seconds_bucket{endpoint="jobs.index",'
+            'method="GET",le="+Inf"}',
+            body,
+        )
+
+    def test_aggregation(self):
+        """
+        Counters of other processes are added, even after they are gone
+        """
+        key = ("fts_rest_cache_requests_total", ("test", "hit"))
+        before = self._value(key)
+
+        for _ in range(2):
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    metrics.CACHE_REQUESTS.inc("test", "hit", amount=5)
+                    metrics.flush(self.directory)
+                finally:
+                    os._exit(0)
+            os.waitpid(pid, 0)
+
+        metrics.CACHE_REQUESTS.inc("test", "hit")
+        self.assertEqual(before + 11, self._value(key))
+        # Snapshots of dead processes are archived
+        self.assertIn("metrics-archive.json", os.listdir(self.directory))
+        self.assertEqual(before + 11, self._value(key))
@@ -0,0 +1,151 @@
+import json
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+from Cryptodome.PublicKey import RSA
+from jwkest.jwk import RSAKey
+
+from fts3rest.lib.openidconnect import OIDCmanager, ProviderNotReady
+from fts3rest.tests import TestController
+
+
+class StubIdP(ThreadingHTTPServer):
+    """
+    Serves the discovery document and the keys of an OIDC provider,
+    answering after a delay
+    """
+
+    daemon_threads = True
+
+    def __init__(self, delay):
+        super().__init__(("127.0.0.1", 0), StubIdPHandler)
+        self.delay = delay
+        self.url = "http://127.0.0.1:{}".format(self.server_address[1])
+        self.jwks = {"keys": [RSAKey(key=RSA.generate(2048), kid="stub").serialize()]}
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
+class StubIdPHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(self.server.delay)
+        if self.path == "/.well-known/openid-configuration":
+            body = {
+                "issuer": self.server.url,
+                "jwks_uri": self.server.url + "/jwks",
+                "token_endpoint": self.server.url + "/token",
+                "introspection_endpoint": self.server.url + "/introspect",
+            }
+        elif self.path == "/jwks":
+            body = self.server.jwks
+        else:
+            self.send_error(404)
+            return
+        content = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestOIDCBootstrap(TestController):
+    """
+    Tests the configuration of the OIDC providers at startup
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.idp = StubIdP(delay=0.5)
+        self.cache_dir = tempfile.mkdtemp()
+        self.config = {
+            "fts3.Providers": {
+                self.idp.url: {
+                    "client_id": "fts",
+                    "client_secret": "secret",
+                    "custom": {},
+                }
+            },
+            "fts3.JWKCacheSeconds": 86400,
+            "fts3.OIDCCacheDir": self.cache_dir,
+            "fts3.OIDCProviderTimeout": 5,
+        }
+        self.token = jwt.encode({"iss": self.idp.url}, "x" * 32, algorithm="HS256")
+
+    def tearDown(self):
+        self.idp.shutdown()
+        self.idp.server_close()
+        shutil.rmtree(self.cache_dir)
+        super().tearDown()
+
+    def _wait_ready(self, oidc_manager, timeout=10):
+        deadline = time.monotonic() + timeout
+        while oidc_manager.pending and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(oidc_manager.pending)
+
+    def test_startup_does_not_block(self):
+        """
+        The setup returns before the provider answers, whose tokens are not ready
+        """
+        oidc_manager = OIDCmanager()
+        start = time.monotonic()
+        oidc_manager.setup(self.config, block=False)
+        startup = time.monotonic() - start
+        self.assertLess(startup, self.idp.delay)
+        with self.assertRaises(ProviderNotReady):
+            oidc_manager.token_issuer_supported(self.token)
+
+        self._wait_ready(oidc_manager)
+        self.assertTrue(oidc_manager.token_issuer_supported(self.token))
+        self.assertEqual(1, len(oidc_manager.filter_provider_keys(self.idp.url)))
+
+    def test_cached_metadata(self):
+        """
+        The last known metadata is used while the provider is contacted
+        """
+        OIDCmanager().setup(self.config)
+
+        oidc_manager = OIDCmanager()
+        self.idp.delay = 5
+        oidc_manager.setup(self.config, block=False)
+        self.assertTrue(oidc_manager.token_issuer_supported(self.token))
+        self.assertEqual(1, len(oidc_manager.filter_provider_keys(self.idp.url)))
+
+    def test_unsupported_issuer(self):
+        """
+        The tokens of unknown issuers are still refused
+        """
+        oidc_manager = OIDCmanager()
+        oidc_manager.setup(self.config, block=False)
+        token = jwt.encode({"iss": "https://unknown"}, "x" * 32, algorithm="HS256")
+        self.assertFalse(oidc_manager.token_issuer_supported(token))
+
+    def test_removed_provider(self):
+        """
+        A provider removed while it is being contacted is not added back
+        """
+        config = dict(
+            self.config,
+            **{
+                "fts3.OIDCCacheDir": None,
+                "fts3.OIDCProviderTimeout": 0.2,
+                "fts3.OIDCProviderRetryInterval": 0.2,
+            },
+        )
+        oidc_manager = OIDCmanager()
+        # Unreachable at first, so the bootstrap keeps retrying
+        self.idp.delay = 1
+        oidc_manager.setup(config, block=False)
+        oidc_manager.setup(dict(config, **{"fts3.Providers": {}}), block=False)
+        self.idp.delay = 0
+
+        time.sleep(2)
+        self.assertEqual({}, oidc_manager.clients)
+        self.assertFalse(oidc_manager.token_issuer_supported(self.token))
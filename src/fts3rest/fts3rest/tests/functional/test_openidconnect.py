@@ -21,7 +21,7 @@ class TestOpenidconnect(TestController):
         self.issuer = "https://iam.extreme-datacloud.eu/"
 
     def test_configure_clients(self):
-        self.oidc_manager._configure_clients(self.config["fts3.Providers"])
+        self.oidc_manager.setup(self.config)
         self.assertEqual(
             len(self.oidc_manager.clients), len(self.config["fts3.Providers"])
         )
@@ -1,6 +1,8 @@
+from datetime import datetime
+
 from fts3rest.tests import TestController
 from fts3rest.model.meta import Session
-from fts3rest.model import Optimizer
+from fts3rest.model import Optimizer, OptimizerEvolution
 
 
 class TestOptimizer(TestController):
@@ -8,6 +10,7 @@ class TestOptimizer(TestController):
         super().setUp()
         self.setup_gridsite_environment()
         Session.query(Optimizer).delete()
+        Session.query(OptimizerEvolution).delete()
         Session.commit()
 
     def test_set_optimizer_values(self):
@@ -90,3 +93,161 @@ class TestOptimizer(TestController):
         self.assertEqual(4, optimizer.nostreams)
         self.assertEqual(1024, optimizer.active)
         self.assertEqual(5, optimizer.ema)
+
+    def test_set_optimizer_values_batch(self):
+        """
+        Set the optimizer values of several links at once
+        """
+        self.test_set_optimizer_values()
+        resp = self.app.post_json(
+            "/optimizer/current/batch",
+            params={
+                "decisions": [
+                    {
+                        "source_se": "test.cern.ch",
+                        "dest_se": "test2.cern.ch",
+                        "nostreams": 2,
+                        "active": 10,
+                        "ema": 1.5,
+                        "rationale": "Range",
+                    },
+                    {"source_se": "test.cern.ch", "dest_se": "test3.cern.ch"},
+                ]
+            },
+            status=200,
+        ).json
+        self.assertEqual(2, resp["count"])
+
+        Session.expire_all()
+        optimizer = Session.query(Optimizer).get(("test.cern.ch", "test2.cern.ch"))
+        self.assertEqual(2, optimizer.nostreams)
+        self.assertEqual(10, optimizer.active)
+        self.assertEqual(1.5, optimizer.ema)
+        optimizer = Session.query(Optimizer).get(("test.cern.ch", "test3.cern.ch"))
+        self.assertEqual(1, optimizer.nostreams)
+        self.assertEqual(2, optimizer.active)
+
+        evolution = (
+            Session.query(OptimizerEvolution)
+            .filter(OptimizerEvolution.dest_se == "test2.cern.ch")
+            .filter(OptimizerEvolution.rationale == "Range")
+            .one()
+        )
+        self.assertEqual(10, evolution.active)
+
+    def test_optimizer_values_batch_unauthorized(self):
+        """
+        Only the users allowed to configure can set the optimizer values
+        """
+        self.setup_gridsite_environment(no_vo=True)
+        self.app.post_json(
+            "/optimizer/current/batch",
+            params={
+                "decisions": [{"source_se": "test.cern.ch", "dest_se": "test2.cern.ch"}]
+            },
+            status=403,
+        )
+        self.assertIsNone(
+            Session.query(Optimizer).get(("test.cern.ch", "test2.cern.ch"))
+        )
+
+    def test_wrong_optimizer_values_batch(self):
+        """
+        An invalid decision rejects the whole batch
+        """
+        resp = self.app.post_json(
+            "/optimizer/current/batch",
+            params={
+                "decisions": [
+                    {"source_se": "test.cern.ch", "dest_se": "test2.cern.ch"},
+                    {
+                        "source_se": "test.cern.ch",
+                        "dest_se": "test3.cern.ch",
+                        "active": -1,
+                    },
+                ]
+            },
+            status=400,
+        ).json
+        self.assertIn("decisions[1].active", resp["message"])
+        self.assertEqual(0, Session.query(Optimizer).count())
+
+        self.app.post_json(
+            "/optimizer/current/batch",
+            params={
+                "decisions": [
+                    {"source_se": "test.cern.ch", "dest_se": "test2.cern.ch"},
+                    {"source_se": "test.cern.ch", "dest_se": "test2.cern.ch"},
+                ]
+            },
+            status=400,
+        )
+        self.app.post_json(
+            "/optimizer/current/batch", params={"decisions": []}, status=400
+        )
+        self.app.post_json(
+            "/optimizer/current/batch",
+            params={"decisions": [{"source_se": "test.cern.ch"}]},
+            status=400,
+        )
+
+    def _add_evolution(self):
+        for minute in range(0, 120, 10):
+            Session.add(
+                OptimizerEvolution(
+                    source_se="test.cern.ch",
+                    dest_se="test2.cern.ch",
+                    datetime=datetime(2020, 1, 1, 10 + minute // 60, minute % 60),
+                    active=minute,
+                    throughput=float(minute),
+                    success=100,
+                    ema=1,
+                )
+            )
+        Session.commit()
+
+    def test_evolution_buckets(self):
+        """
+        Optimizer evolution averaged per hour
+        """
+        self._add_evolution()
+        buckets = self.app.get(
+            "/optimizer/evolution?bucket=1h&since=2020-01-01&until=2020-01-02",
+            status=200,
+        ).json
+        self.assertEqual(2, len(buckets))
+        self.assertEqual("2020-01-01T10:00:00", buckets[0]["datetime"])
+        self.assertEqual(6, buckets[0]["samples"])
+        self.assertEqual(25, buckets[0]["active"])
+        self.assertEqual(25.0, buckets[0]["throughput"])
+        self.assertEqual("2020-01-01T11:00:00", buckets[1]["datetime"])
+        self.assertEqual(85, buckets[1]["active"])
+
+    def test_evolution_csv(self):
+        """
+        Optimizer evolution as CSV
+        """
+        self._add_evolution()
+        resp = self.app.get(
+            "/optimizer/evolution?bucket=30m&since=2020-01-01T11:00:00",
+            headers={"Accept": "text/csv"},
+            status=200,
+        )
+        self.assertEqual("text/csv", resp.mimetype)
+        lines = resp.get_data(as_text=True).splitlines()
+        self.assertEqual(
+            "source_se,dest_se,datetime,samples,throughput,success,active,ema",
+            lines[0],
+        )
+        self.assertEqual(3, len(lines))
+        self.assertTrue(
+            lines[1].startswith("test.cern.ch,test2.cern.ch,2020-01-01T11:00:00,3,")
+        )
+
+    def test_evolution_wrong_bucket(self):
+        """
+        Invalid time range or bucket
+        """
+        self.app.get("/optimizer/evolution?bucket=0", status=400)
+        self.app.get("/optimizer/evolution?bucket=5w", status=400)
+        self.app.get("/optimizer/evolution?since=yesterday", status=400)
@@ -0,0 +1,55 @@
+from sqlalchemy import create_engine, text
+
+from fts3rest.lib.helpers.replica import ReplicaRouter
+from fts3rest.model import Job
+from fts3rest.model.meta import Session, RoutingSession, read_only
+from fts3rest.tests import TestController
+
+
+class TestReplica(TestController):
+    """
+    Tests for the routing of the read only requests to the replicas
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.replica = create_engine("sqlite://")
+        self.broken = create_engine("sqlite:////nonexistent/directory/replica.db")
+
+    def tearDown(self):
+        RoutingSession.router = None
+        super().tearDown()
+
+    def test_router(self):
+        """
+        Replicas that can not tell their lag are skipped
+        """
+        router = ReplicaRouter([self.broken, self.replica])
+        self.assertEqual(self.replica, router.pick())
+        self.assertEqual(self.replica, router.pick())
+
+        router = ReplicaRouter([self.broken])
+        self.assertIsNone(router.pick())
+
+        router = ReplicaRouter([self.replica], max_lag=-1)
+        self.assertIsNone(router.pick())
+
+    def test_routing(self):
+        """
+        Read only sessions read from the replica until they write
+        """
+        primary = Session.get_bind()
+        RoutingSession.router = ReplicaRouter([self.replica])
+
+        select = text("SELECT 1")
+        self.assertEqual(primary, Session.get_bind(clause=select))
+
+        read_only(lambda: None)()
+        self.assertEqual(self.replica, Session.get_bind(clause=select))
+        self.assertEqual(self.replica, Session.get_bind(mapper=Job))
+        self.assertEqual(primary, Session.get_bind(clause=Job.__table__.insert()))
+        self.assertEqual(primary, Session.get_bind(clause=select))
+
+        # The routing does not outlive the request
+        Session.remove()
+        self.assertEqual(primary, Session.get_bind(clause=select))
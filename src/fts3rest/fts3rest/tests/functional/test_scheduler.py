@@ -5,6 +5,10 @@ import logging
 from fts3rest.tests import TestController
 from fts3rest.model.meta import Session
 from fts3rest.lib.scheduler.Cache import ThreadLocalCache
+from fts3rest.lib.scheduler.db import Database
+from fts3rest.lib.scheduler.schd import Scheduler
+from fts3rest.lib.scheduler.simulator import simulate
+from fts3rest.lib.scheduler.strategies import ExplorationBudget
 from fts3rest.model import Job, File, OptimizerEvolution, ActivityShare
 import random
 
@@ -302,6 +306,76 @@ class TestScheduler(TestController):
         job_id = self.submit_job("duration")
         self.validate(job_id)
 
+    def test_cost(self):
+        """
+        Test the 'cost' algorithm
+        Combines queue time, success rate and throughput into the expected
+        time to complete the file
+        """
+        self.setup_gridsite_environment()
+        self.push_delegation()
+        TestScheduler.fill_activities()
+        TestScheduler.fill_optimizer()
+        TestScheduler.fill_file_queue(self)
+        job_id = self.submit_job("cost")
+        self.validate(job_id)
+
+    def test_unprobed_link_exploration(self):
+        """
+        An unprobed link must only be ranked first while its exploration
+        budget allows it, and the ranking must always have the same shape
+        """
+        TestScheduler.fill_optimizer()
+        sources = ["http://site01.es", "http://unprobed.org", "http://site03.fr"]
+        scheduler = Scheduler(
+            Database(Session), exploration=ExplorationBudget(epsilon=0, initial=1)
+        )
+
+        ranks = scheduler.rank_throughput(sources, "http://dest.ch")
+        self.assertEqual(
+            [("http://unprobed.org", None), ("http://site03.fr", 200.0)], ranks[:2]
+        )
+        self.assertEqual(3, len(ranks))
+
+        ranks = scheduler.rank_throughput(sources, "http://dest.ch")
+        self.assertEqual(
+            [
+                ("http://site03.fr", 200.0),
+                ("http://site01.es", 100.0),
+                ("http://unprobed.org", None),
+            ],
+            ranks,
+        )
+
+    def test_simulator(self):
+        """
+        Replay the optimizer evolution and evaluate the strategies
+        """
+        start = datetime.datetime.utcnow() - datetime.timedelta(minutes=30)
+        sources = ["http://site01.es", "http://site02.ch", "http://site03.fr"]
+        for minutes in (0, 5):
+            for throughput, source in zip((10, 15, 20), sources):
+                Session.add(
+                    OptimizerEvolution(
+                        datetime=start + datetime.timedelta(minutes=minutes),
+                        source_se=source,
+                        dest_se="http://dest.ch",
+                        success=100,
+                        active=10,
+                        throughput=throughput,
+                    )
+                )
+        Session.commit()
+
+        reports = simulate(
+            Session, sources, "http://dest.ch", ["throughput", "orderly"]
+        )
+        self.assertEqual(2, reports["throughput"].decisions)
+        self.assertEqual(1, reports["throughput"].observed)
+        self.assertEqual(20, reports["throughput"].avg_throughput)
+        self.assertEqual({"http://site03.fr": 2}, reports["throughput"].choices)
+        self.assertEqual(10, reports["orderly"].avg_throughput)
+
     def test_invalid_strategy(self):
         """
         Test a random strategy name, which must fail
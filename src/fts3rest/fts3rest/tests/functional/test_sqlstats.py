@@ -0,0 +1,57 @@
+import logging
+
+from sqlalchemy import event
+
+from fts3rest.lib.helpers.sqlstats import SqlInstrumentation, normalize_statement
+from fts3rest.model.meta import Session
+from fts3rest.tests import TestController
+
+
+class TestSqlStats(TestController):
+    """
+    Tests for the per request SQL instrumentation
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.flask_app.config["fts3.SqlInstrumentation"] = True
+        self.flask_app.config["fts3.StatementBudget"] = "1"
+        self.instrumentation = SqlInstrumentation(self.flask_app.config)
+        self.engine = Session.get_bind()
+        self.instrumentation.install(self.engine)
+
+    def tearDown(self):
+        event.remove(
+            self.engine,
+            "after_cursor_execute",
+            self.instrumentation.after_cursor_execute,
+        )
+        super().tearDown()
+
+    def test_normalize(self):
+        """
+        Statements that only differ by their values are normalized the same
+        """
+        self.assertEqual(
+            "SELECT * FROM t_file WHERE job_id = ? AND file_id IN (?...)",
+            normalize_statement(
+                "SELECT *\n  FROM t_file WHERE job_id = 'abc' AND file_id IN (1, 2,3)"
+            ),
+        )
+        self.assertEqual(
+            normalize_statement("SELECT a FROM t WHERE b = %s"),
+            normalize_statement("SELECT a FROM t WHERE b = :b_1"),
+        )
+
+    def test_request_statements(self):
+        """
+        The statements are counted, and the budget is checked
+        """
+        self.setup_gridsite_environment()
+        self.push_delegation()
+
+        with self.assertLogs("fts3rest.lib.helpers.sqlstats", logging.WARNING) as logs:
+            response = self.app.get(url="/jobs", status=200, buffered=True)
+        self.assertLessEqual(1, int(response.headers["X-DB-Statements"]))
+        self.assertLessEqual(0, float(response.headers["X-DB-Time"]))
+        self.assertIn("Possible N+1 pattern", logs.output[0])
@@ -0,0 +1,55 @@
+import sys
+
+from fts3rest.config.routing.lazy import LazyView, controller
+from fts3rest.lib.startup_profile import parse_import_times, by_package
+from fts3rest.tests import TestController
+
+
+class TestStartup(TestController):
+    """
+    Tests for the lazy views and the startup profile
+    """
+
+    def test_lazy_view(self):
+        """
+        The view is imported on the first call
+        """
+        sys.modules.pop("colorsys", None)
+        view = LazyView("colorsys.rgb_to_hsv")
+        self.assertEqual("rgb_to_hsv", view.__name__)
+        self.assertNotIn("colorsys", sys.modules)
+        self.assertEqual((0, 0, 1), view(1, 1, 1))
+        self.assertIn("colorsys", sys.modules)
+
+    def test_same_endpoint(self):
+        """
+        The rules that share an endpoint get the same view
+        """
+        self.assertIs(controller("jobs.index"), controller("jobs.index"))
+        self.assertEqual(
+            "delegation.whoami", controller("delegation.whoami", as_view=True).__name__
+        )
+
+    def test_routes(self):
+        """
+        The lazy views answer the requests
+        """
+        self.setup_gridsite_environment()
+        self.app.get(url="/optimizer", status=200)
+
+    def test_parse_import_times(self):
+        """
+        Parse the output of python -X importtime
+        """
+        modules = parse_import_times(
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       300 |        300 |   sqlalchemy.util\n"
+            "import time:      1200 |       1500 | sqlalchemy\n"
+        )
+        self.assertEqual(
+            ["sqlalchemy.util", "sqlalchemy"], [module.name for module in modules]
+        )
+        self.assertAlmostEqual(0.0015, modules[1].cumulative)
+        packages = by_package(modules)
+        self.assertEqual(1, len(packages))
+        self.assertAlmostEqual(0.0015, packages[0].self)
@@ -0,0 +1,66 @@
+from sqlalchemy.exc import OperationalError
+
+from fts3rest.lib.middleware.timeout import StatementTimeouts, is_statement_timeout
+from fts3rest.tests import TestController
+
+
+class MockMySQLError(Exception):
+    pass
+
+
+class MockPostgresError(Exception):
+    pgcode = "57014"
+
+
+class TestStatementTimeout(TestController):
+    """
+    Tests for the statement timeouts
+    """
+
+    def test_is_statement_timeout(self):
+        """
+        Timeouts are recognized for each database
+        """
+        self.assertTrue(
+            is_statement_timeout(
+                OperationalError("SELECT 1", {}, MockMySQLError(3024, "Timeout"))
+            )
+        )
+        self.assertTrue(is_statement_timeout(MockPostgresError("canceled")))
+        self.assertTrue(
+            is_statement_timeout(Exception("DPI-1067: call timeout of 1 ms exceeded"))
+        )
+        self.assertFalse(
+            is_statement_timeout(
+                OperationalError("SELECT 1", {}, MockMySQLError(2006, "Gone away"))
+            )
+        )
+
+    def test_timeouts(self):
+        """
+        Endpoints can override the default timeout
+        """
+        timeouts = StatementTimeouts(
+            {
+                "fts3.StatementTimeout": "10",
+                "fts3.StatementTimeouts": "jobs.index:60, files.index: 0.5",
+            }
+        )
+        self.assertEqual(10, timeouts.timeout_for("jobs.get"))
+        self.assertEqual(60, timeouts.timeout_for("jobs.index"))
+        self.assertEqual(0.5, timeouts.timeout_for("files.index"))
+        self.assertEqual(1, timeouts.retry_after("files.index"))
+
+    def test_service_unavailable(self):
+        """
+        A cancelled statement is a 503 with Retry-After
+        """
+
+        def slow():
+            raise OperationalError("SELECT 1", {}, MockMySQLError(3024, "Timeout"))
+
+        self.flask_app.add_url_rule("/slow", "slow", slow)
+        self.setup_gridsite_environment()
+
+        response = self.app.get(url="/slow", status=503)
+        self.assertIn("Retry-After", response.headers)